@@ -0,0 +1,299 @@
+import csv
+import io
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from pathlib import Path
+from threading import Lock, local
+from typing import Callable, Iterable, Iterator
+
+from psycopg2 import sql
+from psycopg2.extensions import connection
+
+from db import connect
+from generate_data import TABLES
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+FOREIGN_KEYS_CMD = """
+    SELECT
+        conrelid::regclass::text,
+        conname,
+        pg_get_constraintdef(oid)
+    FROM
+        pg_constraint
+    WHERE
+        contype = 'f' AND
+        conrelid = ANY(%s::regclass[])
+    ORDER BY
+        conrelid::regclass::text,
+        conname;
+"""
+
+SECONDARY_INDEXES_CMD = """
+    SELECT
+        indexrelid::regclass::text,
+        pg_get_indexdef(indexrelid)
+    FROM
+        pg_index
+    WHERE
+        indrelid = ANY(%s::regclass[]) AND
+        NOT EXISTS (
+            SELECT
+                1
+            FROM
+                pg_constraint
+            WHERE
+                pg_constraint.conindid = pg_index.indexrelid
+        )
+    ORDER BY
+        indexrelid::regclass::text;
+"""
+
+COPY_CMD = 'COPY {table} ({columns}) FROM STDIN WITH (FORMAT {format}{header})'
+
+DROP_CONSTRAINT_CMD = 'ALTER TABLE {table} DROP CONSTRAINT {name};'
+
+DROP_INDEX_CMD = 'DROP INDEX {index};'
+
+DISABLE_TRIGGERS_CMD = 'ALTER TABLE {table} DISABLE TRIGGER USER;'
+
+ENABLE_TRIGGERS_CMD = 'ALTER TABLE {table} ENABLE TRIGGER USER;'
+
+ANALYZE_CMD = 'ANALYZE {table};'
+
+ADD_CONSTRAINT_CMD = 'ALTER TABLE {table} ADD CONSTRAINT {name} {definition};'
+
+RESET_SEQUENCE_CMD = """
+    SELECT
+        setval(
+            pg_get_serial_sequence(%s, 'id'),
+            COALESCE(MAX(id), 0) + 1,
+            FALSE
+        )
+    FROM
+        {table};
+"""
+
+
+class IteratorFile(io.RawIOBase):
+    """
+    Read-only file object over an iterator of bytes chunks, so COPY FROM
+    STDIN consumes data as it is produced instead of from a built buffer.
+    """
+    def __init__(self, chunks: Iterable[bytes]):
+        self.chunks = iter(chunks)
+        self.buffer = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        while not self.buffer:
+            try:
+                self.buffer = next(self.chunks)
+            except StopIteration:
+                return 0
+        size = min(len(target), len(self.buffer))
+        target[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+
+        return size
+
+
+def read_chunks(path: Path) -> Iterator[bytes]:
+    """Yields content of the file by chunks of COPY_CHUNK_SIZE bytes."""
+    with open(path, 'rb') as file:
+        while chunk := file.read(COPY_CHUNK_SIZE):
+            yield chunk
+
+
+def copy_stream(db_connection: connection, table: str,
+                columns: Iterable[str], chunks: Iterable[bytes],
+                copy_format: str = 'csv', header: bool = False) -> int:
+    """
+    Loads data of given format ('csv' or 'binary') streamed from chunks
+    into columns of the table by COPY FROM STDIN, commits and returns count
+    of loaded rows.
+    """
+    copy_cmd = sql.SQL(COPY_CMD).format(
+        table=sql.Identifier(table),
+        columns=sql.SQL(', ').join(map(sql.Identifier, columns)),
+        format=sql.SQL(copy_format),
+        header=sql.SQL(', HEADER' if header else '')
+    )
+    with db_connection.cursor() as cursor:
+        cursor.copy_expert(
+            copy_cmd,
+            IteratorFile(chunks=chunks),
+            size=COPY_CHUNK_SIZE
+        )
+        count = cursor.rowcount
+    db_connection.commit()
+
+    return count
+
+
+def copy_file(db_connection: connection, table: str, path: Path) -> int:
+    """
+    Loads CSV file with header (*.csv) or file of COPY binary format with
+    columns of TABLES (*.bin) into the table.
+    """
+    if path.suffix == '.bin':
+        return copy_stream(
+            db_connection=db_connection,
+            table=table,
+            columns=TABLES[table],
+            chunks=read_chunks(path),
+            copy_format='binary'
+        )
+
+    with open(path, encoding='utf-8', newline='') as file:
+        columns = next(csv.reader(file))
+
+    return copy_stream(
+        db_connection=db_connection,
+        table=table,
+        columns=columns,
+        chunks=read_chunks(path),
+        header=True
+    )
+
+
+def get_table_files(directory: Path) -> list[tuple[str, Path]]:
+    """
+    Get (table, file) pairs of data files in subdirectories of the directory
+    named by tables of TABLES. Largest files come first, so parallel load is
+    not finished by a single big file.
+    """
+    files = [
+        (table, path) for table in TABLES
+        for path in directory.joinpath(table).glob('*')
+        if path.suffix in ('.bin', '.csv')
+    ]
+
+    return sorted(files, key=lambda item: -item[1].stat().st_size)
+
+
+def run_parallel(commands: Iterable, jobs: int) -> list:
+    """
+    Runs callables taking a connection over given count of connections, one
+    connection per worker thread, and returns their results.
+    """
+    connections = []
+    connections_lock = Lock()
+    thread_data = local()
+
+    def run(command):
+        if (db_connection := getattr(thread_data, 'connection', None)) is None:
+            db_connection = thread_data.connection = connect()
+            with connections_lock:
+                connections.append(db_connection)
+        return command(db_connection)
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(run, commands))
+    finally:
+        for db_connection in connections:
+            db_connection.close()
+
+
+def execute_cmd(cmd: str) -> Callable[[connection], None]:
+    """Get callable for run_parallel executing the command."""
+    def execute(db_connection: connection) -> None:
+        with db_connection.cursor() as cursor:
+            cursor.execute(cmd)
+        db_connection.commit()
+
+    return execute
+
+
+def bulk_load(directory: Path, jobs: int = 4,
+              index_cmds: Iterable[str] = ()) -> dict[str, int]:
+    """
+    Loads data files of the directory into tables of TABLES over given
+    count of parallel connections and returns count of loaded rows per table.
+
+    Before the load foreign keys and secondary indexes of the tables are
+    dropped and user triggers are disabled, so every table is independent of
+    others and all files load in parallel. After the load indexes (existing
+    and given index_cmds) are created in parallel, foreign keys are added
+    back and validated, triggers are enabled and id sequences are moved past
+    loaded ids. Derived data maintained by triggers should be refreshed
+    after that (REFRESH_DERIVED_CMDS).
+    """
+    tables = list(TABLES)
+    counts = dict.fromkeys(tables, 0)
+
+    with closing(connect()) as db_connection:
+        with db_connection.cursor() as cursor:
+            cursor.execute(FOREIGN_KEYS_CMD, [tables])
+            foreign_keys = cursor.fetchall()
+            cursor.execute(SECONDARY_INDEXES_CMD, [tables])
+            indexes = cursor.fetchall()
+
+            for table, name, _ in foreign_keys:
+                cursor.execute(sql.SQL(DROP_CONSTRAINT_CMD).format(
+                    table=sql.SQL(table),
+                    name=sql.Identifier(name)
+                ))
+            for index, _ in indexes:
+                cursor.execute(sql.SQL(DROP_INDEX_CMD).format(
+                    index=sql.SQL(index)
+                ))
+            for table in tables:
+                cursor.execute(sql.SQL(DISABLE_TRIGGERS_CMD).format(
+                    table=sql.Identifier(table)
+                ))
+        db_connection.commit()
+
+        try:
+            files = get_table_files(directory)
+            loaded = run_parallel(
+                commands=[
+                    lambda db_connection, table=table, path=path: copy_file(
+                        db_connection=db_connection,
+                        table=table,
+                        path=path
+                    ) for table, path in files
+                ],
+                jobs=jobs
+            )
+            for (table, _), count in zip(files, loaded):
+                counts[table] += count
+        finally:
+            run_parallel(
+                commands=[execute_cmd(cmd) for _, cmd in indexes],
+                jobs=jobs
+            )
+            run_parallel(
+                commands=[execute_cmd(cmd) for cmd in index_cmds],
+                jobs=jobs
+            )
+            with db_connection.cursor() as cursor:
+                for table, name, definition in foreign_keys:
+                    cursor.execute(sql.SQL(ADD_CONSTRAINT_CMD).format(
+                        table=sql.SQL(table),
+                        name=sql.Identifier(name),
+                        definition=sql.SQL(definition)
+                    ))
+                for table in tables:
+                    cursor.execute(sql.SQL(ENABLE_TRIGGERS_CMD).format(
+                        table=sql.Identifier(table)
+                    ))
+                    cursor.execute(
+                        sql.SQL(RESET_SEQUENCE_CMD).format(
+                            table=sql.Identifier(table)
+                        ),
+                        [table]
+                    )
+            db_connection.commit()
+
+        db_connection.autocommit = True
+        with db_connection.cursor() as cursor:
+            for table in tables:
+                cursor.execute(sql.SQL(ANALYZE_CMD).format(
+                    table=sql.Identifier(table)
+                ))
+
+    return counts
@@ -1,3 +1,70 @@
+from db import get_app_setting
+
+BUSINESS_TIME_ZONE = get_app_setting('TIME_ZONE')
+
+MATCH_PREDICATES = {
+    'exact': 'LOWER({column}) = LOWER({value})',
+    'fuzzy': 'LOWER({column}) % LOWER({value})',
+    'prefix': 'LOWER({column}) LIKE like_prefix({value})',
+}
+
+MATCH_FUNCTION_TEMPLATE = """
+    {header}
+    AS $$
+        SELECT * FROM ({prefix}
+        ) AS branch WHERE {mode} = 'prefix'
+        UNION ALL
+        SELECT * FROM ({fuzzy}
+        ) AS branch WHERE {mode} = 'fuzzy'
+        UNION ALL
+        SELECT * FROM ({exact}
+        ) AS branch WHERE COALESCE({mode}, '') NOT IN ('prefix', 'fuzzy');
+    $$
+
+    LANGUAGE SQL STABLE;
+"""
+
+
+def get_match_function(header: str, query: str, mode: str,
+                       columns: dict[str, tuple[str, str]]) -> str:
+    """
+    Get CREATE FUNCTION command with given header whose body runs query with
+    match predicates of the mode taken from given argument: 'exact',
+    'prefix' or 'fuzzy'. Every placeholder of columns in query is replaced
+    by predicate on (column, argument), so each branch is planned with its
+    own index: lower() expression index for exact match and trigram GIN
+    index for prefix and fuzzy match.
+    """
+    return MATCH_FUNCTION_TEMPLATE.format(
+        header=header.strip(),
+        mode=mode,
+        **{
+            match: query.rstrip().format(**{
+                key: predicate.format(column=column, value=value)
+                for key, (column, value) in columns.items()
+            }) for match, predicate in MATCH_PREDICATES.items()
+        }
+    )
+
+
+LIKE_PREFIX_CMD = r"""
+    CREATE OR REPLACE FUNCTION like_prefix(VARCHAR)
+        RETURNS TEXT
+    AS $$
+        SELECT replace(replace(replace(
+            LOWER($1), '\', '\\'), '%', '\%'), '_', '\_'
+        ) || '%';
+    $$
+
+    LANGUAGE SQL IMMUTABLE;
+"""
+
+DROP_EXACT_MATCH_FUNCTIONS_CMD = """
+    DROP FUNCTION IF EXISTS query_5(VARCHAR, VARCHAR);
+    DROP FUNCTION IF EXISTS query_6(VARCHAR, VARCHAR, DATE);
+    DROP FUNCTION IF EXISTS query_10(VARCHAR, VARCHAR);
+"""
+
 QUERY_1_CMD = """
     CREATE OR REPLACE FUNCTION query_1()
         RETURNS TABLE (
@@ -6,17 +73,15 @@ QUERY_1_CMD = """
             email VARCHAR
         )
     AS $$
-    BEGIN
-        RETURN QUERY
-            SELECT
-                owner.id,
-                owner.first_name,
-                owner.email
-            FROM
-                owner;
-    END; $$
+        SELECT
+            owner.id,
+            owner.first_name,
+            owner.email
+        FROM
+            owner;
+    $$
 
-    LANGUAGE 'plpgsql';
+    LANGUAGE SQL STABLE;
 """
 
 QUERY_2_CMD = """
@@ -27,19 +92,17 @@ QUERY_2_CMD = """
             max_capacity SMALLINT
         )
     AS $$
-    BEGIN
-        RETURN QUERY
-            SELECT
-                vehicle.id,
-                vehicle.brand,
-                vehicle.max_capacity
-            FROM
-                vehicle
-            WHERE
-                vehicle.max_capacity < 15;
-    END; $$
+        SELECT
+            vehicle.id,
+            vehicle.brand,
+            vehicle.max_capacity
+        FROM
+            vehicle
+        WHERE
+            vehicle.max_capacity < 15;
+    $$
 
-    LANGUAGE 'plpgsql';
+    LANGUAGE SQL STABLE;
 """
 
 QUERY_3_CMD = """
@@ -51,24 +114,22 @@ QUERY_3_CMD = """
             max_capacity INTEGER
         )
     AS $$
-    BEGIN
-        RETURN QUERY
-            SELECT
-                warehouse.id,
-                warehouse.name,
-                warehouse.address,
-                warehouse.max_capacity
-            FROM
-                warehouse
-            WHERE warehouse.max_capacity = (
-                SELECT MAX(warehouse.max_capacity) FROM warehouse
-            );
-    END; $$
+        SELECT
+            warehouse.id,
+            warehouse.name,
+            warehouse.address,
+            warehouse.max_capacity
+        FROM
+            warehouse
+        WHERE warehouse.max_capacity = (
+            SELECT MAX(warehouse.max_capacity) FROM warehouse
+        );
+    $$
 
-    LANGUAGE 'plpgsql';
+    LANGUAGE SQL STABLE;
 """
 
-QUERY_4_CMD = """
+QUERY_4_CMD = f"""
     CREATE OR REPLACE FUNCTION query_4(DATE)
         RETURNS TABLE (
             id INTEGER,
@@ -78,36 +139,37 @@ QUERY_4_CMD = """
             date_end TIMESTAMPTZ
         )
     AS $$
-    BEGIN
-        RETURN QUERY
-            SELECT
-                warehouse.id,
-                warehouse.name,
-                warehouse.address,
-                transit.date_start,
-                transit.date_end
-            FROM
-                transit
-            INNER JOIN
-                warehouse ON warehouse.id = transit.warehouse_id
-            WHERE
-                (transit.date_start AT TIME ZONE 'UTC')::date = $1;
-    END; $$
+        SELECT
+            warehouse.id,
+            warehouse.name,
+            warehouse.address,
+            transit.date_start,
+            transit.date_end
+        FROM
+            transit
+        INNER JOIN
+            warehouse ON warehouse.id = transit.warehouse_id
+        WHERE
+            transit.date_start >=
+                $1::timestamp AT TIME ZONE '{BUSINESS_TIME_ZONE}' AND
+            transit.date_start <
+                ($1 + 1)::timestamp AT TIME ZONE '{BUSINESS_TIME_ZONE}';
+    $$
 
-    LANGUAGE 'plpgsql';
+    LANGUAGE SQL STABLE;
 """
 
-QUERY_5_CMD = """
-    CREATE OR REPLACE FUNCTION query_5(VARCHAR, VARCHAR)
+QUERY_5_CMD = get_match_function(
+    header="""
+    CREATE OR REPLACE FUNCTION query_5(VARCHAR, VARCHAR, VARCHAR)
         RETURNS TABLE (
             id INTEGER,
             first_name VARCHAR,
             last_name VARCHAR,
             total_payload BIGINT
         )
-    AS $$
-    BEGIN
-        RETURN QUERY
+    """,
+    query="""
             SELECT
                 owner.id,
                 owner.first_name,
@@ -117,28 +179,31 @@ QUERY_5_CMD = """
                 warehouse
             INNER JOIN owner ON owner.id = warehouse.owner_id
             WHERE
-                LOWER(owner.first_name) = LOWER($1) AND
-                LOWER(owner.last_name) = LOWER($2)
-            GROUP BY owner.id;
-    END; $$
+                {first_name} AND
+                {last_name}
+            GROUP BY owner.id
+    """,
+    mode='$3',
+    columns={
+        'first_name': ('owner.first_name', '$1'),
+        'last_name': ('owner.last_name', '$2'),
+    }
+)
 
-    LANGUAGE 'plpgsql';
-"""
-
-QUERY_6_CMD = """
-    CREATE OR REPLACE FUNCTION query_6(VARCHAR, VARCHAR, DATE)
+QUERY_6_CMD = get_match_function(
+    header="""
+    CREATE OR REPLACE FUNCTION query_6(VARCHAR, VARCHAR, DATE, VARCHAR)
         RETURNS TABLE (
             id INTEGER,
             address VARCHAR,
             date DATE
         )
-    AS $$
-    BEGIN
-        RETURN QUERY
+    """,
+    query=f"""
             SELECT
                 warehouse.id,
                 warehouse.address,
-                transit.date_start::date
+                (transit.date_start AT TIME ZONE '{BUSINESS_TIME_ZONE}')::date
             FROM
                 warehouse
             INNER JOIN
@@ -150,15 +215,21 @@ QUERY_6_CMD = """
             INNER JOIN
                 owner ON owner.id = vehicle.owner_id
             WHERE
-                LOWER(owner.first_name) = LOWER($1) AND
-                LOWER(owner.last_name) = LOWER($2) AND
-                (transit.date_start AT TIME ZONE 'UTC')::date = $3;
-    END; $$
+                {{first_name}} AND
+                {{last_name}} AND
+                transit.date_start >=
+                    $3::timestamp AT TIME ZONE '{BUSINESS_TIME_ZONE}' AND
+                transit.date_start <
+                    ($3 + 1)::timestamp AT TIME ZONE '{BUSINESS_TIME_ZONE}'
+    """,
+    mode='$4',
+    columns={
+        'first_name': ('owner.first_name', '$1'),
+        'last_name': ('owner.last_name', '$2'),
+    }
+)
 
-    LANGUAGE 'plpgsql';
-"""
-
-QUERY_7_CMD = """
+QUERY_7_CMD = f"""
     CREATE OR REPLACE FUNCTION query_7(DATE)
         RETURNS TABLE (
             id INTEGER,
@@ -167,131 +238,143 @@ QUERY_7_CMD = """
             date_start TIMESTAMPTZ
         )
     AS $$
-    BEGIN
-        RETURN QUERY
-            SELECT
-                DISTINCT vehicle.id,
-                vehicle.brand,
-                vehicle.max_capacity,
-                order_table.date_start
-            FROM
-                vehicle
-            INNER JOIN
-                vehicle_order ON vehicle.id = vehicle_order.vehicle_id
-            INNER JOIN
-                order_table ON order_table.id = vehicle_order.order_id
-            WHERE
-                (order_table.date_start AT TIME ZONE 'UTC')::date = $1 AND
-                EXTRACT(HOUR FROM order_table.date_start AT TIME ZONE 'UTC') <= 17
-            ORDER BY
-                vehicle.max_capacity DESC;
-    END; $$
+        SELECT
+            DISTINCT vehicle.id,
+            vehicle.brand,
+            vehicle.max_capacity,
+            order_table.date_start
+        FROM
+            vehicle
+        INNER JOIN
+            vehicle_order ON vehicle.id = vehicle_order.vehicle_id
+        INNER JOIN
+            order_table ON order_table.id = vehicle_order.order_id
+        WHERE
+            order_table.date_start >=
+                $1::timestamp AT TIME ZONE '{BUSINESS_TIME_ZONE}' AND
+            order_table.date_start <
+                ($1 + INTERVAL '18 hours') AT TIME ZONE '{BUSINESS_TIME_ZONE}'
+        ORDER BY
+            vehicle.max_capacity DESC;
+    $$
 
-    LANGUAGE 'plpgsql';
+    LANGUAGE SQL STABLE;
 """
 
-QUERY_8_CMD = """
+QUERY_8_CMD = f"""
     CREATE OR REPLACE FUNCTION query_8(DATE)
         RETURNS TABLE (
             id INTEGER,
             address VARCHAR
         )
     AS $$
-    BEGIN
-        RETURN QUERY
+        SELECT
+            ranked.id,
+            ranked.address
+        FROM (
             SELECT
                 warehouse.id,
-                warehouse.address
+                warehouse.address,
+                rank() OVER (ORDER BY COUNT(*) ASC) AS ranking
             FROM
                 warehouse
             INNER JOIN
                 order_table ON order_table.warehouse_id = warehouse.id
             WHERE
-                (order_table.date_start AT TIME ZONE 'UTC')::date = $1
+                order_table.date_start >=
+                    $1::timestamp AT TIME ZONE '{BUSINESS_TIME_ZONE}' AND
+                order_table.date_start <
+                    ($1 + 1)::timestamp AT TIME ZONE '{BUSINESS_TIME_ZONE}'
             GROUP BY
                 warehouse.id
-            HAVING
-                COUNT(*) = (
-                    SELECT
-                        COUNT(*) AS cnt
-                    FROM
-                        order_table
-                    WHERE
-                        (order_table.date_start AT TIME ZONE 'UTC')::date = $1
-                    GROUP BY
-                        order_table.warehouse_id
-                    ORDER BY
-                        cnt ASC
-                    LIMIT 1
-                );
-    END; $$
+        ) AS ranked
+        WHERE
+            ranked.ranking = 1;
+    $$
 
-    LANGUAGE 'plpgsql';
+    LANGUAGE SQL STABLE;
 """
 
-QUERY_9_CMD = """
+QUERY_9_CMD = f"""
     CREATE OR REPLACE FUNCTION query_9(DATE)
         RETURNS TABLE (
             count BIGINT
         )
     AS $$
-    BEGIN
-        RETURN QUERY
-            SELECT
-                COUNT(*) as count
-            FROM
-                transit
-            WHERE
-                (transit.date_start AT TIME ZONE 'UTC')::date = $1
-                AND EXTRACT(epoch FROM transit.date_end - transit.date_start) > 10800;
-    END; $$
+        SELECT
+            COUNT(*) as count
+        FROM
+            transit
+        WHERE
+            transit.date_start >=
+                $1::timestamp AT TIME ZONE '{BUSINESS_TIME_ZONE}' AND
+            transit.date_start <
+                ($1 + 1)::timestamp AT TIME ZONE '{BUSINESS_TIME_ZONE}'
+            AND EXTRACT(
+                epoch FROM transit.date_end - transit.date_start
+            ) > 10800;
+    $$
 
-    LANGUAGE 'plpgsql';
+    LANGUAGE SQL STABLE;
 """
 
-QUERY_10_CMD = """
-    CREATE OR REPLACE FUNCTION query_10(VARCHAR, VARCHAR)
+QUERY_10_CMD = get_match_function(
+    header="""
+    DROP FUNCTION IF EXISTS query_10(VARCHAR, VARCHAR, VARCHAR);
+    CREATE FUNCTION query_10(VARCHAR, VARCHAR, VARCHAR)
         RETURNS TABLE (
+            warehouse_id INTEGER,
+            warehouse_name VARCHAR,
             id INTEGER,
             name VARCHAR,
             article_number INTEGER,
             payload INTEGER
         )
-    AS $$
-    BEGIN
-        RETURN QUERY
+    """,
+    query="""
             SELECT
-                product.id,
-                product.name,
-                product.article_number,
-                product_warehouse.payload
-            FROM
-                warehouse
-            INNER JOIN
-                product_warehouse ON product_warehouse.warehouse_id = warehouse.id
-            INNER JOIN
-                product ON product.id = product_warehouse.product_id
+                ranked.warehouse_id,
+                ranked.warehouse_name,
+                ranked.id,
+                ranked.name,
+                ranked.article_number,
+                ranked.payload
+            FROM (
+                SELECT
+                    warehouse.id AS warehouse_id,
+                    warehouse.name AS warehouse_name,
+                    product.id,
+                    product.name,
+                    product.article_number,
+                    product_warehouse.payload,
+                    rank() OVER (
+                        PARTITION BY warehouse.id
+                        ORDER BY product_warehouse.payload DESC
+                    ) AS ranking
+                FROM
+                    warehouse
+                INNER JOIN
+                    product_warehouse ON
+                        product_warehouse.warehouse_id = warehouse.id
+                INNER JOIN
+                    product ON product.id = product_warehouse.product_id
+                WHERE
+                    {name} AND
+                    {address}
+            ) AS ranked
             WHERE
-                product_warehouse.payload = (
-                    SELECT
-                        MAX(product_warehouse.payload)
-                    FROM
-                        warehouse
-                    INNER JOIN
-                        product_warehouse ON product_warehouse.warehouse_id = warehouse.id
-                    INNER JOIN
-                        product ON product.id = product_warehouse.product_id
-                    WHERE
-                        LOWER(warehouse.name) = LOWER($1)
-                        AND LOWER(warehouse.address) = LOWER($2)
-                ) AND LOWER(warehouse.name) = LOWER($1)
-                  AND LOWER(warehouse.address) = LOWER($2);
-    END; $$
-
-    LANGUAGE 'plpgsql';
-"""
+                ranked.ranking = 1
+    """,
+    mode='$3',
+    columns={
+        'address': ('warehouse.address', '$2'),
+        'name': ('warehouse.name', '$1'),
+    }
+)
 
 CREATE_FUNCTIONS = [
+    LIKE_PREFIX_CMD,
+    DROP_EXACT_MATCH_FUNCTIONS_CMD,
     QUERY_1_CMD,
     QUERY_2_CMD,
     QUERY_3_CMD,
@@ -14,11 +14,20 @@ WAREHOUSE_TABLE_CMD = """
         address VARCHAR(50) NOT NULL,
         max_capacity INTEGER NOT NULL,
         owner_id INTEGER NOT NULL,
+        current_load INTEGER NOT NULL DEFAULT 0,
+        unaccepted_transit_count INTEGER NOT NULL DEFAULT 0,
         FOREIGN KEY (owner_id) REFERENCES owner (id) ON DELETE CASCADE,
         CHECK(max_capacity > 0)
     );
 """
 
+WAREHOUSE_COUNTERS_CMD = """
+    ALTER TABLE warehouse
+        ADD COLUMN IF NOT EXISTS current_load INTEGER NOT NULL DEFAULT 0,
+        ADD COLUMN IF NOT EXISTS unaccepted_transit_count INTEGER NOT NULL
+            DEFAULT 0;
+"""
+
 VEHICLE_TABLE_CMD = """
     CREATE TABLE IF NOT EXISTS vehicle(
         id SERIAL PRIMARY KEY,
@@ -37,10 +46,17 @@ SHOP_TABLE_CMD = """
         address VARCHAR(50) NOT NULL,
         name VARCHAR(50) NOT NULL UNIQUE,
         owner_id INTEGER NOT NULL,
+        unaccepted_order_count INTEGER NOT NULL DEFAULT 0,
         FOREIGN KEY (owner_id) REFERENCES owner (id) ON DELETE CASCADE
     );
 """
 
+SHOP_COUNTERS_CMD = """
+    ALTER TABLE shop
+        ADD COLUMN IF NOT EXISTS unaccepted_order_count INTEGER NOT NULL
+            DEFAULT 0;
+"""
+
 PRODUCT_TABLE_CMD = """
     CREATE TABLE IF NOT EXISTS product(
         id SERIAL PRIMARY KEY,
@@ -136,6 +152,135 @@ VEHICLE_ORDER_TABLE_CMD = """
     );
 """
 
+STOCK_PROJECTION_TABLE_CMD = """
+    CREATE TABLE IF NOT EXISTS stock_projection(
+        warehouse_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        event_time TIMESTAMPTZ NOT NULL,
+        incoming INTEGER NOT NULL,
+        outgoing INTEGER NOT NULL,
+        FOREIGN KEY (warehouse_id) REFERENCES warehouse (id) ON DELETE CASCADE,
+        FOREIGN KEY (product_id) REFERENCES product (id) ON DELETE CASCADE,
+        PRIMARY KEY (warehouse_id, product_id, event_time)
+    );
+"""
+
+STOCK_EVENTS_VIEW_CMD = """
+    CREATE OR REPLACE VIEW stock_events AS
+        SELECT
+            transit.warehouse_id,
+            product_transit.product_id,
+            transit.date_end AS event_time,
+            product_transit.payload AS incoming,
+            0 AS outgoing
+        FROM
+            product_transit
+        INNER JOIN
+            transit ON transit.id = product_transit.transit_id
+        WHERE
+            NOT transit.accepted
+        UNION ALL
+        SELECT
+            order_table.warehouse_id,
+            product_order.product_id,
+            order_table.date_end AS event_time,
+            0 AS incoming,
+            product_order.payload AS outgoing
+        FROM
+            product_order
+        INNER JOIN
+            order_table ON order_table.id = product_order.order_id
+        WHERE
+            NOT order_table.accepted;
+"""
+
+BTREE_GIST_EXTENSION_CMD = """
+    CREATE EXTENSION IF NOT EXISTS btree_gist;
+"""
+
+PG_TRGM_EXTENSION_CMD = """
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+"""
+
+VEHICLE_BOOKING_TABLE_CMD = """
+    CREATE TABLE IF NOT EXISTS vehicle_booking(
+        id SERIAL PRIMARY KEY,
+        vehicle_id INTEGER NOT NULL,
+        order_id INTEGER,
+        transit_id INTEGER,
+        period TSTZRANGE NOT NULL,
+        FOREIGN KEY (vehicle_id) REFERENCES vehicle (id) ON DELETE CASCADE,
+        FOREIGN KEY (order_id) REFERENCES order_table (id) ON DELETE CASCADE,
+        FOREIGN KEY (transit_id) REFERENCES transit (id) ON DELETE CASCADE,
+        CHECK((order_id IS NULL) <> (transit_id IS NULL)),
+        UNIQUE(order_id, vehicle_id),
+        UNIQUE(transit_id, vehicle_id),
+        CONSTRAINT vehicle_booking_overlap
+            EXCLUDE USING gist (vehicle_id WITH =, period WITH &&)
+    );
+"""
+
+STOCK_RESERVATION_TABLE_CMD = """
+    CREATE TABLE IF NOT EXISTS stock_reservation(
+        product_order_id INTEGER PRIMARY KEY,
+        warehouse_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        payload INTEGER NOT NULL,
+        FOREIGN KEY (product_order_id) REFERENCES product_order (id)
+            ON DELETE CASCADE
+    );
+"""
+
+STOCK_RESERVED_TABLE_CMD = """
+    CREATE TABLE IF NOT EXISTS stock_reserved(
+        warehouse_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        reserved INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (warehouse_id) REFERENCES warehouse (id) ON DELETE CASCADE,
+        FOREIGN KEY (product_id) REFERENCES product (id) ON DELETE CASCADE,
+        PRIMARY KEY (warehouse_id, product_id),
+        CHECK(reserved >= 0)
+    );
+"""
+
+SLOW_REPORT_LOG_TABLE_CMD = """
+    CREATE TABLE IF NOT EXISTS slow_report_log(
+        id SERIAL PRIMARY KEY,
+        query_index SMALLINT NOT NULL,
+        args JSONB NOT NULL,
+        duration REAL NOT NULL,
+        row_count INTEGER NOT NULL,
+        plan TEXT,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+"""
+
+JOB_TABLE_CMD = """
+    CREATE TABLE IF NOT EXISTS job(
+        id SERIAL PRIMARY KEY,
+        kind VARCHAR(30) NOT NULL,
+        object_ids INTEGER[] NOT NULL,
+        status VARCHAR(10) NOT NULL DEFAULT 'queued',
+        processed INTEGER NOT NULL DEFAULT 0,
+        result JSONB NOT NULL DEFAULT '{}',
+        error TEXT,
+        attempts SMALLINT NOT NULL DEFAULT 0,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        started_at TIMESTAMPTZ,
+        heartbeat_at TIMESTAMPTZ,
+        finished_at TIMESTAMPTZ,
+        CHECK(status IN ('queued', 'running', 'done', 'failed')),
+        CHECK(processed BETWEEN 0 AND cardinality(object_ids))
+    );
+"""
+
+TABLE_VERSION_TABLE_CMD = """
+    CREATE TABLE IF NOT EXISTS table_version(
+        table_name VARCHAR(63) PRIMARY KEY,
+        version BIGINT NOT NULL
+    );
+"""
+
 PRODUCT_NAME_INDEX_CMD = """
     CREATE UNIQUE INDEX IF NOT EXISTS product_article_index ON product (
         name,
@@ -143,6 +288,82 @@ PRODUCT_NAME_INDEX_CMD = """
     );
 """
 
+PRODUCT_TRANSIT_PRODUCT_INDEX_CMD = """
+    CREATE INDEX IF NOT EXISTS product_transit_product_index
+        ON product_transit (product_id);
+"""
+
+PRODUCT_ORDER_PRODUCT_INDEX_CMD = """
+    CREATE INDEX IF NOT EXISTS product_order_product_index
+        ON product_order (product_id);
+"""
+
+TRANSIT_UNACCEPTED_INDEX_CMD = """
+    CREATE INDEX IF NOT EXISTS transit_unaccepted_index ON transit (
+        warehouse_id
+    ) WHERE NOT accepted;
+"""
+
+ORDER_UNACCEPTED_INDEX_CMD = """
+    CREATE INDEX IF NOT EXISTS order_unaccepted_index ON order_table (
+        warehouse_id
+    ) WHERE NOT accepted;
+"""
+
+TRANSIT_DATE_START_INDEX_CMD = """
+    CREATE INDEX IF NOT EXISTS transit_date_start_index
+        ON transit (date_start);
+"""
+
+ORDER_DATE_START_INDEX_CMD = """
+    CREATE INDEX IF NOT EXISTS order_date_start_index
+        ON order_table (date_start);
+"""
+
+OWNER_NAME_LOWER_INDEX_CMD = """
+    CREATE INDEX IF NOT EXISTS owner_name_lower_index ON owner (
+        LOWER(first_name),
+        LOWER(last_name)
+    );
+"""
+
+WAREHOUSE_NAME_LOWER_INDEX_CMD = """
+    CREATE INDEX IF NOT EXISTS warehouse_name_lower_index ON warehouse (
+        LOWER(name),
+        LOWER(address)
+    );
+"""
+
+OWNER_FIRST_NAME_TRGM_INDEX_CMD = """
+    CREATE INDEX IF NOT EXISTS owner_first_name_trgm_index
+        ON owner USING gin (LOWER(first_name) gin_trgm_ops);
+"""
+
+OWNER_LAST_NAME_TRGM_INDEX_CMD = """
+    CREATE INDEX IF NOT EXISTS owner_last_name_trgm_index
+        ON owner USING gin (LOWER(last_name) gin_trgm_ops);
+"""
+
+WAREHOUSE_NAME_TRGM_INDEX_CMD = """
+    CREATE INDEX IF NOT EXISTS warehouse_name_trgm_index
+        ON warehouse USING gin (LOWER(name) gin_trgm_ops);
+"""
+
+WAREHOUSE_ADDRESS_TRGM_INDEX_CMD = """
+    CREATE INDEX IF NOT EXISTS warehouse_address_trgm_index
+        ON warehouse USING gin (LOWER(address) gin_trgm_ops);
+"""
+
+SLOW_REPORT_LOG_CREATED_AT_INDEX_CMD = """
+    CREATE INDEX IF NOT EXISTS slow_report_log_created_at_index
+        ON slow_report_log (created_at);
+"""
+
+JOB_PENDING_INDEX_CMD = """
+    CREATE INDEX IF NOT EXISTS job_pending_index
+        ON job (id) WHERE status IN ('queued', 'running');
+"""
+
 CREATE_TABLES_CMDS = [
     OWNER_TABLE_CMD,
     WAREHOUSE_TABLE_CMD,
@@ -155,9 +376,35 @@ CREATE_TABLES_CMDS = [
     VEHICLE_TRANSIT_TABLE_CMD,
     PRODUCT_TRANSIT_TABLE_CMD,
     PRODUCT_WAREHOUSE_CMD,
-    VEHICLE_ORDER_TABLE_CMD
+    VEHICLE_ORDER_TABLE_CMD,
+    WAREHOUSE_COUNTERS_CMD,
+    SHOP_COUNTERS_CMD,
+    STOCK_PROJECTION_TABLE_CMD,
+    STOCK_EVENTS_VIEW_CMD,
+    BTREE_GIST_EXTENSION_CMD,
+    VEHICLE_BOOKING_TABLE_CMD,
+    PG_TRGM_EXTENSION_CMD,
+    STOCK_RESERVATION_TABLE_CMD,
+    STOCK_RESERVED_TABLE_CMD,
+    SLOW_REPORT_LOG_TABLE_CMD,
+    JOB_TABLE_CMD,
+    TABLE_VERSION_TABLE_CMD
 ]
 
 CREATE_INDEXES_CMDS = [
-    PRODUCT_NAME_INDEX_CMD
+    PRODUCT_NAME_INDEX_CMD,
+    PRODUCT_TRANSIT_PRODUCT_INDEX_CMD,
+    PRODUCT_ORDER_PRODUCT_INDEX_CMD,
+    TRANSIT_UNACCEPTED_INDEX_CMD,
+    ORDER_UNACCEPTED_INDEX_CMD,
+    TRANSIT_DATE_START_INDEX_CMD,
+    ORDER_DATE_START_INDEX_CMD,
+    OWNER_NAME_LOWER_INDEX_CMD,
+    WAREHOUSE_NAME_LOWER_INDEX_CMD,
+    OWNER_FIRST_NAME_TRGM_INDEX_CMD,
+    OWNER_LAST_NAME_TRGM_INDEX_CMD,
+    WAREHOUSE_NAME_TRGM_INDEX_CMD,
+    WAREHOUSE_ADDRESS_TRGM_INDEX_CMD,
+    SLOW_REPORT_LOG_CREATED_AT_INDEX_CMD,
+    JOB_PENDING_INDEX_CMD
 ]
@@ -0,0 +1,840 @@
+COUNTER_FUNCTION_TEMPLATE = """
+    CREATE OR REPLACE FUNCTION {name}()
+        RETURNS TRIGGER
+    AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE
+                {target}
+            SET
+                {column} = {target}.{column} + diff.value
+            FROM (
+                SELECT
+                    {fk},
+                    SUM({value}) AS value
+                FROM
+                    new_rows
+                GROUP BY
+                    {fk}
+            ) AS diff
+            WHERE
+                {target}.id = diff.{fk} AND
+                diff.value <> 0;
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE
+                {target}
+            SET
+                {column} = {target}.{column} - diff.value
+            FROM (
+                SELECT
+                    {fk},
+                    SUM({value}) AS value
+                FROM
+                    old_rows
+                GROUP BY
+                    {fk}
+            ) AS diff
+            WHERE
+                {target}.id = diff.{fk} AND
+                diff.value <> 0;
+        ELSE
+            UPDATE
+                {target}
+            SET
+                {column} = {target}.{column} + diff.value
+            FROM (
+                SELECT
+                    changes.{fk},
+                    SUM(changes.value) AS value
+                FROM (
+                    SELECT {fk}, {value} AS value FROM new_rows
+                    UNION ALL
+                    SELECT {fk}, -({value}) AS value FROM old_rows
+                ) AS changes
+                GROUP BY
+                    changes.{fk}
+            ) AS diff
+            WHERE
+                {target}.id = diff.{fk} AND
+                diff.value <> 0;
+        END IF;
+
+        RETURN NULL;
+    END; $$
+
+    LANGUAGE 'plpgsql';
+"""
+
+STATEMENT_TRIGGERS_TEMPLATE = """
+    DROP TRIGGER IF EXISTS {name}_insert ON {source};
+    CREATE TRIGGER {name}_insert
+        AFTER INSERT ON {source}
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION {name}();
+
+    DROP TRIGGER IF EXISTS {name}_update ON {source};
+    CREATE TRIGGER {name}_update
+        AFTER UPDATE ON {source}
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION {name}();
+
+    DROP TRIGGER IF EXISTS {name}_delete ON {source};
+    CREATE TRIGGER {name}_delete
+        AFTER DELETE ON {source}
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION {name}();
+"""
+
+
+def get_counter_cmds(name: str, source: str, target: str, column: str,
+                     fk: str, value: str) -> list[str]:
+    """
+    Get commands that create a function and statement level triggers keeping
+    target.column equal to the sum of value expression over source rows
+    referencing target row by fk column.
+
+    For example, if source is 'product_warehouse', target is 'warehouse',
+    column is 'current_load', fk is 'warehouse_id' and value is 'payload',
+    every INSERT, UPDATE or DELETE on product_warehouse will add the sum of
+    changed payloads per warehouse to warehouse.current_load.
+    """
+    params = {
+        'name': name,
+        'source': source,
+        'target': target,
+        'column': column,
+        'fk': fk,
+        'value': value
+    }
+
+    return [
+        COUNTER_FUNCTION_TEMPLATE.format(**params),
+        STATEMENT_TRIGGERS_TEMPLATE.format(**params)
+    ]
+
+
+WAREHOUSE_LOAD_CMDS = get_counter_cmds(
+    name='count_warehouse_load',
+    source='product_warehouse',
+    target='warehouse',
+    column='current_load',
+    fk='warehouse_id',
+    value='payload'
+)
+
+WAREHOUSE_UNACCEPTED_TRANSITS_CMDS = get_counter_cmds(
+    name='count_warehouse_unaccepted_transits',
+    source='transit',
+    target='warehouse',
+    column='unaccepted_transit_count',
+    fk='warehouse_id',
+    value='(NOT accepted)::INTEGER'
+)
+
+SHOP_UNACCEPTED_ORDERS_CMDS = get_counter_cmds(
+    name='count_shop_unaccepted_orders',
+    source='order_table',
+    target='shop',
+    column='unaccepted_order_count',
+    fk='shop_id',
+    value='(NOT accepted)::INTEGER'
+)
+
+REFRESH_WAREHOUSE_COUNTERS_CMD = """
+    UPDATE
+        warehouse
+    SET
+        current_load = COALESCE((
+            SELECT
+                SUM(product_warehouse.payload)
+            FROM
+                product_warehouse
+            WHERE
+                product_warehouse.warehouse_id = warehouse.id
+        ), 0),
+        unaccepted_transit_count = (
+            SELECT
+                COUNT(*)
+            FROM
+                transit
+            WHERE
+                transit.warehouse_id = warehouse.id AND
+                NOT transit.accepted
+        );
+"""
+
+REFRESH_SHOP_COUNTERS_CMD = """
+    UPDATE
+        shop
+    SET
+        unaccepted_order_count = (
+            SELECT
+                COUNT(*)
+            FROM
+                order_table
+            WHERE
+                order_table.shop_id = shop.id AND
+                NOT order_table.accepted
+        );
+"""
+
+REFRESH_STOCK_PROJECTION_FUNCTION_CMD = """
+    CREATE OR REPLACE FUNCTION refresh_stock_projection(INTEGER, INTEGER)
+        RETURNS VOID
+    AS $$
+    BEGIN
+        PERFORM pg_advisory_xact_lock($1, $2);
+
+        DELETE FROM
+            stock_projection
+        WHERE
+            stock_projection.warehouse_id = $1 AND
+            stock_projection.product_id = $2;
+
+        INSERT INTO
+            stock_projection (
+                warehouse_id,
+                product_id,
+                event_time,
+                incoming,
+                outgoing
+            )
+        SELECT
+            $1,
+            $2,
+            stock_events.event_time,
+            SUM(SUM(stock_events.incoming)) OVER (
+                ORDER BY stock_events.event_time
+            ),
+            SUM(SUM(stock_events.outgoing)) OVER (
+                ORDER BY stock_events.event_time
+            )
+        FROM
+            stock_events
+        WHERE
+            stock_events.warehouse_id = $1 AND
+            stock_events.product_id = $2
+        GROUP BY
+            stock_events.event_time;
+    END; $$
+
+    LANGUAGE 'plpgsql';
+"""
+
+REBUILD_STOCK_PROJECTION_FUNCTION_CMD = """
+    CREATE OR REPLACE FUNCTION rebuild_stock_projection()
+        RETURNS VOID
+    AS $$
+    BEGIN
+        TRUNCATE stock_projection;
+
+        INSERT INTO
+            stock_projection (
+                warehouse_id,
+                product_id,
+                event_time,
+                incoming,
+                outgoing
+            )
+        SELECT
+            stock_events.warehouse_id,
+            stock_events.product_id,
+            stock_events.event_time,
+            SUM(SUM(stock_events.incoming)) OVER key_window,
+            SUM(SUM(stock_events.outgoing)) OVER key_window
+        FROM
+            stock_events
+        GROUP BY
+            stock_events.warehouse_id,
+            stock_events.product_id,
+            stock_events.event_time
+        WINDOW key_window AS (
+            PARTITION BY
+                stock_events.warehouse_id,
+                stock_events.product_id
+            ORDER BY
+                stock_events.event_time
+        );
+    END; $$
+
+    LANGUAGE 'plpgsql';
+"""
+
+LINES_PROJECTION_LOOP_TEMPLATE = """
+            FOR stock_key IN
+                SELECT DISTINCT
+                    {parent}.warehouse_id,
+                    changes.product_id
+                FROM (
+                    {changes}
+                ) AS changes
+                INNER JOIN
+                    {parent} ON {parent}.id = changes.{fk}
+                ORDER BY
+                    {parent}.warehouse_id,
+                    changes.product_id
+            LOOP
+                PERFORM refresh_stock_projection(
+                    stock_key.warehouse_id,
+                    stock_key.product_id
+                );
+            END LOOP;
+"""
+
+LINES_PROJECTION_FUNCTION_TEMPLATE = """
+    CREATE OR REPLACE FUNCTION {name}()
+        RETURNS TRIGGER
+    AS $$
+    DECLARE
+        stock_key RECORD;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            {insert_loop}
+        ELSIF TG_OP = 'DELETE' THEN
+            {delete_loop}
+        ELSE
+            {update_loop}
+        END IF;
+
+        RETURN NULL;
+    END; $$
+
+    LANGUAGE 'plpgsql';
+"""
+
+PARENT_PROJECTION_FUNCTION_TEMPLATE = """
+    CREATE OR REPLACE FUNCTION {name}()
+        RETURNS TRIGGER
+    AS $$
+    DECLARE
+        stock_key RECORD;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            FOR stock_key IN
+                SELECT DISTINCT
+                    stock_projection.warehouse_id,
+                    stock_projection.product_id
+                FROM
+                    old_rows
+                INNER JOIN
+                    stock_projection ON
+                        stock_projection.warehouse_id = old_rows.warehouse_id
+                        AND stock_projection.event_time = old_rows.date_end
+                ORDER BY
+                    stock_projection.warehouse_id,
+                    stock_projection.product_id
+            LOOP
+                PERFORM refresh_stock_projection(
+                    stock_key.warehouse_id,
+                    stock_key.product_id
+                );
+            END LOOP;
+        ELSE
+            FOR stock_key IN
+                SELECT DISTINCT
+                    warehouses.warehouse_id,
+                    {lines}.product_id
+                FROM
+                    new_rows
+                INNER JOIN
+                    old_rows ON old_rows.id = new_rows.id
+                CROSS JOIN LATERAL (
+                    VALUES (new_rows.warehouse_id), (old_rows.warehouse_id)
+                ) AS warehouses (warehouse_id)
+                INNER JOIN
+                    {lines} ON {lines}.{fk} = new_rows.id
+                WHERE
+                    (new_rows.accepted, new_rows.date_end,
+                     new_rows.warehouse_id) IS DISTINCT FROM
+                    (old_rows.accepted, old_rows.date_end,
+                     old_rows.warehouse_id)
+                ORDER BY
+                    warehouses.warehouse_id,
+                    {lines}.product_id
+            LOOP
+                PERFORM refresh_stock_projection(
+                    stock_key.warehouse_id,
+                    stock_key.product_id
+                );
+            END LOOP;
+        END IF;
+
+        RETURN NULL;
+    END; $$
+
+    LANGUAGE 'plpgsql';
+"""
+
+PARENT_TRIGGERS_TEMPLATE = """
+    DROP TRIGGER IF EXISTS {name}_update ON {source};
+    CREATE TRIGGER {name}_update
+        AFTER UPDATE ON {source}
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION {name}();
+
+    DROP TRIGGER IF EXISTS {name}_delete ON {source};
+    CREATE TRIGGER {name}_delete
+        AFTER DELETE ON {source}
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION {name}();
+"""
+
+
+def get_projection_cmds(name: str, parent: str, lines: str,
+                        fk: str) -> list[str]:
+    """
+    Get commands that create functions and statement level triggers keeping
+    stock_projection rows up to date with lines (products) of parent (transit
+    or order) table.
+
+    Only (warehouse, product) pairs touched by a statement are recalculated,
+    for example, accepting orders #1 and #2 with products 3 and 5 from
+    warehouse 1 refreshes pairs (1, 3) and (1, 5) once per statement.
+
+    Every pair is refreshed under a transaction-level advisory lock on
+    (warehouse_id, product_id), taken in the order of pairs, so concurrent
+    statements touching the same pair rebuild its rows one after another.
+    """
+    lines_name = f'{name}_lines'
+    params = {'name': name, 'parent': parent, 'lines': lines, 'fk': fk}
+    new_rows = f'SELECT {fk}, product_id FROM new_rows'
+    old_rows = f'SELECT {fk}, product_id FROM old_rows'
+    loops = {
+        f'{op}_loop': LINES_PROJECTION_LOOP_TEMPLATE.strip().format(
+            changes=changes,
+            **params
+        ) for op, changes in (
+            ('insert', new_rows),
+            ('delete', old_rows),
+            ('update', f'{new_rows} UNION {old_rows}')
+        )
+    }
+
+    return [
+        LINES_PROJECTION_FUNCTION_TEMPLATE.format(name=lines_name, **loops),
+        STATEMENT_TRIGGERS_TEMPLATE.format(name=lines_name, source=lines),
+        PARENT_PROJECTION_FUNCTION_TEMPLATE.format(**params),
+        PARENT_TRIGGERS_TEMPLATE.format(name=name, source=parent)
+    ]
+
+
+TRANSIT_PROJECTION_CMDS = get_projection_cmds(
+    name='project_transit_stock',
+    parent='transit',
+    lines='product_transit',
+    fk='transit_id'
+)
+
+ORDER_PROJECTION_CMDS = get_projection_cmds(
+    name='project_order_stock',
+    parent='order_table',
+    lines='product_order',
+    fk='order_id'
+)
+
+REBUILD_STOCK_PROJECTION_CMD = """
+    SELECT rebuild_stock_projection();
+"""
+
+VEHICLE_LINES_BOOKING_FUNCTION_TEMPLATE = """
+    CREATE OR REPLACE FUNCTION {name}()
+        RETURNS TRIGGER
+    AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM
+                vehicle_booking
+            USING
+                old_rows
+            WHERE
+                vehicle_booking.{fk} = old_rows.{fk} AND
+                vehicle_booking.vehicle_id = old_rows.vehicle_id;
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO
+                vehicle_booking (vehicle_id, {fk}, period)
+            SELECT
+                new_rows.vehicle_id,
+                {parent}.id,
+                tstzrange({parent}.date_start, {parent}.date_end, '[]')
+            FROM
+                new_rows
+            INNER JOIN
+                {parent} ON {parent}.id = new_rows.{fk}
+            WHERE
+                NOT {parent}.accepted;
+        END IF;
+
+        RETURN NULL;
+    END; $$
+
+    LANGUAGE 'plpgsql';
+"""
+
+PARENT_BOOKING_FUNCTION_TEMPLATE = """
+    CREATE OR REPLACE FUNCTION {name}()
+        RETURNS TRIGGER
+    AS $$
+    BEGIN
+        DELETE FROM
+            vehicle_booking
+        USING
+            new_rows
+        WHERE
+            vehicle_booking.{fk} = new_rows.id AND
+            new_rows.accepted;
+
+        UPDATE
+            vehicle_booking
+        SET
+            period = tstzrange(new_rows.date_start, new_rows.date_end, '[]')
+        FROM
+            new_rows
+        WHERE
+            vehicle_booking.{fk} = new_rows.id AND
+            NOT new_rows.accepted AND
+            vehicle_booking.period <> tstzrange(
+                new_rows.date_start,
+                new_rows.date_end,
+                '[]'
+            );
+
+        INSERT INTO
+            vehicle_booking (vehicle_id, {fk}, period)
+        SELECT
+            {lines}.vehicle_id,
+            new_rows.id,
+            tstzrange(new_rows.date_start, new_rows.date_end, '[]')
+        FROM
+            new_rows
+        INNER JOIN
+            old_rows ON old_rows.id = new_rows.id
+        INNER JOIN
+            {lines} ON {lines}.{fk} = new_rows.id
+        WHERE
+            old_rows.accepted AND
+            NOT new_rows.accepted;
+
+        RETURN NULL;
+    END; $$
+
+    LANGUAGE 'plpgsql';
+"""
+
+PARENT_UPDATE_TRIGGER_TEMPLATE = """
+    DROP TRIGGER IF EXISTS {name}_update ON {source};
+    CREATE TRIGGER {name}_update
+        AFTER UPDATE ON {source}
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION {name}();
+"""
+
+
+def get_booking_cmds(name: str, parent: str, lines: str,
+                     fk: str) -> list[str]:
+    """
+    Get commands that create functions and statement level triggers keeping
+    vehicle_booking rows equal to vehicles of unaccepted parent (transit or
+    order) rows with their time ranges.
+    """
+    lines_name = f'{name}_lines'
+    params = {'parent': parent, 'lines': lines, 'fk': fk}
+
+    return [
+        VEHICLE_LINES_BOOKING_FUNCTION_TEMPLATE.format(
+            name=lines_name,
+            **params
+        ),
+        STATEMENT_TRIGGERS_TEMPLATE.format(name=lines_name, source=lines),
+        PARENT_BOOKING_FUNCTION_TEMPLATE.format(name=name, **params),
+        PARENT_UPDATE_TRIGGER_TEMPLATE.format(name=name, source=parent)
+    ]
+
+
+TRANSIT_BOOKING_CMDS = get_booking_cmds(
+    name='book_transit_vehicles',
+    parent='transit',
+    lines='vehicle_transit',
+    fk='transit_id'
+)
+
+ORDER_BOOKING_CMDS = get_booking_cmds(
+    name='book_order_vehicles',
+    parent='order_table',
+    lines='vehicle_order',
+    fk='order_id'
+)
+
+REBUILD_VEHICLE_BOOKING_CMD = """
+    TRUNCATE vehicle_booking;
+
+    INSERT INTO
+        vehicle_booking (vehicle_id, transit_id, period)
+    SELECT
+        vehicle_transit.vehicle_id,
+        transit.id,
+        tstzrange(transit.date_start, transit.date_end, '[]')
+    FROM
+        vehicle_transit
+    INNER JOIN
+        transit ON transit.id = vehicle_transit.transit_id
+    WHERE
+        NOT transit.accepted;
+
+    INSERT INTO
+        vehicle_booking (vehicle_id, order_id, period)
+    SELECT
+        vehicle_order.vehicle_id,
+        order_table.id,
+        tstzrange(order_table.date_start, order_table.date_end, '[]')
+    FROM
+        vehicle_order
+    INNER JOIN
+        order_table ON order_table.id = vehicle_order.order_id
+    WHERE
+        NOT order_table.accepted;
+"""
+
+RESERVATION_LINES_FUNCTION_TEMPLATE = """
+    CREATE OR REPLACE FUNCTION {name}()
+        RETURNS TRIGGER
+    AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM
+                stock_reservation
+            USING
+                old_rows
+            WHERE
+                stock_reservation.product_order_id = old_rows.id;
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO
+                stock_reservation (
+                    product_order_id,
+                    warehouse_id,
+                    product_id,
+                    payload
+                )
+            SELECT
+                new_rows.id,
+                order_table.warehouse_id,
+                new_rows.product_id,
+                new_rows.payload
+            FROM
+                new_rows
+            INNER JOIN
+                order_table ON order_table.id = new_rows.order_id
+            WHERE
+                NOT order_table.accepted;
+        END IF;
+
+        RETURN NULL;
+    END; $$
+
+    LANGUAGE 'plpgsql';
+"""
+
+RESERVATION_PARENT_FUNCTION_TEMPLATE = """
+    CREATE OR REPLACE FUNCTION {name}()
+        RETURNS TRIGGER
+    AS $$
+    BEGIN
+        DELETE FROM
+            stock_reservation
+        USING
+            product_order,
+            new_rows
+        WHERE
+            stock_reservation.product_order_id = product_order.id AND
+            product_order.order_id = new_rows.id AND
+            new_rows.accepted;
+
+        UPDATE
+            stock_reservation
+        SET
+            warehouse_id = new_rows.warehouse_id
+        FROM
+            product_order,
+            new_rows
+        WHERE
+            stock_reservation.product_order_id = product_order.id AND
+            product_order.order_id = new_rows.id AND
+            NOT new_rows.accepted AND
+            stock_reservation.warehouse_id <> new_rows.warehouse_id;
+
+        INSERT INTO
+            stock_reservation (
+                product_order_id,
+                warehouse_id,
+                product_id,
+                payload
+            )
+        SELECT
+            product_order.id,
+            new_rows.warehouse_id,
+            product_order.product_id,
+            product_order.payload
+        FROM
+            new_rows
+        INNER JOIN
+            old_rows ON old_rows.id = new_rows.id
+        INNER JOIN
+            product_order ON product_order.order_id = new_rows.id
+        WHERE
+            old_rows.accepted AND
+            NOT new_rows.accepted;
+
+        RETURN NULL;
+    END; $$
+
+    LANGUAGE 'plpgsql';
+"""
+
+RESERVED_COUNTER_TEMPLATE = """
+            INSERT INTO
+                stock_reserved (warehouse_id, product_id)
+            SELECT DISTINCT
+                changes.warehouse_id,
+                changes.product_id
+            FROM (
+                {changes}
+            ) AS changes
+            ORDER BY
+                changes.warehouse_id,
+                changes.product_id
+            ON CONFLICT (warehouse_id, product_id) DO NOTHING;
+
+            UPDATE
+                stock_reserved
+            SET
+                reserved = stock_reserved.reserved + diff.value
+            FROM (
+                SELECT
+                    changes.warehouse_id,
+                    changes.product_id,
+                    SUM(changes.value) AS value
+                FROM (
+                    {changes}
+                ) AS changes
+                GROUP BY
+                    changes.warehouse_id,
+                    changes.product_id
+            ) AS diff
+            WHERE
+                stock_reserved.warehouse_id = diff.warehouse_id AND
+                stock_reserved.product_id = diff.product_id AND
+                diff.value <> 0;
+"""
+
+RESERVED_COUNTER_FUNCTION_TEMPLATE = """
+    CREATE OR REPLACE FUNCTION {name}()
+        RETURNS TRIGGER
+    AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            {insert_counter}
+        ELSIF TG_OP = 'DELETE' THEN
+            {delete_counter}
+        ELSE
+            {update_counter}
+        END IF;
+
+        RETURN NULL;
+    END; $$
+
+    LANGUAGE 'plpgsql';
+"""
+
+
+def get_reservation_cmds(name: str) -> list[str]:
+    """
+    Get commands that create functions and statement level triggers keeping
+    stock_reservation rows equal to lines of unaccepted orders and
+    stock_reserved.reserved equal to the sum of their payloads per
+    (warehouse, product) pair.
+
+    Accepting or deleting an order releases its lines, so stock_reserved
+    only holds products promised to unaccepted orders. Rows of
+    stock_reserved are created on demand and never deleted, so they can be
+    locked before the first reservation of the pair.
+    """
+    lines_name = f'{name}_lines'
+    counter_name = f'{name}_count'
+    new_rows = (
+        'SELECT warehouse_id, product_id, payload AS value FROM new_rows'
+    )
+    old_rows = (
+        'SELECT warehouse_id, product_id, -payload AS value FROM old_rows'
+    )
+    counters = {
+        f'{op}_counter': RESERVED_COUNTER_TEMPLATE.strip().format(
+            changes=changes
+        ) for op, changes in (
+            ('insert', new_rows),
+            ('delete', old_rows),
+            ('update', f'{new_rows} UNION ALL {old_rows}')
+        )
+    }
+
+    return [
+        RESERVATION_LINES_FUNCTION_TEMPLATE.format(name=lines_name),
+        STATEMENT_TRIGGERS_TEMPLATE.format(
+            name=lines_name,
+            source='product_order'
+        ),
+        RESERVATION_PARENT_FUNCTION_TEMPLATE.format(name=name),
+        PARENT_UPDATE_TRIGGER_TEMPLATE.format(name=name, source='order_table'),
+        RESERVED_COUNTER_FUNCTION_TEMPLATE.format(
+            name=counter_name,
+            **counters
+        ),
+        STATEMENT_TRIGGERS_TEMPLATE.format(
+            name=counter_name,
+            source='stock_reservation'
+        )
+    ]
+
+
+ORDER_RESERVATION_CMDS = get_reservation_cmds(name='reserve_order_stock')
+
+REBUILD_STOCK_RESERVATION_CMD = """
+    TRUNCATE stock_reservation, stock_reserved;
+
+    INSERT INTO
+        stock_reservation (product_order_id, warehouse_id, product_id, payload)
+    SELECT
+        product_order.id,
+        order_table.warehouse_id,
+        product_order.product_id,
+        product_order.payload
+    FROM
+        product_order
+    INNER JOIN
+        order_table ON order_table.id = product_order.order_id
+    WHERE
+        NOT order_table.accepted;
+"""
+
+CREATE_TRIGGERS_CMDS = [
+    *WAREHOUSE_LOAD_CMDS,
+    *WAREHOUSE_UNACCEPTED_TRANSITS_CMDS,
+    *SHOP_UNACCEPTED_ORDERS_CMDS,
+    REFRESH_STOCK_PROJECTION_FUNCTION_CMD,
+    REBUILD_STOCK_PROJECTION_FUNCTION_CMD,
+    *TRANSIT_PROJECTION_CMDS,
+    *ORDER_PROJECTION_CMDS,
+    *TRANSIT_BOOKING_CMDS,
+    *ORDER_BOOKING_CMDS,
+    *ORDER_RESERVATION_CMDS
+]
+
+REFRESH_DERIVED_CMDS = [
+    REFRESH_WAREHOUSE_COUNTERS_CMD,
+    REFRESH_SHOP_COUNTERS_CMD,
+    REBUILD_STOCK_PROJECTION_CMD,
+    REBUILD_VEHICLE_BOOKING_CMD,
+    REBUILD_STOCK_RESERVATION_CMD
+]
@@ -1,18 +1,17 @@
-import os
+import argparse
 from contextlib import closing
+from pathlib import Path
 
-import psycopg2
-from dotenv import load_dotenv
 from psycopg2.extensions import connection
 
+from bulk_load import bulk_load
 from create_functions import CREATE_FUNCTIONS
 from create_tables import CREATE_INDEXES_CMDS, CREATE_TABLES_CMDS
+from create_triggers import CREATE_TRIGGERS_CMDS, REFRESH_DERIVED_CMDS
+from db import connect
 from fixtures import LOAD_DATA_CMDS
-from pathlib import Path
-
-DOTENV_PATH = Path(__file__).resolve().parent.parent.joinpath('.env')
-
-load_dotenv(dotenv_path=DOTENV_PATH)
+from ledger import (apply_changed, apply_indexes, apply_once, get_ledger,
+                    record_all)
 
 
 def create(db_connection: connection, commands: list[str]) -> None:
@@ -23,17 +22,80 @@ def create(db_connection: connection, commands: list[str]) -> None:
 
 
 def main() -> None:
-    with closing(psycopg2.connect(
-        database=os.getenv('DB_NAME'),
-        user=os.getenv('POSTGRES_USER'),
-        password=os.getenv('POSTGRES_PASSWORD'),
-        host=os.getenv('DB_HOST'),
-        port=os.getenv('DB_PORT'))
-    ) as connection:
-        create(commands=CREATE_TABLES_CMDS, db_connection=connection)
-        create(commands=CREATE_INDEXES_CMDS, db_connection=connection)
-        create(commands=LOAD_DATA_CMDS, db_connection=connection)
-        create(commands=CREATE_FUNCTIONS, db_connection=connection)
+    parser = argparse.ArgumentParser(
+        description='Создает схему БД и загружает в нее тестовые данные или '
+                    'данные из CSV-файлов (см. generate_data.py).'
+    )
+    parser.add_argument(
+        '--data',
+        type=Path,
+        help='Каталог с файлами данных по таблицам. Данные загружаются '
+             'через COPY в пустые таблицы вместо тестовых данных.'
+    )
+    parser.add_argument(
+        '--jobs',
+        default=4,
+        type=int,
+        help='Количество параллельных соединений загрузки.'
+    )
+    args = parser.parse_args()
+
+    with closing(connect()) as connection:
+        ledger = get_ledger(db_connection=connection)
+        applied = apply_changed(
+            commands=CREATE_TABLES_CMDS,
+            db_connection=connection,
+            ledger=ledger
+        )
+        if args.data is None:
+            applied += apply_indexes(
+                commands=CREATE_INDEXES_CMDS,
+                db_connection=connection,
+                ledger=ledger
+            )
+            triggers = apply_changed(
+                commands=CREATE_TRIGGERS_CMDS,
+                db_connection=connection,
+                ledger=ledger
+            )
+            loaded = apply_once(
+                commands=LOAD_DATA_CMDS,
+                db_connection=connection,
+                ledger=ledger,
+                name='load fixtures'
+            )
+        else:
+            triggers = apply_changed(
+                commands=CREATE_TRIGGERS_CMDS,
+                db_connection=connection,
+                ledger=ledger
+            )
+            for table, count in bulk_load(
+                directory=args.data,
+                jobs=args.jobs,
+                index_cmds=CREATE_INDEXES_CMDS
+            ).items():
+                print(f'{table}: {count}')
+            record_all(
+                commands=CREATE_INDEXES_CMDS,
+                db_connection=connection,
+                ledger=ledger
+            )
+            loaded = True
+        if loaded or triggers:
+            create(commands=REFRESH_DERIVED_CMDS, db_connection=connection)
+        applied += triggers + apply_changed(
+            commands=CREATE_FUNCTIONS,
+            db_connection=connection,
+            ledger=ledger
+        )
+
+    for name in applied:
+        print(f'Применено: {name}')
+    if loaded:
+        print('Данные загружены.')
+    if not applied and not loaded:
+        print('Схема не изменилась.')
 
 
 if __name__ == '__main__':
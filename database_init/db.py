@@ -0,0 +1,38 @@
+import os
+import runpy
+from typing import Any
+
+import psycopg2
+from dotenv import load_dotenv
+from psycopg2.extensions import connection
+from pathlib import Path
+
+DOTENV_PATH = Path(__file__).resolve().parent.parent.joinpath('.env')
+
+SETTINGS_PATH = Path(__file__).resolve().parent.parent.joinpath(
+    'warehouses',
+    'warehouses',
+    'settings.py'
+)
+
+load_dotenv(dotenv_path=DOTENV_PATH)
+
+
+def connect() -> connection:
+    """Get new connection to the database configured in .env."""
+    return psycopg2.connect(
+        database=os.getenv('DB_NAME'),
+        user=os.getenv('POSTGRES_USER'),
+        password=os.getenv('POSTGRES_PASSWORD'),
+        host=os.getenv('DB_HOST'),
+        port=os.getenv('DB_PORT')
+    )
+
+
+def get_app_setting(name: str) -> Any:
+    """
+    Get value of the application's setting with given name (e.g. TIME_ZONE)
+    from its settings.py, so database objects and the application are
+    configured from the same source.
+    """
+    return runpy.run_path(str(SETTINGS_PATH))[name]
@@ -0,0 +1,454 @@
+import argparse
+import csv
+import os
+import random
+from datetime import date, datetime, time, timedelta
+from multiprocessing import Pool
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+from create_functions import BUSINESS_TIME_ZONE
+
+DEFAULT_OUTPUT = Path(__file__).resolve().parent.joinpath('data')
+
+TABLES = {
+    'owner': ('id', 'first_name', 'last_name', 'email'),
+    'product': ('id', 'name', 'article_number'),
+    'shop': ('id', 'address', 'name', 'owner_id'),
+    'vehicle': ('id', 'brand', 'max_capacity', 'owner_id', 'vin'),
+    'warehouse': ('id', 'name', 'address', 'max_capacity', 'owner_id'),
+    'product_warehouse': ('id', 'warehouse_id', 'product_id', 'payload'),
+    'transit': ('id', 'warehouse_id', 'date_start', 'date_end', 'accepted'),
+    'product_transit': ('id', 'transit_id', 'product_id', 'payload'),
+    'vehicle_transit': ('id', 'transit_id', 'vehicle_id'),
+    'order_table': (
+        'id',
+        'shop_id',
+        'warehouse_id',
+        'date_start',
+        'date_end',
+        'accepted'
+    ),
+    'product_order': ('id', 'order_id', 'product_id', 'payload'),
+    'vehicle_order': ('id', 'order_id', 'vehicle_id'),
+}
+
+FIRST_NAMES = (
+    'Александр', 'Алексей', 'Анна', 'Дмитрий', 'Екатерина', 'Елена',
+    'Иван', 'Мария', 'Михаил', 'Наталья', 'Ольга', 'Сергей'
+)
+
+LAST_NAMES = (
+    'Иванов', 'Кузнецов', 'Михайлов', 'Новиков', 'Петров', 'Попов',
+    'Смирнов', 'Соколов', 'Федоров', 'Морозов', 'Волков', 'Лебедев'
+)
+
+STREETS = (
+    'Кирова', 'Ленина', 'Луговая', 'Мира', 'Прямая', 'Пушкина',
+    'Сергинская', 'Малышева', 'Восточная', 'Гагарина'
+)
+
+PRODUCT_NAMES = (
+    'Сахар', 'Мука', 'Картофель', 'Соль', 'Морковь', 'Свёкла', 'Крупа',
+    'Лук', 'Капуста', 'Яблоки'
+)
+
+BRANDS = (
+    'ГАЗон Next', 'DongFeng AF', 'Daewoo Novus', 'Hyundai MegaTruck',
+    'КАМАЗ 65117', 'МАЗ 6312'
+)
+
+MAX_LINES = 3
+
+MAX_TRIP_VEHICLES = 2
+
+SLOT_HOURS = 3
+
+SLOTS_PER_DAY = 24 // SLOT_HOURS
+
+FUTURE_DAYS = 30
+
+DEFAULT_TODAY = date(2025, 1, 1)
+
+reference = {}
+
+
+def get_rng(seed: int, *key) -> random.Random:
+    """
+    Get random generator of the chunk with given key. Generators depend only
+    on seed and key, so result does not depend on count of processes.
+    """
+    return random.Random(':'.join(str(part) for part in (seed, *key)))
+
+
+def write_part(output: Path, table: str, part: int, rows: list) -> int:
+    """
+    Writes rows of given table into CSV part file with header and returns
+    count of rows.
+    """
+    directory = output.joinpath(table)
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory.joinpath(f'part-{part:05d}.csv'), 'w',
+              encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(TABLES[table])
+        writer.writerows(rows)
+
+    return len(rows)
+
+
+def generate_reference(args: argparse.Namespace) -> dict[str, list]:
+    """
+    Generates rows of owner, product, shop, vehicle, warehouse and
+    product_warehouse tables. Stock of every warehouse takes at most half of
+    its capacity, so transits have free space to deliver to.
+    """
+    rng = get_rng(args.seed, 'reference')
+    rows = {}
+    rows['owner'] = [
+        (
+            i,
+            rng.choice(FIRST_NAMES),
+            rng.choice(LAST_NAMES),
+            f'owner{i}@mail.ru'
+        ) for i in range(1, args.owners + 1)
+    ]
+    rows['product'] = [
+        (i, f'{rng.choice(PRODUCT_NAMES)} {i}', 10000 + i)
+        for i in range(1, args.products + 1)
+    ]
+    rows['shop'] = [
+        (
+            i,
+            f'{rng.choice(STREETS)} {rng.randint(1, 200)}',
+            f'Магазин_{i}',
+            rng.randint(1, args.owners)
+        ) for i in range(1, args.shops + 1)
+    ]
+    rows['vehicle'] = [
+        (
+            i,
+            f'{rng.choice(BRANDS)}, {rng.randint(2010, 2023)}',
+            rng.randint(4, 40),
+            rng.randint(1, args.owners),
+            f'{i:017d}'
+        ) for i in range(1, args.vehicles + 1)
+    ]
+    rows['warehouse'] = [
+        (
+            i,
+            f'Склад_{i}',
+            f'{rng.choice(STREETS)} {rng.randint(1, 200)}',
+            rng.randint(200, 5000),
+            rng.randint(1, args.owners)
+        ) for i in range(1, args.warehouses + 1)
+    ]
+    rows['product_warehouse'] = []
+    for warehouse_id, _, _, max_capacity, _ in rows['warehouse']:
+        products = rng.sample(
+            range(1, args.products + 1),
+            min(args.products_per_warehouse, args.products)
+        )
+        free = max_capacity // 2
+        for product_id in products:
+            if free < 1:
+                break
+            payload = rng.randint(1, max(1, min(free, 2 * max_capacity
+                                                // len(products))))
+            free -= payload
+            rows['product_warehouse'].append((
+                len(rows['product_warehouse']) + 1,
+                warehouse_id,
+                product_id,
+                payload
+            ))
+
+    return rows
+
+
+def init_worker(data: dict) -> None:
+    reference.update(data)
+
+
+def get_trip_period(rng: random.Random, day: date,
+                    slot: int) -> tuple[datetime, datetime]:
+    """
+    Get start and end of a trip inside given slot of the day. Trip always
+    ends before the end of the slot, so trips of different slots (and of
+    different days) never overlap even with inclusive bounds.
+    """
+    date_start = datetime.combine(
+        day,
+        time(hour=slot * SLOT_HOURS),
+        tzinfo=ZoneInfo(BUSINESS_TIME_ZONE)
+    ) + timedelta(minutes=5 * rng.randint(0, 6))
+    duration = timedelta(minutes=5 * rng.randint(12, 24))
+
+    return date_start, date_start + duration
+
+
+def pop_vehicles(rng: random.Random, free: list[list[int]],
+                 count: int) -> tuple[int, list[int]]:
+    """
+    Get slot of the day and given count of vehicles free in this slot,
+    removing them from free vehicles of the slot. If no slot has given count
+    of free vehicles, as many as the freest slot has are taken.
+    """
+    count = min(count, max(len(vehicles) for vehicles in free))
+    if count < 1:
+        raise ValueError('No free vehicles left for the day.')
+    slots = [slot for slot, vehicles in enumerate(free)
+             if len(vehicles) >= count]
+    slot = rng.choice(slots)
+
+    return slot, [free[slot].pop() for _ in range(count)]
+
+
+def get_pending_stock(warehouse_stock: dict[int, list[tuple[int, int]]],
+                      index: int) -> dict[int, dict[int, int]]:
+    """
+    Get share of stock of every warehouse and product that unaccepted orders
+    of the day with given index from today may reserve. Shares of all
+    FUTURE_DAYS days sum up to the stock, so products reserved by all
+    unaccepted orders never exceed it.
+
+    For example, for 45 tons of product 7 at warehouse 3 and index 0 it will
+    return
+    {
+        3: {7: 1},
+    }
+    """
+    pending_stock = {}
+    for warehouse_id, stock in warehouse_stock.items():
+        for product_id, payload in stock:
+            share = (
+                payload * (index + 1) // FUTURE_DAYS
+                - payload * index // FUTURE_DAYS
+            )
+            if share > 0:
+                pending_stock.setdefault(warehouse_id, {})[product_id] = share
+
+    return pending_stock
+
+
+def generate_day(args: argparse.Namespace, index: int) -> dict[str, int]:
+    """
+    Generates transits and orders of the day with given index and writes
+    them with their products and vehicles into part files of the day.
+
+    Every vehicle is booked at most once per slot, so no vehicle is
+    double-booked. Total payload of a trip does not exceed capacity of its
+    vehicles, payload of a transit fits into free space of the warehouse and
+    payload of an order line does not exceed stock of the product. Orders
+    of days from today on stay unaccepted and take products from the day's
+    share of stock (see get_pending_stock), which is tracked across orders.
+    """
+    rng = get_rng(args.seed, 'day', index)
+    day = args.start_date + timedelta(days=index)
+    vehicle_capacity = reference['vehicle_capacity']
+    warehouse_free = reference['warehouse_free']
+    warehouse_stock = reference['warehouse_stock']
+    free = []
+    for _ in range(SLOTS_PER_DAY):
+        vehicles = list(range(1, args.vehicles + 1))
+        rng.shuffle(vehicles)
+        free.append(vehicles)
+    rows = {table: [] for table in TABLES}
+    pending_stock = None
+    if day >= args.today:
+        pending_stock = get_pending_stock(
+            warehouse_stock=warehouse_stock,
+            index=(day - args.today).days
+        )
+
+    for number in range(args.transits_per_day):
+        transit_id = index * args.transits_per_day + number + 1
+        slot, vehicles = pop_vehicles(
+            rng=rng,
+            free=free,
+            count=rng.randint(1, MAX_TRIP_VEHICLES)
+        )
+        date_start, date_end = get_trip_period(rng=rng, day=day, slot=slot)
+        warehouse_id = rng.randint(1, args.warehouses)
+        capacity = min(
+            sum(vehicle_capacity[i] for i in vehicles),
+            warehouse_free[warehouse_id]
+        )
+        products = rng.sample(
+            range(1, args.products + 1),
+            min(rng.randint(1, MAX_LINES), capacity, args.products)
+        )
+        rows['transit'].append((
+            transit_id,
+            warehouse_id,
+            date_start.isoformat(),
+            date_end.isoformat(),
+            date_end.date() < args.today
+        ))
+        for line, product_id in enumerate(products):
+            payload = rng.randint(1, capacity - (len(products) - line - 1))
+            capacity -= payload
+            rows['product_transit'].append((
+                (transit_id - 1) * MAX_LINES + line + 1,
+                transit_id,
+                product_id,
+                payload
+            ))
+        for line, vehicle_id in enumerate(vehicles):
+            rows['vehicle_transit'].append((
+                (transit_id - 1) * MAX_TRIP_VEHICLES + line + 1,
+                transit_id,
+                vehicle_id
+            ))
+
+    for number in range(args.orders_per_day):
+        order_id = index * args.orders_per_day + number + 1
+        slot, vehicles = pop_vehicles(
+            rng=rng,
+            free=free,
+            count=rng.randint(1, MAX_TRIP_VEHICLES)
+        )
+        date_start, date_end = get_trip_period(rng=rng, day=day, slot=slot)
+        if pending_stock is None:
+            warehouse_id = rng.choice(reference['stocked_warehouses'])
+            stock = warehouse_stock[warehouse_id]
+        elif pending_stock:
+            warehouse_id = rng.choice(sorted(pending_stock))
+            stock = sorted(pending_stock[warehouse_id].items())
+        else:
+            warehouse_id = rng.choice(reference['stocked_warehouses'])
+            stock = []
+        capacity = sum(vehicle_capacity[i] for i in vehicles)
+        lines = rng.sample(stock, min(rng.randint(1, MAX_LINES), len(stock)))
+        rows['order_table'].append((
+            order_id,
+            rng.randint(1, args.shops),
+            warehouse_id,
+            date_start.isoformat(),
+            date_end.isoformat(),
+            date_end.date() < args.today
+        ))
+        for line, (product_id, available) in enumerate(lines):
+            if capacity < 1:
+                break
+            payload = rng.randint(1, min(available, capacity))
+            capacity -= payload
+            if pending_stock is not None:
+                left = pending_stock[warehouse_id]
+                left[product_id] -= payload
+                if not left[product_id]:
+                    del left[product_id]
+                if not left:
+                    del pending_stock[warehouse_id]
+            rows['product_order'].append((
+                (order_id - 1) * MAX_LINES + line + 1,
+                order_id,
+                product_id,
+                payload
+            ))
+        for line, vehicle_id in enumerate(vehicles):
+            rows['vehicle_order'].append((
+                (order_id - 1) * MAX_TRIP_VEHICLES + line + 1,
+                order_id,
+                vehicle_id
+            ))
+
+    return {
+        table: write_part(
+            output=args.output,
+            table=table,
+            part=index,
+            rows=table_rows
+        ) for table, table_rows in rows.items() if table_rows
+    }
+
+
+def generate_day_task(task: tuple[argparse.Namespace, int]) -> dict:
+    return generate_day(*task)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Генерирует согласованный набор данных заданного размера '
+                    'в CSV-файлы (по каталогу на таблицу) для нагрузочного '
+                    'тестирования. Данные предназначены для пустых таблиц.'
+    )
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, type=Path,
+                        help='Каталог для CSV-файлов.')
+    parser.add_argument('--seed', default=0, type=int,
+                        help='Зерно генератора случайных чисел.')
+    parser.add_argument('--processes', default=os.cpu_count(), type=int,
+                        help='Количество процессов генерации.')
+    parser.add_argument('--owners', default=1000, type=int)
+    parser.add_argument('--warehouses', default=500, type=int)
+    parser.add_argument('--shops', default=2000, type=int)
+    parser.add_argument('--products', default=5000, type=int)
+    parser.add_argument('--products-per-warehouse', default=50, type=int)
+    parser.add_argument('--vehicles', default=5000, type=int)
+    parser.add_argument('--days', default=365, type=int,
+                        help='Количество дней поставок и заказов (не менее '
+                             f'{FUTURE_DAYS}), последние {FUTURE_DAYS} из них '
+                             'приходятся на будущее.')
+    parser.add_argument('--orders-per-day', default=2000, type=int)
+    parser.add_argument('--transits-per-day', default=500, type=int)
+    parser.add_argument(
+        '--today',
+        default=DEFAULT_TODAY,
+        type=date.fromisoformat,
+        help='Текущая дата: поставки и заказы, завершенные до нее, '
+             'отмечаются принятыми (по умолчанию '
+             f'{DEFAULT_TODAY.isoformat()}, чтобы одно зерно давало один '
+             'и тот же набор данных).'
+    )
+    args = parser.parse_args()
+    if args.days < FUTURE_DAYS:
+        parser.error(f'Количество дней должно быть не менее {FUTURE_DAYS}.')
+    args.start_date = args.today - timedelta(days=args.days - FUTURE_DAYS)
+
+    trips = args.orders_per_day + args.transits_per_day
+    if trips * MAX_TRIP_VEHICLES > args.vehicles * SLOTS_PER_DAY:
+        parser.error(
+            f'Машин недостаточно для {trips} рейсов в день: нужно не менее '
+            + f'{trips * MAX_TRIP_VEHICLES // SLOTS_PER_DAY + 1}.'
+        )
+    if min(args.owners, args.warehouses, args.shops, args.products,
+           args.products_per_warehouse) < 1:
+        parser.error('Размеры таблиц должны быть положительными.')
+
+    rows = generate_reference(args)
+    counts = {
+        table: write_part(output=args.output, table=table, part=0, rows=data)
+        for table, data in rows.items()
+    }
+    warehouse_stock = {}
+    for _, warehouse_id, product_id, payload in rows['product_warehouse']:
+        warehouse_stock.setdefault(warehouse_id, []).append(
+            (product_id, payload)
+        )
+    warehouse_free = {
+        warehouse_id: max_capacity - sum(
+            payload for _, payload in warehouse_stock.get(warehouse_id, ())
+        ) for warehouse_id, _, _, max_capacity, _ in rows['warehouse']
+    }
+    data = {
+        'stocked_warehouses': sorted(warehouse_stock),
+        'vehicle_capacity': {row[0]: row[2] for row in rows['vehicle']},
+        'warehouse_free': warehouse_free,
+        'warehouse_stock': warehouse_stock,
+    }
+
+    with Pool(processes=args.processes, initializer=init_worker,
+              initargs=(data,)) as pool:
+        for day_counts in pool.imap_unordered(
+            generate_day_task,
+            [(args, index) for index in range(args.days)]
+        ):
+            for table, count in day_counts.items():
+                counts[table] = counts.get(table, 0) + count
+
+    for table in TABLES:
+        print(f'{table}: {counts.get(table, 0)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+import re
+from hashlib import sha256
+from typing import Iterable
+
+from psycopg2 import sql
+from psycopg2.extensions import connection
+
+LEDGER_TABLE_CMD = """
+    CREATE TABLE IF NOT EXISTS schema_ledger(
+        name VARCHAR(200) PRIMARY KEY,
+        checksum CHAR(64) NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+"""
+
+LEDGER_CMD = """
+    SELECT
+        schema_ledger.name,
+        schema_ledger.checksum
+    FROM
+        schema_ledger;
+"""
+
+RECORD_CMD = """
+    INSERT INTO
+        schema_ledger (name, checksum)
+    VALUES
+        (%s, %s)
+    ON CONFLICT (name) DO UPDATE SET
+        checksum = EXCLUDED.checksum,
+        applied_at = NOW();
+"""
+
+INDEX_IS_VALID_CMD = """
+    SELECT
+        pg_index.indisvalid
+    FROM
+        pg_index
+    WHERE
+        pg_index.indexrelid = to_regclass(%s);
+"""
+
+DROP_INDEX_CONCURRENTLY_CMD = 'DROP INDEX CONCURRENTLY IF EXISTS {index};'
+
+NAME_FILLER_WORDS = {'exists', 'if', 'into', 'not', 'or', 'replace', 'unique'}
+
+NAME_KIND_WORDS = {
+    'alter', 'create', 'drop', 'extension', 'function', 'index', 'insert',
+    'select', 'table', 'trigger', 'truncate', 'update', 'view'
+}
+
+
+def get_object_name(cmd: str) -> str:
+    """
+    Get ledger name of the command from its first statement: verb, kind of
+    object and its name.
+
+    For example, for 'CREATE OR REPLACE FUNCTION query_5(VARCHAR, ...' it
+    will return 'create function query_5' and for 'CREATE INDEX IF NOT
+    EXISTS transit_date_start_index ON transit ...' it will return
+    'create index transit_date_start_index'.
+    """
+    words = []
+    for word in cmd.split():
+        word = word.lower()
+        if word in NAME_FILLER_WORDS:
+            continue
+        if word in NAME_KIND_WORDS:
+            words.append(word)
+            continue
+        words.append(re.split(r'[(;]', word)[0])
+        break
+
+    return ' '.join(words)
+
+
+def get_checksum(cmd: str) -> str:
+    """Get SHA-256 checksum of the command text."""
+    return sha256(cmd.strip().encode()).hexdigest()
+
+
+def get_ledger(db_connection: connection) -> dict[str, str]:
+    """
+    Get checksums of applied objects by their names, creating the ledger
+    table if it does not exist.
+    """
+    with db_connection.cursor() as cursor:
+        cursor.execute(LEDGER_TABLE_CMD)
+        cursor.execute(LEDGER_CMD)
+        ledger = dict(cursor.fetchall())
+    db_connection.commit()
+
+    return ledger
+
+
+def record(db_connection: connection, ledger: dict[str, str], name: str,
+           checksum: str) -> None:
+    """Records checksum of applied object in the ledger (not committed)."""
+    with db_connection.cursor() as cursor:
+        cursor.execute(RECORD_CMD, [name, checksum])
+    ledger[name] = checksum
+
+
+def record_all(db_connection: connection, ledger: dict[str, str],
+               commands: Iterable[str]) -> None:
+    """
+    Records commands applied by other means (e.g. indexes created by
+    bulk_load) in the ledger.
+    """
+    for cmd in commands:
+        record(
+            db_connection=db_connection,
+            ledger=ledger,
+            name=get_object_name(cmd),
+            checksum=get_checksum(cmd)
+        )
+    db_connection.commit()
+
+
+def apply_changed(db_connection: connection, ledger: dict[str, str],
+                  commands: Iterable[str]) -> list[str]:
+    """
+    Executes in one transaction only commands whose checksum differs from
+    the ledger (new or changed objects), records them and returns their
+    names. Unchanged functions are not recompiled, so cached plans of
+    running backends stay valid.
+    """
+    applied = []
+    with db_connection.cursor() as cursor:
+        for cmd in commands:
+            name, checksum = get_object_name(cmd), get_checksum(cmd)
+            if ledger.get(name) == checksum:
+                continue
+            cursor.execute(cmd)
+            record(
+                db_connection=db_connection,
+                ledger=ledger,
+                name=name,
+                checksum=checksum
+            )
+            applied.append(name)
+    db_connection.commit()
+
+    return applied
+
+
+def apply_indexes(db_connection: connection, ledger: dict[str, str],
+                  commands: Iterable[str]) -> list[str]:
+    """
+    Creates new or changed indexes with CREATE INDEX CONCURRENTLY, so writes
+    to their tables are not blocked, and returns their names.
+
+    Changed index (or invalid one left by failed concurrent build) is
+    dropped concurrently first. Valid index existing before the ledger is
+    only recorded.
+    """
+    applied = []
+    db_connection.autocommit = True
+    try:
+        for cmd in commands:
+            name, checksum = get_object_name(cmd), get_checksum(cmd)
+            if ledger.get(name) == checksum:
+                continue
+            index = name.split()[-1]
+            with db_connection.cursor() as cursor:
+                cursor.execute(INDEX_IS_VALID_CMD, [index])
+                is_valid = (row := cursor.fetchone()) is not None and row[0]
+                if name in ledger or not is_valid:
+                    cursor.execute(sql.SQL(DROP_INDEX_CONCURRENTLY_CMD).format(
+                        index=sql.Identifier(index)
+                    ))
+                    cursor.execute(re.sub(
+                        r'CREATE (UNIQUE )?INDEX',
+                        r'CREATE \1INDEX CONCURRENTLY',
+                        cmd,
+                        count=1
+                    ))
+                    applied.append(name)
+            record(
+                db_connection=db_connection,
+                ledger=ledger,
+                name=name,
+                checksum=checksum
+            )
+    finally:
+        db_connection.autocommit = False
+
+    return applied
+
+
+def apply_once(db_connection: connection, ledger: dict[str, str], name: str,
+               commands: Iterable[str]) -> bool:
+    """
+    Executes commands (e.g. data inserts) in one transaction only if they
+    were never applied under given name. Returns whether they were applied.
+    """
+    commands = list(commands)
+    if name in ledger:
+        if ledger[name] != get_checksum(''.join(commands)):
+            print(f'{name}: изменения не применены, данные уже загружены.')
+        return False
+
+    with db_connection.cursor() as cursor:
+        for cmd in commands:
+            cursor.execute(cmd)
+    record(
+        db_connection=db_connection,
+        ledger=ledger,
+        name=name,
+        checksum=get_checksum(''.join(commands))
+    )
+    db_connection.commit()
+
+    return True
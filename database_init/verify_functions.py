@@ -0,0 +1,360 @@
+import argparse
+import sys
+from contextlib import closing
+
+from psycopg2.extensions import connection
+
+from create_functions import (BUSINESS_TIME_ZONE, CREATE_FUNCTIONS,
+                              get_match_function)
+from db import connect
+
+LEGACY_QUERY_8_CMD = f"""
+    CREATE FUNCTION pg_temp.legacy_query_8(DATE)
+        RETURNS TABLE (
+            id INTEGER,
+            address VARCHAR
+        )
+    AS $$
+    BEGIN
+        RETURN QUERY
+            SELECT
+                warehouse.id,
+                warehouse.address
+            FROM
+                warehouse
+            INNER JOIN
+                order_table ON order_table.warehouse_id = warehouse.id
+            WHERE
+                order_table.date_start >=
+                    $1::timestamp AT TIME ZONE '{BUSINESS_TIME_ZONE}' AND
+                order_table.date_start <
+                    ($1 + 1)::timestamp AT TIME ZONE '{BUSINESS_TIME_ZONE}'
+            GROUP BY
+                warehouse.id
+            HAVING
+                COUNT(*) = (
+                    SELECT
+                        COUNT(*) AS cnt
+                    FROM
+                        order_table
+                    WHERE
+                        order_table.date_start >=
+                            $1::timestamp AT TIME ZONE '{BUSINESS_TIME_ZONE}'
+                        AND order_table.date_start <
+                            ($1 + 1)::timestamp
+                            AT TIME ZONE '{BUSINESS_TIME_ZONE}'
+                    GROUP BY
+                        order_table.warehouse_id
+                    ORDER BY
+                        cnt ASC
+                    LIMIT 1
+                );
+    END; $$
+
+    LANGUAGE 'plpgsql';
+"""
+
+LEGACY_QUERY_10_CMD = get_match_function(
+    header="""
+    CREATE FUNCTION pg_temp.legacy_query_10(VARCHAR, VARCHAR, VARCHAR)
+        RETURNS TABLE (
+            id INTEGER,
+            name VARCHAR,
+            article_number INTEGER,
+            payload INTEGER
+        )
+    """,
+    query="""
+            SELECT
+                product.id,
+                product.name,
+                product.article_number,
+                product_warehouse.payload
+            FROM
+                warehouse
+            INNER JOIN
+                product_warehouse ON
+                    product_warehouse.warehouse_id = warehouse.id
+            INNER JOIN
+                product ON product.id = product_warehouse.product_id
+            WHERE
+                product_warehouse.payload = (
+                    SELECT
+                        MAX(product_warehouse.payload)
+                    FROM
+                        warehouse
+                    INNER JOIN
+                        product_warehouse ON
+                            product_warehouse.warehouse_id = warehouse.id
+                    INNER JOIN
+                        product ON product.id = product_warehouse.product_id
+                    WHERE
+                        {name}
+                        AND {address}
+                ) AND {name}
+                  AND {address}
+    """,
+    mode='$3',
+    columns={
+        'address': ('warehouse.address', '$2'),
+        'name': ('warehouse.name', '$1'),
+    }
+)
+
+SCALE_DATA_CMDS = [
+    """
+    SELECT setseed(0.5);
+    """,
+    """
+    INSERT INTO
+        owner (first_name, last_name, email)
+    SELECT
+        'Имя ' || i,
+        'Фамилия ' || i,
+        'verify' || i || '@verify.ru'
+    FROM
+        generate_series(1, %(scale)s) AS i;
+    """,
+    """
+    INSERT INTO
+        warehouse (name, address, max_capacity, owner_id)
+    SELECT
+        'Склад проверки ' || owner.id,
+        'Адрес проверки ' || owner.id %% 100,
+        1000000,
+        owner.id
+    FROM
+        owner
+    WHERE
+        owner.email LIKE 'verify%%';
+    """,
+    """
+    INSERT INTO
+        shop (address, name, owner_id)
+    SELECT
+        'Адрес магазина ' || owner.id,
+        'Магазин проверки ' || owner.id,
+        owner.id
+    FROM
+        owner
+    WHERE
+        owner.email LIKE 'verify%%';
+    """,
+    """
+    INSERT INTO
+        product (name, article_number)
+    SELECT
+        'Товар проверки ' || i,
+        (SELECT COALESCE(MAX(article_number), 0) FROM product) + i
+    FROM
+        generate_series(1, %(scale)s) AS i;
+    """,
+    """
+    INSERT INTO
+        product_warehouse (warehouse_id, product_id, payload)
+    SELECT
+        warehouse.id,
+        product.id,
+        1 + floor(random() * 50)::INTEGER
+    FROM
+        warehouse
+    CROSS JOIN
+        product
+    WHERE
+        warehouse.name LIKE 'Склад проверки%%' AND
+        product.name LIKE 'Товар проверки%%' AND
+        random() < 10.0 / %(scale)s;
+    """,
+    f"""
+    INSERT INTO
+        order_table (shop_id, warehouse_id, date_start, date_end)
+    SELECT
+        pairs.shop_id,
+        pairs.warehouse_id,
+        pairs.date_start,
+        pairs.date_start + INTERVAL '2 hours'
+    FROM (
+        SELECT
+            shop.id AS shop_id,
+            warehouse.id AS warehouse_id,
+            '2023-05-01'::timestamp AT TIME ZONE '{BUSINESS_TIME_ZONE}'
+            + random() * INTERVAL '30 days' AS date_start
+        FROM
+            shop
+        CROSS JOIN
+            warehouse
+        WHERE
+            shop.name LIKE 'Магазин проверки%%' AND
+            warehouse.name LIKE 'Склад проверки%%' AND
+            random() < 3.0 / %(scale)s
+    ) AS pairs;
+    """,
+]
+
+QUERY_8_ARGS_CMD = f"""
+    SELECT
+        dates.date
+    FROM (
+        SELECT
+            (order_table.date_start AT TIME ZONE '{BUSINESS_TIME_ZONE}')::date
+        FROM
+            order_table
+        UNION
+        SELECT '1970-01-01'::date
+    ) AS dates (date)
+    ORDER BY
+        random()
+    LIMIT %s;
+"""
+
+QUERY_10_ARGS_CMD = """
+    SELECT
+        args.name,
+        args.address,
+        args.match
+    FROM (
+        SELECT
+            warehouse.name,
+            warehouse.address,
+            warehouse.id
+        FROM
+            warehouse
+        ORDER BY
+            random()
+        LIMIT %s
+    ) AS sample
+    CROSS JOIN LATERAL (
+        VALUES
+            (sample.name, sample.address, 'exact'),
+            (left(sample.name, 7), left(sample.address, 7), 'prefix'),
+            (sample.name, sample.address, 'fuzzy'),
+            ('несуществующий склад', sample.address, 'exact')
+    ) AS args (name, address, match)
+    ORDER BY
+        sample.id,
+        args.match;
+"""
+
+QUERY_10_TOP_CMD = """(
+        SELECT
+            ranked.id,
+            ranked.name,
+            ranked.article_number,
+            ranked.payload
+        FROM (
+            SELECT
+                query_10.*,
+                MAX(query_10.payload) OVER () AS top_payload
+            FROM
+                query_10(%s, %s, %s)
+        ) AS ranked
+        WHERE
+            ranked.payload = ranked.top_payload
+    ) AS current_rows"""
+
+COMPARE_CMD = """
+    SELECT COUNT(*) FROM (
+        (
+            SELECT * FROM {current}
+            EXCEPT ALL
+            SELECT * FROM {legacy}
+        )
+        UNION ALL
+        (
+            SELECT * FROM {legacy}
+            EXCEPT ALL
+            SELECT * FROM {current}
+        )
+    ) AS mismatches;
+"""
+
+COMPARED_FUNCTIONS = {
+    'query_8': {
+        'args_cmd': QUERY_8_ARGS_CMD,
+        'current': 'query_8(%s)',
+        'legacy': 'pg_temp.legacy_query_8(%s)',
+    },
+    'query_10': {
+        'args_cmd': QUERY_10_ARGS_CMD,
+        'current': QUERY_10_TOP_CMD,
+        'legacy': 'pg_temp.legacy_query_10(%s, %s, %s)',
+    },
+}
+
+
+def compare(db_connection: connection, sample: int) -> int:
+    """
+    Compares results of current and legacy definitions of every function of
+    COMPARED_FUNCTIONS on sample of arguments taken from current data, prints
+    arguments with different results and returns their count.
+    """
+    mismatches = 0
+    with db_connection.cursor() as cursor:
+        for name, info in COMPARED_FUNCTIONS.items():
+            cursor.execute(info['args_cmd'], [sample])
+            args_list = cursor.fetchall()
+            compare_cmd = COMPARE_CMD.format(
+                current=info['current'],
+                legacy=info['legacy']
+            )
+            for args in args_list:
+                cursor.execute(compare_cmd, [*args, *args, *args, *args])
+                if cursor.fetchone()[0]:
+                    mismatches += 1
+                    print(f'{name}{args}: результаты различаются')
+            print(f'{name}: проверено наборов аргументов {len(args_list)}')
+
+    return mismatches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Сверяет результаты query_8 и query_10 с их прежними '
+                    'определениями на текущих данных и на увеличенном наборе '
+                    'данных. Все изменения откатываются.'
+    )
+    parser.add_argument(
+        '--scale',
+        default=1000,
+        type=int,
+        help='Количество владельцев, складов, магазинов и товаров в '
+             'увеличенном наборе данных.'
+    )
+    parser.add_argument(
+        '--sample',
+        default=50,
+        type=int,
+        help='Количество дат и складов, на которых сверяются функции.'
+    )
+    args = parser.parse_args()
+
+    with closing(connect()) as connection:
+        try:
+            with connection.cursor() as cursor:
+                for cmd in CREATE_FUNCTIONS:
+                    cursor.execute(cmd)
+                cursor.execute(LEGACY_QUERY_8_CMD)
+                cursor.execute(LEGACY_QUERY_10_CMD)
+
+            print('Исходные данные:')
+            mismatches = compare(db_connection=connection, sample=args.sample)
+
+            with connection.cursor() as cursor:
+                for cmd in SCALE_DATA_CMDS:
+                    cursor.execute(cmd, {'scale': args.scale})
+
+            print(f'Увеличенный набор данных (scale={args.scale}):')
+            mismatches += compare(
+                db_connection=connection,
+                sample=args.sample
+            )
+        finally:
+            connection.rollback()
+
+    if mismatches:
+        sys.exit(f'Найдено расхождений: {mismatches}')
+    print('Результаты совпадают.')
+
+
+if __name__ == '__main__':
+    main()
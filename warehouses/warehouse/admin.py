@@ -1,58 +1,139 @@
 from django.conf import settings
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.admin import ModelAdmin as BaseModelAdmin
 from django.contrib.admin.actions import delete_selected
-from django.db.models import Sum
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
 
+from .filters import ReferenceFieldListFilter
 from .forms import ShopForm
 from .inlines import (OrderInline, ProductOrderInline, ProductTransitInline,
                       ProductWarehouseInline, ShopInline, TransitInline,
                       VehicleInline, VehicleOrderInline, VehicleTransitInline,
                       WarehouseInline)
-from .mixins import NoChangePermissionMixin
-from .models import (Order, Owner, Product, ProductWarehouse, Shop, Transit,
+from .jobs import enqueue_job, requeue_jobs
+from .metrics import ACCEPT_ACTIONS
+from .mixins import (NoAddPermissionMixin, NoChangePermissionMixin,
+                     ReferenceChoicesMixin, VehicleBookingMixin)
+from .models import (Job, Order, Owner, Product, Shop, SlowReport, Transit,
                      Vehicle, Warehouse)
-from .utils import get_diff_order, get_diff_transit
 
 delete_selected.short_description = 'Удалить'
 admin.site.site_header = 'Администрирование'
 
 
-class ModelAdmin(BaseModelAdmin):
+class ModelAdmin(ReferenceChoicesMixin, BaseModelAdmin):
     list_per_page = settings.LIST_PER_PAGE
 
 
+def enqueue_accept_job(modeladmin, request, kind, object_ids):
+    """
+    Enqueues job of given kind for selected objects, so the action returns
+    immediately, and shows link to the job.
+    """
+    ACCEPT_ACTIONS.inc(action=kind)
+    if (job_id := enqueue_job(kind=kind, object_ids=object_ids)) is None:
+        modeladmin.message_user(
+            request=request,
+            message='Нет неосуществленных объектов.',
+            level=messages.WARNING
+        )
+        return
+    modeladmin.message_user(
+        request=request,
+        message=format_html(
+            'Задание <a href="{}">#{}</a> поставлено в очередь.',
+            reverse('admin:warehouse_job_change', args=(job_id,)),
+            job_id
+        )
+    )
+
+
+@admin.register(Job)
+class JobAdmin(NoAddPermissionMixin, NoChangePermissionMixin, ModelAdmin):
+    actions = ('requeue',)
+    fields = ('kind', 'status', 'progress', 'summary', 'error', 'attempts',
+              'created_at', 'started_at', 'heartbeat_at', 'finished_at')
+    list_display = ('id', 'kind', 'status', 'progress', 'summary',
+                    'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    readonly_fields = fields
+
+    @admin.display(description='Прогресс')
+    def progress(self, obj):
+        """
+        Count and percent of processed objects of the job. The job is
+        processed by a single worker chunk by chunk (see run_job), so a large
+        selection is not sped up by more worker processes: it is not split
+        into several jobs, because orders of one selection compete for stock
+        in order of their start date.
+        """
+        total = len(obj.object_ids)
+        return f'{obj.processed} из {total} ({obj.processed * 100 // total}%)'
+
+    @admin.display(description='Результат')
+    def summary(self, obj):
+        """Short description of the job's result."""
+        if obj.kind == 'accept_transit':
+            return f'Осуществлено поставок: {obj.result.get("accepted", 0)}'
+        accepted = obj.result.get('accepted', 0)
+        failures = obj.result.get('failures', {})
+        if not failures:
+            return f'Осуществлено заказов: {accepted}'
+        return format_html(
+            'Осуществлено заказов: {}, не осуществлено: {}<ul>{}</ul>',
+            accepted,
+            len(failures),
+            format_html_join(
+                '',
+                '<li>Заказ #{}: {}</li>',
+                (
+                    (order_id, ', '.join(shortages))
+                    for order_id, shortages in failures.items()
+                )
+            )
+        )
+
+    @admin.action(description='Повторить')
+    def requeue(self, request, queryset):
+        """Puts selected failed jobs back to the queue."""
+        count = requeue_jobs(job_ids=queryset.values_list('id', flat=True))
+        self.message_user(
+            request=request,
+            message=f'Заданий поставлено в очередь: {count}.'
+        )
+
+
 @admin.register(Order)
-class OrderAdmin(NoChangePermissionMixin, ModelAdmin):
+class OrderAdmin(NoChangePermissionMixin, VehicleBookingMixin, ModelAdmin):
     actions = ('accept_order',)
     date_hierarchy = 'date_start'
     inlines = (ProductOrderInline, VehicleOrderInline)
     list_display = ('id', 'accepted', 'date_start', 'date_end', 'shop',
                     'warehouse')
-    list_filter = ('warehouse', 'accepted', 'date_start', 'date_end')
+    list_filter = (('warehouse', ReferenceFieldListFilter), 'accepted',
+                   'date_start', 'date_end')
+    list_select_related = ('shop', 'warehouse')
     readonly_fields = ('accepted', 'id')
     search_fields = ('date_start', 'date_end')
 
     @admin.action(description='Осуществлено')
     def accept_order(self, request, queryset):
         """
-        If product's payload from order is equal to value in related warehouse,
-        delete object from ProductWarehouse model, else substracts difference
-        value; mark the order as accepted.
+        Enqueues job subtracting products' payloads of selected orders from
+        related warehouses (rows that reach zero are deleted) and marking the
+        orders as accepted. Orders that can not be covered by warehouse's
+        stock stay unaccepted and are listed in the job's result.
         """
-        for order in queryset.filter(accepted=False):
-            for product, diff in get_diff_order(order).items():
-                if (obj := ProductWarehouse.objects.get(
-                        warehouse=order.warehouse,
-                        product=product
-                   )).payload == diff:
-                    obj.delete()
-                else:
-                    obj.payload = obj.payload - diff
-                    obj.save()
-
-            order.accepted = True
-            order.save()
+        enqueue_accept_job(
+            modeladmin=self,
+            request=request,
+            kind='accept_order',
+            object_ids=queryset.filter(accepted=False).order_by(
+                'date_start',
+                'id'
+            ).values_list('id', flat=True)
+        )
 
 
 @admin.register(Owner)
@@ -83,6 +164,7 @@ class ShopAdmin(ModelAdmin):
     list_display = ('id', 'name', 'address', 'owner', 'unaccepted_order_count')
     list_display_links = ('name',)
     list_filter = ('owner', )
+    list_select_related = ('owner',)
     search_fields = ('address', 'owner')
 
     def get_inlines(self, request, obj=None):
@@ -92,49 +174,55 @@ class ShopAdmin(ModelAdmin):
         """
         return (OrderInline,) if obj else ()
 
-    def unaccepted_order_count(self, obj):
-        """
-        Get count of orders related to current warehouse that was not accepted.
-        """
-        return Order.objects.filter(accepted=False, shop=obj).count()
 
-    unaccepted_order_count.short_description = 'Ожидает поставок'
+@admin.register(SlowReport)
+class SlowReportAdmin(NoAddPermissionMixin, NoChangePermissionMixin,
+                      ModelAdmin):
+    date_hierarchy = 'created_at'
+    fields = ('query_index', 'created_at', 'duration', 'row_count', 'args',
+              'plan_display')
+    list_display = ('id', 'query_index', 'created_at', 'duration',
+                    'row_count', 'has_plan')
+    list_filter = ('query_index',)
+    readonly_fields = fields
+
+    @admin.display(boolean=True, description='План')
+    def has_plan(self, obj):
+        return obj.plan is not None
+
+    @admin.display(description='План выполнения')
+    def plan_display(self, obj):
+        """Shows EXPLAIN output with its indentation."""
+        return format_html('<pre>{}</pre>', obj.plan or '')
 
 
 @admin.register(Transit)
-class TransitAdmin(NoChangePermissionMixin, ModelAdmin):
+class TransitAdmin(NoChangePermissionMixin, VehicleBookingMixin,
+                   ModelAdmin):
     actions = ('accept_transit',)
     date_hierarchy = 'date_start'
     inlines = (ProductTransitInline, VehicleTransitInline)
     list_display = ('id', 'accepted', 'date_start', 'date_end', 'warehouse')
     list_filter = ('date_start', 'date_end', 'accepted')
+    list_select_related = ('warehouse',)
     readonly_fields = ('accepted', 'id')
     search_fields = ('date_start', 'date_end')
 
     @admin.action(description='Осуществлено')
     def accept_transit(self, request, queryset):
         """
-        If product from transit is not presented in related warehouse, create
-        that row and set difference value as payload else add difference value
-        to payload; mark the transit as accepted.
+        Enqueues job adding products' payloads of selected transits to
+        related warehouses (missing rows are created) and marking the
+        transits as accepted.
         """
-        for transit in queryset.filter(accepted=False):
-            for product, diff in get_diff_transit(transit).items():
-                if (obj := ProductWarehouse.objects.filter(
-                    warehouse=transit.warehouse,
-                    product=product
-                ).first()) is not None:
-                    obj.payload = obj.payload + diff
-                    obj.save()
-                else:
-                    ProductWarehouse.objects.create(
-                        product=product,
-                        warehouse=transit.warehouse,
-                        payload=diff
-                    )
-
-            transit.accepted = True
-            transit.save()
+        enqueue_accept_job(
+            modeladmin=self,
+            request=request,
+            kind='accept_transit',
+            object_ids=queryset.filter(accepted=False).order_by(
+                'id'
+            ).values_list('id', flat=True)
+        )
 
 
 @admin.register(Vehicle)
@@ -142,6 +230,7 @@ class VehicleAdmin(ModelAdmin):
     list_display = ('id', 'brand', 'max_capacity', 'owner', 'vin')
     list_display_links = ('brand',)
     list_filter = ('owner', 'brand')
+    list_select_related = ('owner',)
     search_fields = ('max_capacity', 'vin')
 
     def get_readonly_fields(self, request, obj=None):
@@ -151,11 +240,12 @@ class VehicleAdmin(ModelAdmin):
 
 @admin.register(Warehouse)
 class WarehouseAdmin(ModelAdmin):
-    list_display = ('id', 'address', 'name', 'total_payload', 'max_capacity',
+    list_display = ('id', 'address', 'name', 'current_load', 'max_capacity',
                     'owner', 'unaccepted_transit_count')
     list_display_links = ('address',)
     search_fields = ('address', 'name', 'email', 'owner')
     list_filter = ('owner',)
+    list_select_related = ('owner',)
 
     def get_inlines(self, request, obj=None):
         """
@@ -169,21 +259,3 @@ class WarehouseAdmin(ModelAdmin):
     def get_readonly_fields(self, request, obj=None):
         """If warehouse is being created allows to set max_capacity."""
         return ('max_capacity',) if obj is not None else ()
-
-    def total_payload(self, obj):
-        """
-        Additional column for display that means current warehouse's payload.
-        """
-        return obj.product_warehouse.all().aggregate(
-            sum=Sum('payload')
-        ).get('sum') or 0
-
-    def unaccepted_transit_count(self, obj):
-        """
-        Additional column for display that means transits count which were not
-        accepted.
-        """
-        return Transit.objects.filter(warehouse=obj, accepted=False).count()
-
-    total_payload.short_description = 'Текущая загрузка (т)'
-    unaccepted_transit_count.short_description = 'Ожидает поставок'
@@ -5,3 +5,6 @@ class WarehouseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'warehouse'
     verbose_name = 'Система складов'
+
+    def ready(self):
+        from . import metrics, signals  # noqa: F401
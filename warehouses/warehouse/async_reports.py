@@ -0,0 +1,213 @@
+import asyncio
+from time import perf_counter
+from typing import Any, Iterable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from psycopg import AsyncConnection, DataError
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool
+
+from .cache import aget_cached
+from .metrics import REPORT_DURATION
+from .reports import (QUERY_INFO, get_page, get_page_direction, get_page_sql,
+                      observe_report)
+from .slow_reports import is_slow
+from .utils import get_named_sql
+
+_pool: Optional[AsyncConnectionPool] = None
+_pool_lock = asyncio.Lock()
+
+
+async def get_pool() -> AsyncConnectionPool:
+    """
+    Get pool of async connections to the default database, opening it on the
+    first call. Pool is configured by POOL dict of database settings like the
+    pool of warehouse.pool_backend.
+    """
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            db_settings = settings.DATABASES['default']
+            pool_settings = db_settings.get('POOL', {})
+            pool = AsyncConnectionPool(
+                conninfo=make_conninfo(
+                    dbname=db_settings['NAME'],
+                    host=db_settings['HOST'],
+                    password=db_settings['PASSWORD'],
+                    port=db_settings['PORT'],
+                    user=db_settings['USER']
+                ),
+                max_idle=pool_settings.get('MAX_IDLE', 300),
+                max_size=pool_settings.get('MAX_SIZE', 10),
+                min_size=1,
+                open=False,
+                timeout=pool_settings.get('TIMEOUT', 10)
+            )
+            await pool.open()
+            _pool = pool
+
+    return _pool
+
+
+async def _execute(db_connection: AsyncConnection, sql_cmd: str,
+                   arg_types: Iterable[str],
+                   args: list) -> tuple[list[str], list[tuple]]:
+    """
+    Executes sql_cmd with numbered parameters and returns names of columns
+    and rows. Statement is prepared by the driver on the connection, so plan
+    is reused by next executions over the same pooled connection.
+
+    If the awaiting task is cancelled (e.g. the client disconnected), the
+    running query is cancelled on the server too and the connection is
+    discarded by the pool instead of finishing the report for nobody.
+    """
+    try:
+        async with db_connection.cursor() as cursor:
+            await cursor.execute(
+                get_named_sql(sql_cmd=sql_cmd, arg_types=arg_types),
+                {str(i): arg for i, arg in enumerate(args, start=1)},
+                prepare=True
+            )
+            return (
+                [column.name for column in cursor.description],
+                await cursor.fetchall()
+            )
+    except asyncio.CancelledError:
+        db_connection.cancel()
+        raise
+
+
+async def observe_report_async(query_index: int, args: list,
+                               duration: float, row_count: int) -> None:
+    """
+    Async version of observe_report: slow report is logged in a thread, so
+    the event loop is not blocked by the sync database connection.
+    """
+    if not is_slow(duration):
+        REPORT_DURATION.observe(duration, report=str(query_index))
+        return
+    await sync_to_async(observe_report)(
+        query_index=query_index,
+        args=args,
+        duration=duration,
+        row_count=row_count
+    )
+
+
+async def run_report_async(query_index: int,
+                           args: Iterable[Any]) -> list[tuple]:
+    """
+    Async version of run_report: executes report with given index of
+    QUERY_INFO over a pooled async connection and returns its rows.
+    """
+    info = QUERY_INFO[query_index]
+    pool = await get_pool()
+    args = list(args)
+    async with pool.connection() as db_connection:
+        start = perf_counter()
+        rows = (await _execute(
+            db_connection=db_connection,
+            sql_cmd=info['sql_cmd'],
+            arg_types=info['arg_types'],
+            args=args
+        ))[1]
+    await observe_report_async(
+        query_index=query_index,
+        args=args,
+        duration=perf_counter() - start,
+        row_count=len(rows)
+    )
+
+    return rows
+
+
+async def run_report_page_async(
+    query_index: int,
+    args: Iterable[Any],
+    cursor: Optional[str] = None
+) -> tuple[list[tuple], Optional[str], Optional[str]]:
+    """
+    Async version of run_report_page: executes page of report with given
+    index of QUERY_INFO starting at given cursor and returns its rows and
+    cursors of the next and the previous pages.
+    """
+    direction, values = get_page_direction(
+        query_index=query_index,
+        cursor=cursor
+    )
+    sql_cmd, arg_types = get_page_sql(
+        query_index=query_index,
+        direction=direction
+    )
+
+    args = list(args)
+    pool = await get_pool()
+    async with pool.connection() as db_connection:
+        start = perf_counter()
+        try:
+            columns, rows = await _execute(
+                db_connection=db_connection,
+                sql_cmd=sql_cmd,
+                arg_types=arg_types,
+                args=[
+                    *args,
+                    *values,
+                    QUERY_INFO[query_index]['page_size'] + 1
+                ]
+            )
+        except DataError:
+            raise BadRequest('Некорректный курсор страницы.')
+    await observe_report_async(
+        query_index=query_index,
+        args=args,
+        duration=perf_counter() - start,
+        row_count=len(rows)
+    )
+
+    return get_page(
+        query_index=query_index,
+        direction=direction,
+        columns=columns,
+        rows=rows
+    )
+
+
+async def run_cached_report_async(query_index: int,
+                                  args: Iterable[Any]) -> list[tuple]:
+    """
+    Get rows of report with given index of QUERY_INFO from the report cache,
+    executing it by run_report_async on cache miss.
+    """
+    args = list(args)
+
+    return await aget_cached(
+        args=args,
+        compute=lambda: run_report_async(query_index=query_index, args=args),
+        query_index=query_index,
+        tables=QUERY_INFO[query_index]['tables']
+    )
+
+
+async def run_cached_report_page_async(
+    query_index: int,
+    args: Iterable[Any],
+    cursor: Optional[str] = None
+) -> tuple[list[tuple], Optional[str], Optional[str]]:
+    """
+    Get page of report with given index of QUERY_INFO like
+    run_report_page_async from the report cache, executing it on cache miss.
+    """
+    args = list(args)
+
+    return await aget_cached(
+        args=[args, cursor],
+        compute=lambda: run_report_page_async(
+            query_index=query_index,
+            args=args,
+            cursor=cursor
+        ),
+        query_index=query_index,
+        tables=QUERY_INFO[query_index]['tables']
+    )
@@ -0,0 +1,161 @@
+from hashlib import sha1
+from typing import Any, Awaitable, Callable, Iterable
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.db import connection, transaction
+
+from .sql import (ADD_TABLE_VERSIONS_CMD, BUMP_TABLE_VERSIONS_CMD,
+                  TABLE_VERSIONS_CMD)
+
+REPORTS_CACHE_ALIAS = 'reports'
+
+_references: dict[str, tuple[Any, tuple[tuple[int, str], ...]]] = {}
+
+
+def _get_cache():
+    return caches[REPORTS_CACHE_ALIAS]
+
+
+def _incr(key: str) -> None:
+    cache = _get_cache()
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def get_cache_stats() -> dict[str, int]:
+    """
+    Get counts of report cache hits and misses kept in the report cache
+    itself. With a shared backend (e.g. Redis or Memcached) they cover all
+    processes using it, with per-process LocMemCache (the default) only the
+    current process.
+
+    For example, if one report was requested 3 times without changes of its
+    tables it will return
+    {
+        'hits': 2,
+        'misses': 1,
+    }
+    """
+    stats = _get_cache().get_many(['stats:hits', 'stats:misses'])
+    return {
+        'hits': stats.get('stats:hits', 0),
+        'misses': stats.get('stats:misses', 0)
+    }
+
+
+def _get_versions(tables: Iterable[str]) -> list[Any]:
+    """
+    Get current versions of given tables from table_version table, so
+    versions changed by any process (web server or run_worker) are seen by
+    all of them whatever cache backend is used. Tables without version get
+    the current transaction ID as the initial one.
+    """
+    tables = list(tables)
+    with connection.cursor() as cursor:
+        cursor.execute(TABLE_VERSIONS_CMD, [tables])
+        versions = dict(cursor.fetchall())
+        if missing := [table for table in tables if table not in versions]:
+            cursor.execute(ADD_TABLE_VERSIONS_CMD, [missing])
+            cursor.execute(TABLE_VERSIONS_CMD, [missing])
+            versions.update(cursor.fetchall())
+
+    return [versions[table] for table in tables]
+
+
+def _lookup(query_index: int, args: Iterable[Any],
+            tables: Iterable[str]) -> tuple[str, Any]:
+    """
+    Get cache key of report with given index and arguments and its cached
+    value (None on cache miss), counting hits and misses.
+
+    Key of every entry contains current versions of tables the report depends
+    on, so changing any of them (see invalidate_tables) makes related entries
+    unreachable while entries of other reports stay valid.
+    """
+    cache = _get_cache()
+    args_hash = sha1(repr(list(args)).encode()).hexdigest()
+    key = ':'.join(
+        ['report', str(query_index), args_hash]
+        + [str(version) for version in _get_versions(tables)]
+    )
+
+    value = cache.get(key)
+    _incr('stats:misses' if value is None else 'stats:hits')
+
+    return key, value
+
+
+def get_cached(query_index: int, args: Iterable[Any],
+               tables: Iterable[str], compute: Callable[[], Any]) -> Any:
+    """
+    Get result of report with given index and arguments from the cache or
+    compute and store it if there is no actual value.
+    """
+    key, value = _lookup(query_index=query_index, args=args, tables=tables)
+    if value is None:
+        value = compute()
+        _get_cache().set(key, value)
+
+    return value
+
+
+async def aget_cached(query_index: int, args: Iterable[Any],
+                      tables: Iterable[str],
+                      compute: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Async version of get_cached: cache backend is called in a thread while
+    the result is computed by awaiting compute on the event loop.
+    """
+    key, value = await sync_to_async(_lookup)(
+        query_index=query_index,
+        args=args,
+        tables=tables
+    )
+    if value is None:
+        value = await compute()
+        await sync_to_async(lambda: _get_cache().set(key, value))()
+
+    return value
+
+
+def get_reference_choices(model) -> tuple[tuple[int, str], ...]:
+    """
+    Get IDs and labels of all rows of small reference table of given model
+    (e.g. products) in its default ordering. Rows are kept in the process
+    memory together with version of the table, and reloaded by a single
+    query when the version changes (see invalidate_tables), so changes made
+    by any process are seen right after commit.
+
+    For example, for Product model it may return
+    (
+        (1, '[1001] Цемент'),
+        (2, '[1002] Песок'),
+    )
+    """
+    table = model._meta.db_table
+    version = _get_versions([table])[0]
+    entry = _references.get(table)
+    if entry is None or entry[0] != version:
+        entry = _references[table] = (
+            version,
+            tuple((obj.pk, str(obj)) for obj in model._default_manager.all())
+        )
+
+    return entry[1]
+
+
+def invalidate_tables(*tables: str) -> None:
+    """
+    Makes cached results of reports and reference choices depending on given
+    tables outdated in all processes after the current transaction is
+    committed.
+    """
+    def bump() -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(BUMP_TABLE_VERSIONS_CMD, [list(tables)])
+
+    transaction.on_commit(bump)
@@ -0,0 +1,16 @@
+from django.contrib.admin import RelatedFieldListFilter
+
+from .cache import get_reference_choices
+
+
+class ReferenceFieldListFilter(RelatedFieldListFilter):
+    """
+    Filter by foreign key to reference table (e.g. warehouse) taking its
+    choices from the process cache instead of querying the table on every
+    changelist page.
+    """
+    def field_choices(self, field, request, model_admin):
+        if self.field_admin_ordering(field, request, model_admin):
+            return super().field_choices(field, request, model_admin)
+
+        return list(get_reference_choices(field.related_model))
@@ -1,64 +1,60 @@
-from datetime import datetime
+from django.forms import (BaseInlineFormSet, CharField, ChoiceField, DateField,
+                          Form, ModelForm, ValidationError)
 
-from django.db.models import Sum
-from django.forms import DateField, Form, ModelForm, ValidationError, CharField
-
-from .models import (Product, ProductOrder, ProductTransit, ProductWarehouse,
-                     Shop, Vehicle, VehicleOrder, VehicleTransit, Warehouse)
-from .utils import (get_datetime_local_timezone, get_inline_sum,
-                    get_product_payload_diff, is_vehicle_available)
+from .models import (ProductOrder, ProductTransit, ProductWarehouse, Shop,
+                     VehicleOrder, VehicleTransit, Warehouse)
+from .utils import get_available_payloads, get_busy_vehicles, get_inline_sum
 from django.conf import settings
 
 
 class ProductOrderInlineForm(ModelForm):
     """Inline entity attached to ProductOrder model. Used in Order instance."""
-    def clean_payload(self):
+    class Meta:
+        fields = ('product', 'payload')
+        model = ProductOrder
+
+
+class ProductOrderInlineFormSet(BaseInlineFormSet):
+    """Inline formset of ProductOrder model. Used in Order instance."""
+    def clean(self):
         """
-        Custom validation while creating new order for required payload --
-        checks that count of this product will be in an associated warehouse at
-        chosen time.
+        Custom validation while creating new order for required payloads --
+        checks that count of every product will be in an associated warehouse
+        at chosen time and is not reserved by other orders. Payloads of all
+        products are fetched by a single query whatever count of rows is.
+        Reserved payloads stay locked until the order is saved in the same
+        transaction, which reserves its products.
         """
-        if self.data.get('warehouse') != '':
-            product: Product = self.cleaned_data.get('product')
-            required_payload: int = self.cleaned_data.get('payload')
-            warehouse_id: int = self.data.get('warehouse')
-            warehouse = Warehouse.objects.filter(pk=warehouse_id).first()
-
-            date_start: str = self.data.get('date_start_0')
-            time_start: str = self.data.get('date_start_1')
-            date_end: str = self.data.get('date_end_0')
-            time_end: str = self.data.get('date_end_1')
-
-            if all(i for i in (date_start, time_start, date_end, time_end)):
-                date_start: datetime = get_datetime_local_timezone(
-                    date=date_start,
-                    time=time_start
-                )
-                date_end: datetime = get_datetime_local_timezone(
-                    date=date_end,
-                    time=time_end
-                )
-                diff: int = get_product_payload_diff(
-                    datetime=date_start,
-                    product=product,
-                    warehouse=warehouse
-                )
-                current_payload: int = ProductWarehouse.objects.filter(
-                    product=product,
-                    warehouse=warehouse
-                ).aggregate(sum=Sum('payload')).get('sum') or 0
-
-                if required_payload > (val := current_payload + diff):
-                    raise ValidationError(
+        super().clean()
+        order = self.instance
+
+        if order.warehouse_id is None or order.date_start is None:
+            return
+
+        forms = [
+            form for form in self.forms
+            if form.cleaned_data.get('product') is not None
+            and form.cleaned_data.get('payload') is not None
+            and not self._should_delete_form(form)
+        ]
+        available: dict[int, int] = get_available_payloads(
+            warehouse=order.warehouse_id,
+            products=[form.cleaned_data['product'] for form in forms],
+            datetime=order.date_start,
+            lock=True
+        )
+
+        for form in forms:
+            required_payload: int = form.cleaned_data['payload']
+            val: int = available[form.cleaned_data['product'].pk]
+            if required_payload > val:
+                form.add_error(
+                    field='payload',
+                    error=ValidationError(
                         message='На складе нет такого количества товара'
                                 + f' (доступно {val} т).'
                     )
-
-        return self.cleaned_data.get('payload')
-
-    class Meta:
-        fields = ('product', 'payload')
-        model = ProductOrder
+                )
 
 
 class ProductTransitInlineForm(ModelForm):
@@ -78,11 +74,10 @@ class ProductTransitInlineForm(ModelForm):
                 data=self.data,
                 pattern=r'^product_transit-[0-9]+-payload$'
             )
-            current_payload: int = ProductWarehouse.objects.filter(
-                warehouse=warehouse
-            ).aggregate(sum=Sum('payload')).get('sum') or 0
 
-            if (val := current_payload + new_payload) > warehouse.max_capacity:
+            if (val := warehouse.current_load + new_payload) > (
+                warehouse.max_capacity
+            ):
                 raise ValidationError(
                     message='Склад не сможет вместить такое количество товаров'
                             + f' ({val} > {warehouse.max_capacity}).'
@@ -131,7 +126,32 @@ class QueryDateForm(Form):
     date = DateField(label='Введите дату:')
 
 
-class QueryFullnameForm(Form):
+class QueryMatchForm(Form):
+    """
+    Base form of reports looking up by names or addresses, adds choice of
+    match mode as the last field.
+    """
+    match = ChoiceField(
+        choices=(
+            ('exact', 'Точное совпадение'),
+            ('prefix', 'Начинается с'),
+            ('fuzzy', 'Похожие значения'),
+        ),
+        initial='exact',
+        label='Способ поиска:',
+        required=False
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['match'] = self.fields.pop('match')
+
+    def clean_match(self):
+        """Exact match is used if match mode is not given."""
+        return self.cleaned_data.get('match') or 'exact'
+
+
+class QueryFullnameForm(QueryMatchForm):
     first_name = CharField(
         max_length=settings.MAX_NAME_LENGTH,
         label='Введите имя:'
@@ -146,7 +166,7 @@ class QuerySixForm(QueryDateForm, QueryFullnameForm):
     pass
 
 
-class QueryWarehouseNameForm(Form):
+class QueryWarehouseNameForm(QueryMatchForm):
     name = CharField(
         max_length=settings.MAX_WAREHOUSE_NAME_LENGTH,
         label='Введите название:'
@@ -179,40 +199,66 @@ class ShopForm(ModelForm):
 
 class VehicleInlineBaseForm(ModelForm):
     """Base form for Vehicle inline instance."""
-    def clean_vehicle(self):
+    class Meta:
+        fields = ('vehicle',)
+
+
+class VehicleInlineFormSet(BaseInlineFormSet):
+    """
+    Inline formset of VehicleOrder and VehicleTransit models. Used in Order
+    and Transit instances.
+
+    If booking_overlap is True, saving the same data failed because of a
+    concurrently booked vehicle (see VehicleBookingMixin), so the formset is
+    never valid.
+    """
+    def __init__(self, *args, booking_overlap=False, **kwargs):
+        self.booking_overlap = booking_overlap
+        super().__init__(*args, **kwargs)
+
+    def clean(self):
         """
-        Custom validation while creating instance that contains vehicle --
-        checks that vehicle is available at given time range.
+        Custom validation while creating instance that contains vehicles --
+        checks that all vehicles are available at given time range by a single
+        query and shows bookings every busy vehicle conflicts with.
         """
-        vehicle: Vehicle = self.cleaned_data.get('vehicle')
-        date_start: str = self.data.get('date_start_0')
-        time_start: str = self.data.get('date_start_1')
-        date_end: str = self.data.get('date_end_0')
-        time_end: str = self.data.get('date_end_1')
-
-        if all(i for i in (date_start, time_start, date_end, time_end)):
-            date_start: datetime = get_datetime_local_timezone(
-                date=date_start,
-                time=time_start
-            )
-            date_end: datetime = get_datetime_local_timezone(
-                date=date_end,
-                time=time_end
-            )
-
-            if not is_vehicle_available(
-                date_end=date_end,
-                date_start=date_start,
-                vehicle=vehicle
-            ):
-                raise ValidationError(
-                    message='Машина занята в это время.'
+        super().clean()
+        instance = self.instance
+
+        if instance.date_start is None or instance.date_end is None:
+            return
+
+        forms = [
+            form for form in self.forms
+            if form.cleaned_data.get('vehicle') is not None
+            and not self._should_delete_form(form)
+        ]
+        busy: dict[int, dict[str, list[int]]] = get_busy_vehicles(
+            date_end=instance.date_end,
+            date_start=instance.date_start,
+            vehicles=[form.cleaned_data['vehicle'] for form in forms]
+        )
+
+        for form in forms:
+            if (bookings := busy.get(form.cleaned_data['vehicle'].pk)):
+                conflicts = [
+                    f'заказ #{i}' for i in bookings['orders']
+                ] + [
+                    f'поставка #{i}' for i in bookings['transits']
+                ]
+                form.add_error(
+                    field='vehicle',
+                    error=ValidationError(
+                        message='Машина занята в это время ('
+                                + ', '.join(conflicts) + ').'
+                    )
                 )
 
-        return vehicle
-
-    class Meta:
-        fields = ('vehicle',)
+        if self.booking_overlap and not any(form.errors for form in forms):
+            raise ValidationError(
+                message='Машина была занята другим заказом или поставкой во '
+                        'время сохранения, проверьте машины и сохраните снова.'
+            )
 
 
 class VehicleOrderInlineForm(VehicleInlineBaseForm):
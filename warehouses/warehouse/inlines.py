@@ -1,11 +1,12 @@
 from django.contrib.admin import TabularInline
 
-from .forms import (ProductOrderInlineForm, ProductTransitInlineForm,
-                    ProductWarehouseInlineForm, VehicleOrderInlineForm,
+from .forms import (ProductOrderInlineForm, ProductOrderInlineFormSet,
+                    ProductTransitInlineForm, ProductWarehouseInlineForm,
+                    VehicleInlineFormSet, VehicleOrderInlineForm,
                     VehicleTransitInlineForm)
 from .mixins import (MaxProductChoiceMixin, MaxVehicleChoiceMixin,
                      NoAddPermissionMixin, NoChangePermissionMixin,
-                     UnacceptedFilterMixin)
+                     ReferenceChoicesMixin, UnacceptedFilterMixin)
 from .models import (Order, ProductOrder, ProductTransit, ProductWarehouse,
                      Shop, Transit, Vehicle, VehicleOrder, VehicleTransit,
                      Warehouse)
@@ -18,7 +19,7 @@ class ImmutableTabularInline(NoAddPermissionMixin,
     show_change_link = True
 
 
-class MutableTabularInline(TabularInline):
+class MutableTabularInline(ReferenceChoicesMixin, TabularInline):
     can_delete = True
     extra = 0
     min_num = 1
@@ -32,6 +33,7 @@ class OrderInline(UnacceptedFilterMixin, ImmutableTabularInline):
 
 class ProductOrderInline(MaxProductChoiceMixin, MutableTabularInline):
     form = ProductOrderInlineForm
+    formset = ProductOrderInlineFormSet
     model = ProductOrder
 
 
@@ -69,11 +71,13 @@ class VehicleInline(ImmutableTabularInline):
 
 class VehicleOrderInline(MaxVehicleChoiceMixin, MutableTabularInline):
     form = VehicleOrderInlineForm
+    formset = VehicleInlineFormSet
     model = VehicleOrder
 
 
 class VehicleTransitInline(MaxVehicleChoiceMixin, MutableTabularInline):
     form = VehicleTransitInlineForm
+    formset = VehicleInlineFormSet
     model = VehicleTransit
 
 
@@ -0,0 +1,180 @@
+import json
+from contextlib import contextmanager
+from threading import Event, Thread
+from time import sleep
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .sql import (CLAIM_JOB_CMD, ENQUEUE_JOB_CMD, FINISH_JOB_CMD,
+                  JOB_HEARTBEAT_CMD, JOB_PROGRESS_CMD, RELEASE_JOB_CMD,
+                  REQUEUE_JOBS_CMD)
+from .utils import accept_orders, accept_transits
+
+
+class JobLost(Exception):
+    """Raised when the job was claimed again by another worker."""
+
+
+def _accept_orders_chunk(object_ids: list[int], result: dict) -> None:
+    accepted, failures = accept_orders(order_ids=object_ids)
+    result['accepted'] = result.get('accepted', 0) + accepted
+    result.setdefault('failures', {}).update(
+        {str(order_id): shortages for order_id, shortages in failures.items()}
+    )
+
+
+def _accept_transits_chunk(object_ids: list[int], result: dict) -> None:
+    result['accepted'] = result.get('accepted', 0) + accept_transits(
+        transit_ids=object_ids
+    )
+
+
+JOB_KINDS: dict[str, Callable[[list[int], dict], None]] = {
+    'accept_order': _accept_orders_chunk,
+    'accept_transit': _accept_transits_chunk,
+}
+
+
+def enqueue_job(kind: str, object_ids: Iterable[int]) -> Optional[int]:
+    """
+    Adds job of given kind of JOB_KINDS processing given objects (in given
+    order) to the queue and returns its id, or None if there are no objects.
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    object_ids = list(object_ids)
+    if not object_ids:
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(ENQUEUE_JOB_CMD, [kind, object_ids])
+        return cursor.fetchone()[0]
+
+
+def requeue_jobs(job_ids: Iterable[int]) -> int:
+    """
+    Puts failed jobs back to the queue, they continue from the first
+    unprocessed chunk. Returns count of requeued jobs.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(REQUEUE_JOBS_CMD, [list(job_ids)])
+        return cursor.rowcount
+
+
+def claim_job() -> Optional[tuple[int, str, list[int], int, dict, int]]:
+    """
+    Marks the oldest queued job (or running job whose worker stopped sending
+    heartbeats for JOB_STALE_TIMEOUT seconds) as running and returns its id,
+    kind, object ids, count of processed objects, result and number of the
+    attempt, or None if the queue is empty. Candidate row is locked with SKIP
+    LOCKED, so concurrent workers never wait for each other and never claim
+    the same job.
+
+    Number of the attempt is the claim token: progress of the job is only
+    recorded by the worker of its last attempt.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(CLAIM_JOB_CMD, [settings.JOB_STALE_TIMEOUT])
+        return cursor.fetchone()
+
+
+@contextmanager
+def _heartbeat(job_id: int, attempt: int) -> Iterator[None]:
+    """
+    Refreshes heartbeat of the job in a separate thread (with its own
+    database connection) every third of JOB_STALE_TIMEOUT while the block
+    runs, so long chunks are not taken for a stopped worker.
+    """
+    stopped = Event()
+
+    def beat() -> None:
+        try:
+            while not stopped.wait(settings.JOB_STALE_TIMEOUT / 3):
+                with connection.cursor() as cursor:
+                    cursor.execute(JOB_HEARTBEAT_CMD, [job_id, attempt])
+        finally:
+            connection.close()
+
+    thread = Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def run_job(job_id: int, kind: str, object_ids: list[int], processed: int,
+            result: dict[str, Any], attempt: int,
+            should_stop: Callable[[], bool] = lambda: False) -> None:
+    """
+    Processes objects of the job starting after already processed ones by
+    chunks of JOB_CHUNK_SIZE. Every chunk is applied and recorded in job's
+    progress in one transaction, so job interrupted at any moment continues
+    from the first unapplied chunk. Failed chunk is rolled back and the job
+    is marked as failed with the error. If should_stop returns True between
+    chunks, the job is put back to the queue.
+
+    Every update of the job checks that it still belongs to given attempt.
+    If another worker claimed the job, the current chunk is rolled back and
+    the job is left to that worker.
+    """
+    process_chunk = JOB_KINDS[kind]
+    with _heartbeat(job_id=job_id, attempt=attempt):
+        try:
+            while processed < len(object_ids):
+                if should_stop():
+                    with connection.cursor() as cursor:
+                        cursor.execute(RELEASE_JOB_CMD, [job_id, attempt])
+                    return
+                chunk = object_ids[
+                    processed:processed + settings.JOB_CHUNK_SIZE
+                ]
+                with transaction.atomic(), connection.cursor() as cursor:
+                    process_chunk(chunk, result)
+                    cursor.execute(
+                        JOB_PROGRESS_CMD,
+                        [processed + len(chunk), json.dumps(result), job_id,
+                         attempt]
+                    )
+                    if cursor.rowcount == 0:
+                        raise JobLost(job_id)
+                processed += len(chunk)
+        except JobLost:
+            return
+        except Exception as error:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    FINISH_JOB_CMD,
+                    ['failed', repr(error), job_id, attempt]
+                )
+            raise
+
+        with connection.cursor() as cursor:
+            cursor.execute(FINISH_JOB_CMD, ['done', None, job_id, attempt])
+
+
+def run_worker(should_stop: Callable[[], bool] = lambda: False,
+               once: bool = False) -> int:
+    """
+    Claims and runs jobs until should_stop returns True (checked between
+    chunks), sleeping for JOB_POLL_INTERVAL seconds while the queue is empty.
+    If once is True, returns when the queue is empty. Returns count of run
+    jobs. Error of a job is recorded in it and does not stop the worker.
+    """
+    count = 0
+    while not should_stop():
+        if (job := claim_job()) is None:
+            if once:
+                break
+            sleep(settings.JOB_POLL_INTERVAL)
+            continue
+        try:
+            run_job(*job, should_stop=should_stop)
+        except Exception:
+            connection.close_if_unusable_or_obsolete()
+        count += 1
+
+    return count
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from warehouse.sql import (REBUILD_STOCK_PROJECTION_CMD,
+                           STOCK_PROJECTION_MISMATCH_CMD,
+                           STOCK_PROJECTION_SAMPLE_CMD)
+from warehouse.utils import (aggregate_product_payload_diff,
+                             get_product_payload_diff,
+                             legacy_product_payload_diff,
+                             started_product_payload_diff)
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает проекцию остатков (stock_projection) с нуля и '
+            'сверяет ее с агрегацией по поставкам и заказам, а также с '
+            'прежней агрегацией с учетом выполняющихся поставок и заказов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='Только сверить проекцию, не пересчитывая ее.'
+        )
+        parser.add_argument(
+            '--sample',
+            default=100,
+            type=int,
+            help='Количество случайных точек (склад, товар, время) для '
+                 'сверки с агрегацией.'
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(REBUILD_STOCK_PROJECTION_CMD)
+            self.stdout.write('Проекция остатков пересчитана.')
+
+        with connection.cursor() as cursor:
+            cursor.execute(STOCK_PROJECTION_MISMATCH_CMD)
+            mismatches: int = cursor.fetchone()[0]
+            cursor.execute(STOCK_PROJECTION_SAMPLE_CMD, [options['sample']])
+            sample = cursor.fetchall()
+
+        legacy_mismatches = 0
+        for warehouse_id, product_id, event_time in sample:
+            for point in (event_time, event_time + event_time.resolution):
+                params = {
+                    'warehouse': warehouse_id,
+                    'product': product_id,
+                    'datetime': point
+                }
+                projected = get_product_payload_diff(**params)
+                if projected != aggregate_product_payload_diff(**params):
+                    mismatches += 1
+                if projected != (
+                    legacy_product_payload_diff(**params)
+                    + started_product_payload_diff(**params)
+                ):
+                    legacy_mismatches += 1
+
+        if mismatches or legacy_mismatches:
+            raise CommandError(
+                f'Проекция остатков расходится с агрегацией ({mismatches}) '
+                f'и с прежней агрегацией ({legacy_mismatches}).'
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            'Проекция остатков совпадает с агрегацией и, кроме выполняющихся '
+            'поставок и заказов, с прежней агрегацией.'
+        ))
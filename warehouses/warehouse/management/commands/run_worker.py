@@ -0,0 +1,57 @@
+import signal
+from multiprocessing import Event, Process
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from warehouse.jobs import run_worker
+
+
+def run_worker_process(stop_event, once: bool) -> None:
+    """Runs worker in a child process until stop_event is set."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        run_worker(should_stop=stop_event.is_set, once=once)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ('Выполняет задания из очереди (job), например осуществление '
+            'выбранных в административной части заказов и поставок. Задания '
+            'разбираются несколькими процессами параллельно, SIGINT или '
+            'SIGTERM останавливает процессы после текущей порции объектов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            default=1,
+            type=int,
+            help='Количество процессов, выполняющих задания.'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Завершиться, когда очередь опустеет.'
+        )
+
+    def handle(self, *args, **options):
+        stop_event = Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop_event.set())
+
+        connections.close_all()
+        processes = [
+            Process(
+                target=run_worker_process,
+                args=(stop_event, options['once']),
+                daemon=True
+            ) for _ in range(max(options['processes'], 1))
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f'Запущено процессов: {len(processes)}.')
+
+        for process in processes:
+            process.join()
+        self.stdout.write('Процессы остановлены.')
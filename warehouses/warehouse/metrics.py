@@ -0,0 +1,288 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+from typing import Callable, Iterable, Iterator
+
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .sql import JOB_ACCEPT_TOTALS_CMD
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_registry = []
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n',
+        '\\n'
+    )
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    labels = ','.join(
+        f'{name}="{_escape(str(value))}"'
+        for name, value in zip(names, values)
+    )
+    return '{' + labels + '}' if labels else ''
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+
+class Metric:
+    """
+    Base metric of the process registry with given label names. Values of
+    every combination of labels are kept separately.
+    """
+    kind = ''
+
+    def __init__(self, name: str, description: str,
+                 labels: Iterable[str] = ()):
+        self.description = description
+        self.labels = tuple(labels)
+        self.lock = Lock()
+        self.name = name
+        self.values = {}
+        _registry.append(self)
+
+    def get_key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(labels[name] for name in self.labels)
+
+    def render_samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> Iterator[str]:
+        yield f'# HELP {self.name} {self.description}'
+        yield f'# TYPE {self.name} {self.kind}'
+        yield from self.render_samples()
+
+
+class Counter(Metric):
+    """Monotonically increasing value, e.g. count of accepted orders."""
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self.get_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render_samples(self) -> Iterator[str]:
+        with self.lock:
+            values = dict(self.values)
+        for key, value in sorted(values.items()):
+            yield (
+                f'{self.name}{_format_labels(self.labels, key)} '
+                + _format_value(value)
+            )
+
+
+class CollectedCounter(Metric):
+    """
+    Counter whose values are collected on rendering by given function
+    returning values by keys of labels, e.g. totals kept in the database by
+    other processes.
+    """
+    kind = 'counter'
+
+    def __init__(self, name: str, description: str,
+                 collect: Callable[[], dict[tuple[str, ...], float]],
+                 labels: Iterable[str] = ()):
+        super().__init__(name=name, description=description, labels=labels)
+        self.collect = collect
+
+    def render_samples(self) -> Iterator[str]:
+        for key, value in sorted(self.collect().items()):
+            yield (
+                f'{self.name}{_format_labels(self.labels, key)} '
+                + _format_value(value)
+            )
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values by buckets with their sum and count,
+    e.g. durations of requests. Observation only increments one bucket, the
+    cumulative counts are calculated on rendering.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name: str, description: str,
+                 labels: Iterable[str] = (),
+                 buckets: Iterable[float] = DURATION_BUCKETS):
+        super().__init__(name=name, description=description, labels=labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self.get_key(labels)
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            if (data := self.values.get(key)) is None:
+                data = self.values[key] = [
+                    [0] * (len(self.buckets) + 1),
+                    0,
+                    0
+                ]
+            data[0][index] += 1
+            data[1] += value
+            data[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observes duration of the block in seconds."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, **labels)
+
+    def render_samples(self) -> Iterator[str]:
+        with self.lock:
+            values = {
+                key: (list(counts), total, count)
+                for key, (counts, total, count) in self.values.items()
+            }
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(
+                (*self.buckets, float('inf')),
+                counts
+            ):
+                cumulative += bucket_count
+                labels = _format_labels(
+                    (*self.labels, 'le'),
+                    (*key, _format_value(bound))
+                )
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labels, key)
+            yield f'{self.name}_sum{labels} {_format_value(total)}'
+            yield f'{self.name}_count{labels} {count}'
+
+
+ACCEPT_ACTIONS = Counter(
+    name='warehouse_accept_actions_total',
+    description='Accept actions of orders and transits (enqueued jobs).',
+    labels=('action',)
+)
+
+
+def _collect_job_totals(column: int) -> dict[tuple[str], int]:
+    """
+    Get given column of totals of accept jobs by their kinds. Jobs are run
+    by worker processes, so the totals are read from their results.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(JOB_ACCEPT_TOTALS_CMD)
+        return {(row[0],): row[column] for row in cursor.fetchall()}
+
+
+ACCEPTED = CollectedCounter(
+    name='warehouse_accepted_total',
+    description='Orders and transits accepted by accept jobs.',
+    collect=lambda: _collect_job_totals(column=1),
+    labels=('action',)
+)
+
+ACCEPT_FAILURES = CollectedCounter(
+    name='warehouse_accept_failures_total',
+    description='Orders not accepted because of lack of products.',
+    collect=lambda: _collect_job_totals(column=2),
+    labels=('action',)
+)
+
+REPORT_DURATION = Histogram(
+    name='warehouse_report_duration_seconds',
+    description='Execution time of reports (cache misses only).',
+    labels=('report',)
+)
+
+REQUEST_DURATION = Histogram(
+    name='warehouse_request_duration_seconds',
+    description='Time of handling requests by URL name.',
+    labels=('view', 'method')
+)
+
+REQUEST_SQL_DURATION = Histogram(
+    name='warehouse_request_sql_duration_seconds',
+    description='Total time of SQL queries per request by URL name.',
+    labels=('view',)
+)
+
+REQUEST_SQL_QUERIES = Histogram(
+    name='warehouse_request_sql_queries',
+    description='Count of SQL queries per request by URL name.',
+    labels=('view',),
+    buckets=QUERY_COUNT_BUCKETS
+)
+
+
+class SQLStats:
+    """Count and total time of SQL queries of one request."""
+    __slots__ = ('count', 'duration')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+_request_sql = ContextVar('request_sql', default=None)
+
+
+def start_request_sql() -> tuple[SQLStats, object]:
+    """
+    Starts accounting SQL queries of the current request (context) and
+    returns its stats and the token to stop it by stop_request_sql. Context
+    is copied to threads running sync code, so queries of sync views under
+    ASGI are accounted too.
+    """
+    stats = SQLStats()
+    return stats, _request_sql.set(stats)
+
+
+def stop_request_sql(token) -> None:
+    _request_sql.reset(token)
+
+
+def _record_sql(execute, sql, params, many, context):
+    if (stats := _request_sql.get()) is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.duration += perf_counter() - start
+        stats.count += 1
+
+
+@receiver(connection_created)
+def install_sql_wrapper(sender, connection, **kwargs):
+    """Accounts SQL queries of every database connection of the process."""
+    if _record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_sql)
+
+
+def render() -> str:
+    """
+    Get metrics of the process registry in Prometheus text format.
+
+    For example, after one accepted order it will contain
+    # HELP warehouse_accepted_total Orders and transits accepted by ...
+    # TYPE warehouse_accepted_total counter
+    warehouse_accepted_total{action="accept_order"} 1.0
+    """
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,52 @@
+import asyncio
+from time import perf_counter
+
+from .metrics import (REQUEST_DURATION, REQUEST_SQL_DURATION,
+                      REQUEST_SQL_QUERIES, start_request_sql, stop_request_sql)
+
+UNRESOLVED_VIEW = '<unresolved>'
+
+
+class MetricsMiddleware:
+    """
+    Records time of handling every request and count and total time of its
+    SQL queries labeled by URL name of the view (e.g. warehouses:query_view
+    or admin:warehouse_order_changelist). Supports both sync and async
+    request handling, so async views are not switched to a thread.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats, token = start_request_sql()
+        start = perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            self.record(request, stats, perf_counter() - start)
+            stop_request_sql(token)
+
+    async def __acall__(self, request):
+        stats, token = start_request_sql()
+        start = perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.record(request, stats, perf_counter() - start)
+            stop_request_sql(token)
+
+    @staticmethod
+    def record(request, stats, duration):
+        view = UNRESOLVED_VIEW
+        if (resolver_match := request.resolver_match) is not None:
+            view = resolver_match.view_name
+        REQUEST_DURATION.observe(duration, view=view, method=request.method)
+        REQUEST_SQL_DURATION.observe(stats.duration, view=view)
+        REQUEST_SQL_QUERIES.observe(stats.count, view=view)
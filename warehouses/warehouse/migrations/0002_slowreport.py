@@ -0,0 +1,32 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('args', models.JSONField(verbose_name='Параметры')),
+                ('created_at', models.DateTimeField(verbose_name='Время выполнения')),
+                ('duration', models.FloatField(verbose_name='Длительность (с)')),
+                ('plan', models.TextField(blank=True, null=True, verbose_name='План выполнения')),
+                ('query_index', models.PositiveSmallIntegerField(verbose_name='Номер запроса')),
+                ('row_count', models.PositiveIntegerField(verbose_name='Количество строк')),
+            ],
+            options={
+                'verbose_name': 'Медленный запрос',
+                'verbose_name_plural': 'Медленные запросы',
+                'db_table': 'slow_report_log',
+                'ordering': ('-created_at',),
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:02
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0002_slowreport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveSmallIntegerField(verbose_name='Попыток')),
+                ('created_at', models.DateTimeField(verbose_name='Создано')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Ошибка')),
+                ('finished_at', models.DateTimeField(null=True, verbose_name='Завершено')),
+                ('heartbeat_at', models.DateTimeField(null=True, verbose_name='Последняя активность')),
+                ('kind', models.CharField(choices=[('accept_order', 'Осуществление заказов'), ('accept_transit', 'Осуществление поставок')], max_length=30, verbose_name='Тип')),
+                ('object_ids', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None, verbose_name='Объекты')),
+                ('processed', models.PositiveIntegerField(verbose_name='Обработано объектов')),
+                ('result', models.JSONField(verbose_name='Результат')),
+                ('started_at', models.DateTimeField(null=True, verbose_name='Начато')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Выполнено'), ('failed', 'Ошибка')], max_length=10, verbose_name='Статус')),
+            ],
+            options={
+                'verbose_name': 'Задание',
+                'verbose_name_plural': 'Задания',
+                'db_table': 'job',
+                'ordering': ('-id',),
+                'managed': False,
+            },
+        ),
+    ]
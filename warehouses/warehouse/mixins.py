@@ -1,4 +1,11 @@
-from .models import Product, Vehicle
+from django.db import IntegrityError
+
+from .cache import get_reference_choices
+from .forms import VehicleInlineFormSet
+from .models import Product, Vehicle, Warehouse
+from .utils import is_vehicle_booking_overlap
+
+REFERENCE_MODELS = (Product, Vehicle, Warehouse)
 
 
 class MaxProductChoiceMixin:
@@ -7,7 +14,7 @@ class MaxProductChoiceMixin:
         Disallow to create more rows than products count (additional filter for
         unique) while creating related instance.
         """
-        return Product.objects.count()
+        return len(get_reference_choices(Product))
 
 
 class MaxVehicleChoiceMixin:
@@ -16,7 +23,7 @@ class MaxVehicleChoiceMixin:
         Disallow to create more rows than vehicle count (additional filter for
         unique) while creating related instance.
         """
-        return Vehicle.objects.count()
+        return len(get_reference_choices(Vehicle))
 
 
 class NoAddPermissionMixin:
@@ -29,6 +36,77 @@ class NoChangePermissionMixin:
         return False
 
 
+class ReferenceChoicesMixin:
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        """
+        Choices of foreign keys to reference tables (REFERENCE_MODELS) are
+        taken from the process cache once per formset instead of querying the
+        table for select widget of every form.
+        """
+        formfield = super().formfield_for_foreignkey(
+            db_field,
+            request,
+            **kwargs
+        )
+        if (
+            formfield is not None
+            and db_field.related_model in REFERENCE_MODELS
+            and 'queryset' not in kwargs
+            and not db_field.get_limit_choices_to()
+        ):
+            blank = [] if formfield.empty_label is None else [
+                ('', formfield.empty_label)
+            ]
+            formfield.choices = blank + list(
+                get_reference_choices(db_field.related_model)
+            )
+
+        return formfield
+
+
+class VehicleBookingMixin:
+    def changeform_view(self, request, object_id=None, form_url='',
+                        extra_context=None):
+        """
+        Vehicle booked by concurrent transaction passes validation of both
+        forms and one of them fails on vehicle_booking_overlap constraint.
+        Such form is validated again in a new transaction and shown with the
+        conflict as an error of vehicles instead of failing the request.
+        """
+        try:
+            return super().changeform_view(
+                request,
+                object_id,
+                form_url,
+                extra_context
+            )
+        except IntegrityError as error:
+            if not is_vehicle_booking_overlap(error):
+                raise
+
+        request.vehicle_booking_overlap = True
+        return super().changeform_view(
+            request,
+            object_id,
+            form_url,
+            extra_context
+        )
+
+    def get_formset_kwargs(self, request, obj, inline, prefix):
+        """
+        Marks vehicle formsets validated again after vehicle_booking_overlap
+        violation.
+        """
+        kwargs = super().get_formset_kwargs(request, obj, inline, prefix)
+        if (
+            getattr(request, 'vehicle_booking_overlap', False)
+            and issubclass(inline.formset, VehicleInlineFormSet)
+        ):
+            kwargs['booking_overlap'] = True
+
+        return kwargs
+
+
 class UnacceptedFilterMixin:
     def get_queryset(self, request):
         """Filters queryset to return only unaccepted instances."""
@@ -1,10 +1,12 @@
 from datetime import timedelta
 
+from django.contrib.postgres.fields import ArrayField
 from django.core.validators import (EmailValidator, MaxValueValidator,
                                     MinValueValidator, RegexValidator)
 from django.db.models import (CASCADE, BooleanField, CharField, DateTimeField,
-                              F, ForeignKey, Model, PositiveIntegerField,
-                              PositiveSmallIntegerField, Q)
+                              F, FloatField, ForeignKey, IntegerField,
+                              JSONField, Model, PositiveIntegerField,
+                              PositiveSmallIntegerField, Q, TextField)
 from django.db.models.constraints import CheckConstraint, UniqueConstraint
 from warehouses.settings import (MAX_ADDRESS_LENGTH, MAX_EMAIL_LENGTH,
                                  MAX_NAME_LENGTH, MAX_PRODUCT_NAME_LENGTH,
@@ -17,6 +19,76 @@ from warehouses.settings import (MAX_ADDRESS_LENGTH, MAX_EMAIL_LENGTH,
 from .utils import get_now_datetime
 
 
+class DatabaseCountersModel(Model):
+    """
+    Base model for tables with counters maintained by database triggers.
+    Fields listed in db_counters are never written by save() of an existing
+    instance, so stale values loaded by Django do not overwrite the counters.
+    """
+    db_counters = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.db_counters
+            ]
+
+        super().save(*args, **kwargs)
+
+
+class Job(Model):
+    attempts = PositiveSmallIntegerField(verbose_name='Попыток')
+    created_at = DateTimeField(verbose_name='Создано')
+    error = TextField(blank=True, null=True, verbose_name='Ошибка')
+    finished_at = DateTimeField(null=True, verbose_name='Завершено')
+    heartbeat_at = DateTimeField(
+        null=True,
+        verbose_name='Последняя активность'
+    )
+    kind = CharField(
+        choices=(
+            ('accept_order', 'Осуществление заказов'),
+            ('accept_transit', 'Осуществление поставок'),
+        ),
+        max_length=30,
+        verbose_name='Тип'
+    )
+    object_ids = ArrayField(
+        base_field=IntegerField(),
+        verbose_name='Объекты'
+    )
+    processed = PositiveIntegerField(verbose_name='Обработано объектов')
+    result = JSONField(verbose_name='Результат')
+    started_at = DateTimeField(null=True, verbose_name='Начато')
+    status = CharField(
+        choices=(
+            ('queued', 'В очереди'),
+            ('running', 'Выполняется'),
+            ('done', 'Выполнено'),
+            ('failed', 'Ошибка'),
+        ),
+        max_length=10,
+        verbose_name='Статус'
+    )
+
+    class Meta:
+        db_table = 'job'
+        managed = False
+        ordering = ('-id',)
+        verbose_name = 'Задание'
+        verbose_name_plural = 'Задания'
+
+    def __str__(self):
+        return f'Задание #{self.id}'
+
+    def __repr__(self):
+        return f'Job: {self.id}# {self.kind} {self.status}'
+
+
 class Order(Model):
     accepted = BooleanField(
         default=False,
@@ -271,7 +343,7 @@ class ProductWarehouse(Model):
         return f'{self.product} на {self.warehouse}'
 
 
-class Shop(Model):
+class Shop(DatabaseCountersModel):
     address = CharField(max_length=MAX_ADDRESS_LENGTH, verbose_name='Адрес')
     name = CharField(
         db_index=True,
@@ -284,6 +356,13 @@ class Shop(Model):
         to='Owner',
         verbose_name='Владелец'
     )
+    unaccepted_order_count = PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Ожидает поставок'
+    )
+
+    db_counters = ('unaccepted_order_count',)
 
     class Meta:
         db_table = 'shop'
@@ -299,6 +378,28 @@ class Shop(Model):
         return f'{self.name} {self.address}'
 
 
+class SlowReport(Model):
+    args = JSONField(verbose_name='Параметры')
+    created_at = DateTimeField(verbose_name='Время выполнения')
+    duration = FloatField(verbose_name='Длительность (с)')
+    plan = TextField(blank=True, null=True, verbose_name='План выполнения')
+    query_index = PositiveSmallIntegerField(verbose_name='Номер запроса')
+    row_count = PositiveIntegerField(verbose_name='Количество строк')
+
+    class Meta:
+        db_table = 'slow_report_log'
+        managed = False
+        ordering = ('-created_at',)
+        verbose_name = 'Медленный запрос'
+        verbose_name_plural = 'Медленные запросы'
+
+    def __str__(self):
+        return f'Запрос {self.query_index} ({self.duration:.2f} с)'
+
+    def __repr__(self):
+        return f'Запрос {self.query_index} #{self.id}'
+
+
 class Transit(Model):
     accepted = BooleanField(
         default=False,
@@ -467,11 +568,16 @@ class VehicleTransit(Model):
         return f'Машина {self.vehicle} в поставке #{self.transit.id}'
 
 
-class Warehouse(Model):
+class Warehouse(DatabaseCountersModel):
     address = CharField(
         max_length=MAX_ADDRESS_LENGTH,
         verbose_name='Адрес склада'
     )
+    current_load = PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Текущая загрузка (т)'
+    )
     max_capacity = PositiveIntegerField(
         validators=(MinValueValidator(limit_value=1),),
         verbose_name='Вместимость склада (т)'
@@ -487,6 +593,13 @@ class Warehouse(Model):
         to='Owner',
         verbose_name='Владелец склада'
     )
+    unaccepted_transit_count = PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Ожидает поставок'
+    )
+
+    db_counters = ('current_load', 'unaccepted_transit_count')
 
     class Meta:
         db_table = 'warehouse'
@@ -0,0 +1,50 @@
+from django.db.backends.postgresql import base
+
+from .pool import get_pool
+
+POOL_DEFAULTS = {
+    'CHECK_INTERVAL': 0,
+    'MAX_IDLE': 300,
+    'MAX_SIZE': 10,
+    'TIMEOUT': 10,
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend taking connections from the connection pool of the
+    process instead of opening a new one for every request. Closing the
+    connection (at the end of request with CONN_MAX_AGE = 0) returns it to
+    the pool. Pool is configured by POOL dict of database settings, see
+    POOL_DEFAULTS.
+    """
+    def get_pool(self, conn_params):
+        options = {**POOL_DEFAULTS, **self.settings_dict.get('POOL', {})}
+
+        return get_pool(
+            alias=self.alias,
+            check_interval=options['CHECK_INTERVAL'],
+            connect=lambda: base.DatabaseWrapper.get_new_connection(
+                self,
+                conn_params
+            ),
+            max_idle=options['MAX_IDLE'],
+            max_size=options['MAX_SIZE'],
+            timeout=options['TIMEOUT']
+        )
+
+    def get_new_connection(self, conn_params):
+        connection = self.get_pool(conn_params).getconn()
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level',
+            connection.isolation_level
+        )
+
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.get_pool(self.get_connection_params()).putconn(
+                    self.connection
+                )
@@ -0,0 +1,198 @@
+from collections import deque
+from threading import Condition, Lock
+from time import monotonic
+from typing import Any, Callable
+
+from psycopg2 import OperationalError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, connection
+
+_pools = {}
+_pools_lock = Lock()
+
+
+class PoolTimeout(OperationalError):
+    """Raised when no connection of the pool got free in time."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections of one process.
+
+    Pool opens at most max_size connections. If all of them are checked out,
+    getconn waits up to timeout seconds for a returned one. A connection idle
+    for longer than check_interval seconds is health checked by SELECT 1 on
+    checkout and one idle for longer than max_idle seconds is closed.
+
+    Django 4.1 PostgreSQL backend works only with psycopg2 connections, so
+    psycopg_pool (built for psycopg 3 connections) can not back it, and
+    native pooling of the backend appeared in Django 5.1. psycopg2.pool
+    neither waits for a free connection nor checks idle ones.
+    """
+    def __init__(self, connect: Callable[[], connection], max_size: int,
+                 timeout: float, check_interval: float, max_idle: float):
+        self.check_interval = check_interval
+        self.condition = Condition()
+        self.connect = connect
+        self.idle = deque()
+        self.max_idle = max_idle
+        self.max_size = max_size
+        self.size = 0
+        self.stats = dict.fromkeys(
+            (
+                'checkouts',
+                'closed',
+                'created',
+                'failed_checks',
+                'timeouts',
+                'waits',
+            ),
+            0
+        )
+        self.stats['wait_time'] = 0.0
+        self.timeout = timeout
+
+    def _discard(self, db_connection: connection) -> None:
+        """Closes connection and frees its place in the pool."""
+        try:
+            db_connection.close()
+        finally:
+            with self.condition:
+                self.size -= 1
+                self.stats['closed'] += 1
+                self.condition.notify()
+
+    def _is_healthy(self, db_connection: connection,
+                    idle_since: float) -> bool:
+        if db_connection.closed:
+            return False
+        if monotonic() - idle_since < self.check_interval:
+            return True
+        try:
+            with db_connection.cursor() as cursor:
+                cursor.execute('SELECT 1;')
+        except Exception:
+            return False
+        return True
+
+    def getconn(self) -> connection:
+        """
+        Get healthy idle connection or a new one if pool is not full, waiting
+        for a returned connection otherwise. Raises PoolTimeout if waiting
+        took longer than timeout.
+        """
+        deadline = None
+        while True:
+            with self.condition:
+                while not self.idle and self.size >= self.max_size:
+                    if deadline is None:
+                        deadline = monotonic() + self.timeout
+                        self.stats['waits'] += 1
+                    if (remaining := deadline - monotonic()) <= 0:
+                        self.stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            f'Все {self.max_size} соединений пула заняты.'
+                        )
+                    self.condition.wait(timeout=remaining)
+                if deadline is not None:
+                    self.stats['wait_time'] += monotonic() - (
+                        deadline - self.timeout
+                    )
+                    deadline = None
+                if self.idle:
+                    db_connection, idle_since = self.idle.pop()
+                else:
+                    db_connection = None
+                    self.size += 1
+
+            if db_connection is None:
+                try:
+                    db_connection = self.connect()
+                except Exception:
+                    with self.condition:
+                        self.size -= 1
+                        self.condition.notify()
+                    raise
+                with self.condition:
+                    self.stats['created'] += 1
+                    self.stats['checkouts'] += 1
+                return db_connection
+
+            if monotonic() - idle_since > self.max_idle:
+                self._discard(db_connection)
+                continue
+            if not self._is_healthy(db_connection, idle_since):
+                with self.condition:
+                    self.stats['failed_checks'] += 1
+                self._discard(db_connection)
+                continue
+            with self.condition:
+                self.stats['checkouts'] += 1
+            return db_connection
+
+    def putconn(self, db_connection: connection) -> None:
+        """
+        Returns connection to the pool. Connection left inside a transaction
+        is rolled back, broken one is closed.
+        """
+        if not db_connection.closed and (
+            db_connection.info.transaction_status != TRANSACTION_STATUS_IDLE
+        ):
+            try:
+                db_connection.rollback()
+            except Exception:
+                pass
+        if db_connection.closed or (
+            db_connection.info.transaction_status != TRANSACTION_STATUS_IDLE
+        ):
+            self._discard(db_connection)
+            return
+        with self.condition:
+            self.idle.append((db_connection, monotonic()))
+            self.condition.notify()
+
+    def get_stats(self) -> dict[str, Any]:
+        """Get counters of the pool with current count of connections."""
+        with self.condition:
+            return {
+                **self.stats,
+                'idle': len(self.idle),
+                'max_size': self.max_size,
+                'size': self.size,
+            }
+
+
+def get_pool(alias: str, **kwargs) -> ConnectionPool:
+    """
+    Get connection pool of the process for given database alias, creating
+    it with given arguments if it does not exist.
+    """
+    with _pools_lock:
+        if (pool := _pools.get(alias)) is None:
+            pool = _pools[alias] = ConnectionPool(**kwargs)
+        return pool
+
+
+def get_pool_stats() -> dict[str, dict[str, Any]]:
+    """
+    Get statistics of connection pools of the process by database alias.
+
+    For example, after 3 requests served by one connection it will return
+    {
+        'default': {
+            'checkouts': 3,
+            'closed': 0,
+            'created': 1,
+            'failed_checks': 0,
+            'idle': 1,
+            'max_size': 10,
+            'size': 1,
+            'timeouts': 0,
+            'wait_time': 0.0,
+            'waits': 0,
+        }
+    }
+    """
+    with _pools_lock:
+        pools = dict(_pools)
+
+    return {alias: pool.get_stats() for alias, pool in pools.items()}
@@ -0,0 +1,759 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from contextlib import nullcontext
+from datetime import datetime
+from queue import Empty, Full, Queue
+from tempfile import SpooledTemporaryFile
+from threading import Event, Lock, Thread
+from time import perf_counter
+from typing import Any, Iterable, Iterator, Optional
+from weakref import WeakKeyDictionary
+
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.db import (DataError, NotSupportedError, connection,
+                       transaction)
+
+from .cache import get_cached
+from .forms import (QueryDateForm, QueryFullnameForm, QuerySixForm,
+                    QueryWarehouseNameForm)
+from .metrics import REPORT_DURATION
+from .slow_reports import log_slow_report
+from .utils import get_named_sql
+
+QUERY_INFO = {
+    1: {
+        'arg_types': (),
+        'args': (),
+        'columns': (
+            'id',
+            'first_name',
+            'email'
+        ),
+        'description': settings.QUERY_1_DESCRIPTION,
+        'form_class': None,
+        'page_keys': (('id', 'ASC', 'INTEGER'),),
+        'page_size': settings.REPORT_PAGE_SIZE,
+        'sql_cmd': 'SELECT * FROM query_1() ORDER BY id ASC',
+        'tables': ('owner',),
+    },
+    2: {
+        'arg_types': (),
+        'args': (),
+        'columns': (
+            'id',
+            'brand',
+            'max_capacity'
+        ),
+        'description': settings.QUERY_2_DESCRIPTION,
+        'form_class': None,
+        'page_keys': (('id', 'ASC', 'INTEGER'),),
+        'page_size': settings.REPORT_PAGE_SIZE,
+        'sql_cmd': 'SELECT * FROM query_2() ORDER BY id ASC',
+        'tables': ('vehicle',),
+    },
+    3: {
+        'arg_types': (),
+        'args': (),
+        'columns': (
+            'id',
+            'name',
+            'address',
+            'max_capacity'
+        ),
+        'description': settings.QUERY_3_DESCRIPTION,
+        'form_class': None,
+        'page_keys': (('id', 'ASC', 'INTEGER'),),
+        'page_size': settings.REPORT_PAGE_SIZE,
+        'sql_cmd': 'SELECT * FROM query_3() ORDER BY id ASC',
+        'tables': ('warehouse',),
+    },
+    4: {
+        'arg_types': ('DATE',),
+        'args': ('date',),
+        'columns': (
+            'id',
+            'name',
+            'address',
+            'date_start with TZ',
+            'date_end with TZ'
+        ),
+        'description': settings.QUERY_4_DESCRIPTION,
+        'form_class': QueryDateForm,
+        'page_keys': (
+            ('id', 'ASC', 'INTEGER'),
+            ('date_start', 'ASC', 'TIMESTAMPTZ'),
+            ('date_end', 'ASC', 'TIMESTAMPTZ')
+        ),
+        'page_size': settings.REPORT_PAGE_SIZE,
+        'sql_cmd': 'SELECT * FROM query_4($1) ORDER BY id ASC',
+        'tables': ('transit', 'warehouse'),
+    },
+    5: {
+        'arg_types': ('VARCHAR', 'VARCHAR', 'VARCHAR'),
+        'args': ('first_name', 'last_name', 'match'),
+        'columns': (
+            'id',
+            'first_name',
+            'last_name',
+            'total_payload'
+        ),
+        'description': settings.QUERY_5_DESCRIPTION,
+        'form_class': QueryFullnameForm,
+        'page_keys': (('id', 'ASC', 'INTEGER'),),
+        'page_size': settings.REPORT_PAGE_SIZE,
+        'sql_cmd': 'SELECT * FROM query_5($1, $2, $3) ORDER BY id ASC',
+        'tables': ('owner', 'warehouse'),
+    },
+    6: {
+        'arg_types': ('VARCHAR', 'VARCHAR', 'DATE', 'VARCHAR'),
+        'args': ('first_name', 'last_name', 'date', 'match'),
+        'columns': (
+            'id',
+            'address',
+            'date with TZ'
+        ),
+        'description': settings.QUERY_6_DESCRIPTION,
+        'form_class': QuerySixForm,
+        'page_keys': (),
+        'page_size': settings.REPORT_PAGE_SIZE,
+        'sql_cmd': 'SELECT * FROM query_6($1, $2, $3, $4)',
+        'tables': (
+            'owner',
+            'transit',
+            'vehicle',
+            'vehicle_transit',
+            'warehouse'
+        ),
+    },
+    7: {
+        'arg_types': ('DATE',),
+        'args': ('date',),
+        'columns': (
+            'id',
+            'brand',
+            'max_capacity',
+            'date_start with TZ'
+        ),
+        'description': settings.QUERY_7_DESCRIPTION,
+        'form_class': QueryDateForm,
+        'page_keys': (
+            ('max_capacity', 'DESC', 'SMALLINT'),
+            ('id', 'ASC', 'INTEGER'),
+            ('date_start', 'ASC', 'TIMESTAMPTZ')
+        ),
+        'page_size': settings.REPORT_PAGE_SIZE,
+        'sql_cmd': 'SELECT * FROM query_7($1)',
+        'tables': ('order_table', 'vehicle', 'vehicle_order'),
+    },
+    8: {
+        'arg_types': ('DATE',),
+        'args': ('date',),
+        'columns': (
+            'id',
+            'address'
+        ),
+        'description': settings.QUERY_8_DESCRIPTION,
+        'form_class': QueryDateForm,
+        'page_keys': (('id', 'ASC', 'INTEGER'),),
+        'page_size': settings.REPORT_PAGE_SIZE,
+        'sql_cmd': 'SELECT * FROM query_8($1) ORDER BY id',
+        'tables': ('order_table', 'warehouse'),
+    },
+    9: {
+        'arg_types': ('DATE',),
+        'args': ('date',),
+        'columns': (
+            'count',
+        ),
+        'description': settings.QUERY_9_DESCRIPTION,
+        'form_class': QueryDateForm,
+        'page_keys': (),
+        'page_size': settings.REPORT_PAGE_SIZE,
+        'sql_cmd': 'SELECT * FROM query_9($1)',
+        'tables': ('transit',),
+    },
+    10: {
+        'arg_types': ('VARCHAR', 'VARCHAR', 'VARCHAR'),
+        'args': ('name', 'address', 'match'),
+        'columns': (
+            'warehouse_id',
+            'warehouse_name',
+            'id',
+            'name',
+            'article_number',
+            'tonnage'
+        ),
+        'description': settings.QUERY_10_DESCRIPTION,
+        'form_class': QueryWarehouseNameForm,
+        'page_keys': (
+            ('warehouse_id', 'ASC', 'INTEGER'),
+            ('id', 'ASC', 'INTEGER')
+        ),
+        'page_size': settings.REPORT_PAGE_SIZE,
+        'sql_cmd': 'SELECT * FROM query_10($1, $2, $3)',
+        'tables': ('product', 'product_warehouse', 'warehouse'),
+    },
+}
+
+PAGE_DIRECTIONS = ('first', 'next', 'prev')
+
+EXPORT_FORMATS = {
+    'csv': {
+        'content_type': 'text/csv',
+        'sql_cmd': 'COPY ({}) TO STDOUT WITH (FORMAT csv, HEADER)',
+    },
+    'jsonl': {
+        'content_type': 'application/x-ndjson',
+        'sql_cmd': (
+            'COPY (SELECT row_to_json(report) FROM ({}) AS report) '
+            + "TO STDOUT WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')"
+        ),
+    },
+}
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+EXPORT_QUEUE_SIZE = 16
+
+EXPORT_SPOOL_SIZE = 8 * 1024 * 1024
+
+PREPARED_STATEMENTS_CMD = """
+    SELECT name FROM pg_prepared_statements;
+"""
+
+_prepared_statements = WeakKeyDictionary()
+_statement_stats = {'prepared': 0, 'reused': 0}
+_statement_stats_lock = Lock()
+
+
+def _count_statement(key: str) -> None:
+    with _statement_stats_lock:
+        _statement_stats[key] += 1
+
+
+def get_statement_name(query_index: int,
+                       direction: Optional[str] = None) -> str:
+    """
+    Get name of server-side prepared statement of the report or of its page
+    in given direction of PAGE_DIRECTIONS.
+    """
+    if direction is None:
+        return f'report_{query_index}'
+    return f'report_{query_index}_{direction}'
+
+
+def get_statement_stats() -> dict[str, int]:
+    """
+    Get counts of report statements prepared and executed using an already
+    prepared plan in this process since its start.
+
+    For example, if report #4 was executed 3 times over one persistent
+    connection it will return
+    {
+        'prepared': 1,
+        'reused': 2,
+    }
+    """
+    with _statement_stats_lock:
+        return dict(_statement_stats)
+
+
+def get_page_sql(query_index: int, direction: str) -> tuple[str, tuple]:
+    """
+    Get sql_cmd of report's page in given direction of PAGE_DIRECTIONS and
+    types of its parameters. Report's own arguments are followed by values of
+    page_keys of the cursor row (except the first page) and the limit.
+
+    Page is selected by seek predicate on page_keys instead of OFFSET, so
+    rows of previous pages are not read and sorted again. Report functions
+    are single SQL queries (LANGUAGE SQL STABLE) inlined by the planner, so
+    the predicate and the limit are applied to the inner query instead of
+    the whole materialized result of the function. Previous page is selected
+    in reversed order and should be reversed back.
+
+    For example, for report #7 and direction 'next' it will return
+    (
+        "SELECT * FROM (SELECT * FROM query_7($1)) AS report
+        WHERE report.max_capacity < $2
+        OR report.max_capacity = $2 AND report.id > $3
+        OR report.max_capacity = $2 AND report.id = $3
+        AND report.date_start > $4
+        ORDER BY report.max_capacity DESC, report.id ASC,
+        report.date_start ASC LIMIT $5",
+        ('DATE', 'SMALLINT', 'INTEGER', 'TIMESTAMPTZ', 'INTEGER')
+    )
+    """
+    info = QUERY_INFO[query_index]
+    arg_types = list(info['arg_types'])
+    forward = direction != 'prev'
+    conditions = []
+    equalities = []
+    order_by = []
+
+    for column, order, column_type in info['page_keys']:
+        ascending = (order == 'ASC') == forward
+        order_by.append(f'report.{column} {"ASC" if ascending else "DESC"}')
+        if direction == 'first':
+            continue
+        arg_types.append(column_type)
+        placeholder = f'${len(arg_types)}'
+        conditions.append(' AND '.join(
+            equalities + [f'report.{column} {">" if ascending else "<"} '
+                          + placeholder]
+        ))
+        equalities.append(f'report.{column} = {placeholder}')
+
+    arg_types.append('INTEGER')
+    sql_cmd = f'SELECT * FROM ({info["sql_cmd"]}) AS report'
+    if conditions:
+        sql_cmd += ' WHERE ' + ' OR '.join(conditions)
+    sql_cmd += f' ORDER BY {", ".join(order_by)} LIMIT ${len(arg_types)}'
+
+    return sql_cmd, tuple(arg_types)
+
+
+class _PageCursorEncoder(json.JSONEncoder):
+    """
+    Encodes datetimes of page_keys in ISO format with microseconds, so seek
+    predicates on TIMESTAMPTZ columns get the exact value of the row.
+    """
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_page_cursor(direction: str, values: Iterable[Any]) -> str:
+    """
+    Get opaque cursor of the page in given direction from values of
+    page_keys of the row the page starts after.
+
+    For example, if the next page of report #1 starts after owner with id 30
+    it will return 'WyJuZXh0IiwgWzMwXV0'.
+    """
+    return urlsafe_b64encode(json.dumps(
+        [direction, list(values)],
+        cls=_PageCursorEncoder
+    ).encode()).decode().rstrip('=')
+
+
+def decode_page_cursor(cursor: str) -> tuple[str, list]:
+    """
+    Get direction and values of page_keys from cursor made by
+    encode_page_cursor. Raises BadRequest if cursor is malformed.
+
+    For example, for cursor 'WyJuZXh0IiwgWzMwXV0' it will return
+    ('next', [30]).
+    """
+    try:
+        direction, values = json.loads(
+            urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        )
+    except (BinasciiError, TypeError, UnicodeDecodeError, ValueError):
+        raise BadRequest('Некорректный курсор страницы.')
+    if direction not in PAGE_DIRECTIONS[1:] or not isinstance(values, list):
+        raise BadRequest('Некорректный курсор страницы.')
+
+    return direction, values
+
+
+def _prepare(cursor, name: str, arg_types: tuple[str, ...],
+             sql_cmd: str) -> None:
+    """
+    Prepares sql_cmd as a server-side statement with given name.
+    """
+    cursor.execute(
+        f'PREPARE {name}'
+        + (f' ({", ".join(arg_types)})' if arg_types else '')
+        + f' AS {sql_cmd};'
+    )
+    _count_statement('prepared')
+
+
+def _is_result_type_changed(error: NotSupportedError) -> bool:
+    """
+    Checks that given error is raised by EXECUTE of a statement prepared
+    before the result type of its query changed (SQLSTATE 0A000, "cached plan
+    must not change result type"), e.g. after a report function was replaced
+    by create_functions with other columns.
+    """
+    return getattr(error.__cause__, 'pgcode', None) == '0A000'
+
+
+def _execute_prepared(name: str, arg_types: Iterable[str], sql_cmd: str,
+                      args: list) -> tuple[list[str], list[tuple]]:
+    """
+    Executes sql_cmd prepared once per database connection as a server-side
+    statement with given name and returns names of columns and rows.
+
+    If result type of the query has changed since the statement was prepared
+    (see _is_result_type_changed), the statement is deallocated, prepared
+    again and executed once more. Inside a transaction EXECUTE runs in a
+    savepoint, so the failed attempt does not abort the transaction.
+    """
+    arg_types = tuple(arg_types)
+    execute_cmd = f'EXECUTE {name}' + (
+        f' ({", ".join(["%s"] * len(args))})' if args else ''
+    ) + ';'
+
+    with connection.cursor() as cursor:
+        raw_connection = connection.connection
+        if (prepared := _prepared_statements.get(raw_connection)) is None:
+            cursor.execute(PREPARED_STATEMENTS_CMD)
+            prepared = {row[0] for row in cursor.fetchall()}
+            _prepared_statements[raw_connection] = prepared
+
+        if name in prepared:
+            _count_statement('reused')
+        else:
+            _prepare(cursor, name, arg_types, sql_cmd)
+            prepared.add(name)
+
+        try:
+            with (transaction.atomic() if connection.in_atomic_block
+                  else nullcontext()):
+                cursor.execute(execute_cmd, args)
+        except NotSupportedError as error:
+            if not _is_result_type_changed(error):
+                raise
+            prepared.discard(name)
+            cursor.execute(f'DEALLOCATE {name};')
+            _prepare(cursor, name, arg_types, sql_cmd)
+            prepared.add(name)
+            cursor.execute(execute_cmd, args)
+
+        return (
+            [column.name for column in cursor.description],
+            cursor.fetchall()
+        )
+
+
+def observe_report(query_index: int, args: list, duration: float,
+                   row_count: int) -> None:
+    """
+    Records execution time of report with given index of QUERY_INFO in
+    metrics and logs the report if it is slow (see log_slow_report).
+    """
+    REPORT_DURATION.observe(duration, report=str(query_index))
+    log_slow_report(
+        query_index=query_index,
+        arg_types=QUERY_INFO[query_index]['arg_types'],
+        args=args,
+        duration=duration,
+        row_count=row_count
+    )
+
+
+def run_report(query_index: int, args: Iterable[Any]) -> list[tuple]:
+    """
+    Executes report with given index of QUERY_INFO with bound arguments and
+    returns its rows.
+
+    Report's sql_cmd is prepared once per database connection as a
+    server-side statement named by get_statement_name, so plan is reused by
+    next executions over the same persistent connection.
+    """
+    info = QUERY_INFO[query_index]
+    args = list(args)
+
+    start = perf_counter()
+    rows = _execute_prepared(
+        name=get_statement_name(query_index),
+        arg_types=info['arg_types'],
+        sql_cmd=info['sql_cmd'],
+        args=args
+    )[1]
+    observe_report(
+        query_index=query_index,
+        args=args,
+        duration=perf_counter() - start,
+        row_count=len(rows)
+    )
+
+    return rows
+
+
+def get_page_direction(query_index: int,
+                       cursor: Optional[str] = None) -> tuple[str, list]:
+    """
+    Get direction and values of page_keys of the report's page starting at
+    given cursor ('first' and no values if cursor is None). Values of
+    TIMESTAMPTZ keys are decoded back to datetimes. Raises BadRequest if
+    cursor does not fit the report.
+    """
+    if cursor is None:
+        return 'first', []
+    direction, values = decode_page_cursor(cursor)
+    page_keys = QUERY_INFO[query_index]['page_keys']
+    if len(values) != len(page_keys):
+        raise BadRequest('Некорректный курсор страницы.')
+    try:
+        values = [
+            datetime.fromisoformat(value) if column_type == 'TIMESTAMPTZ'
+            else value
+            for value, (_, _, column_type) in zip(values, page_keys)
+        ]
+    except (TypeError, ValueError):
+        raise BadRequest('Некорректный курсор страницы.')
+
+    return direction, values
+
+
+def get_page(query_index: int, direction: str, columns: list[str],
+             rows: list[tuple]
+             ) -> tuple[list[tuple], Optional[str], Optional[str]]:
+    """
+    Get rows of the report's page in given direction from rows fetched by
+    its page statement (up to page_size + 1) and cursors of the next and the
+    previous pages (None if there is no page).
+    """
+    info = QUERY_INFO[query_index]
+    page_size = info['page_size']
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == 'prev':
+        rows.reverse()
+    if not rows:
+        return rows, None, None
+
+    positions = [columns.index(key[0]) for key in info['page_keys']]
+    first_values = [rows[0][i] for i in positions]
+    last_values = [rows[-1][i] for i in positions]
+    next_cursor = prev_cursor = None
+    if direction == 'prev' or has_more:
+        next_cursor = encode_page_cursor('next', last_values)
+    if direction == 'next' or (direction == 'prev' and has_more):
+        prev_cursor = encode_page_cursor('prev', first_values)
+
+    return rows, next_cursor, prev_cursor
+
+
+def run_report_page(query_index: int, args: Iterable[Any],
+                    cursor: Optional[str] = None
+                    ) -> tuple[list[tuple], Optional[str], Optional[str]]:
+    """
+    Executes page of report with given index of QUERY_INFO starting at given
+    cursor (the first page if cursor is None) and returns its rows and
+    cursors of the next and the previous pages (None if there is no page).
+
+    Page contains up to report's page_size rows ordered by its page_keys, the
+    statement of each direction is prepared like in run_report. One more row
+    is fetched to know whether the page in the same direction exists.
+
+    For example, if report #1 with page_size 2 is requested for the first
+    page it will return
+    (
+        [(1, 'Иван', 'ivan@mail.ru'), (2, 'Петр', 'petr@mail.ru')],
+        'WyJuZXh0IiwgWzJdXQ',
+        None
+    )
+    """
+    direction, values = get_page_direction(
+        query_index=query_index,
+        cursor=cursor
+    )
+    sql_cmd, arg_types = get_page_sql(
+        query_index=query_index,
+        direction=direction
+    )
+
+    args = list(args)
+
+    start = perf_counter()
+    try:
+        columns, rows = _execute_prepared(
+            name=get_statement_name(query_index, direction),
+            arg_types=arg_types,
+            sql_cmd=sql_cmd,
+            args=[*args, *values, QUERY_INFO[query_index]['page_size'] + 1]
+        )
+    except DataError:
+        raise BadRequest('Некорректный курсор страницы.')
+    observe_report(
+        query_index=query_index,
+        args=args,
+        duration=perf_counter() - start,
+        row_count=len(rows)
+    )
+
+    return get_page(
+        query_index=query_index,
+        direction=direction,
+        columns=columns,
+        rows=rows
+    )
+
+
+def run_cached_report(query_index: int, args: Iterable[Any]) -> list[tuple]:
+    """
+    Get rows of report with given index of QUERY_INFO from the report cache,
+    executing it by run_report on cache miss.
+    """
+    args = list(args)
+
+    return get_cached(
+        args=args,
+        compute=lambda: run_report(query_index=query_index, args=args),
+        query_index=query_index,
+        tables=QUERY_INFO[query_index]['tables']
+    )
+
+
+def run_cached_report_page(query_index: int, args: Iterable[Any],
+                           cursor: Optional[str] = None
+                           ) -> tuple[list[tuple], Optional[str],
+                                      Optional[str]]:
+    """
+    Get page of report with given index of QUERY_INFO like run_report_page
+    from the report cache, executing it on cache miss.
+    """
+    args = list(args)
+
+    return get_cached(
+        args=[args, cursor],
+        compute=lambda: run_report_page(
+            query_index=query_index,
+            args=args,
+            cursor=cursor
+        ),
+        query_index=query_index,
+        tables=QUERY_INFO[query_index]['tables']
+    )
+
+
+class ExportAborted(Exception):
+    """Raised inside COPY when the client stopped reading the export."""
+
+
+class _QueueWriter:
+    """
+    File-like object for cursor.copy_expert that groups COPY output into
+    chunks of EXPORT_CHUNK_SIZE bytes and puts them into the bounded queue.
+    """
+    def __init__(self, queue: Queue, stopped: Event):
+        self.buffer = bytearray()
+        self.queue = queue
+        self.stopped = stopped
+
+    def _put(self, item) -> None:
+        while True:
+            if self.stopped.is_set():
+                raise ExportAborted
+            try:
+                return self.queue.put(item, timeout=1)
+            except Full:
+                continue
+
+    def flush(self) -> None:
+        if self.buffer:
+            self._put(bytes(self.buffer))
+            self.buffer.clear()
+
+    def write(self, data) -> None:
+        self.buffer += data.encode() if isinstance(data, str) else data
+        if len(self.buffer) >= EXPORT_CHUNK_SIZE:
+            self.flush()
+
+
+def get_report_sql(query_index: int, args: Iterable[Any]) -> str:
+    """
+    Get report's sql_cmd of QUERY_INFO with arguments bound on the client side
+    and casted to report's argument types. Used where server-side parameters
+    are not supported, e.g. inside COPY.
+
+    For example, if report #4 is requested for 15.04.2023 it will return
+    "SELECT * FROM query_4('2023-04-15'::date::DATE) ORDER BY id ASC".
+    """
+    info = QUERY_INFO[query_index]
+    sql_cmd = get_named_sql(
+        sql_cmd=info['sql_cmd'],
+        arg_types=info['arg_types']
+    )
+    with connection.cursor() as cursor:
+        return cursor.mogrify(
+            sql_cmd,
+            {str(i): arg for i, arg in enumerate(args, start=1)}
+        ).decode()
+
+
+def stream_report(query_index: int, args: Iterable[Any],
+                  export_format: str) -> Iterator[bytes]:
+    """
+    Yields rows of report with given index of QUERY_INFO in given format of
+    EXPORT_FORMATS by chunks.
+
+    Report is streamed by COPY ... TO STDOUT running in a separate thread that
+    puts chunks into a bounded queue, so memory usage does not depend on
+    count of rows. If the generator is closed before the end (client
+    disconnected), COPY is aborted and the connection is closed.
+    """
+    sql_cmd = EXPORT_FORMATS[export_format]['sql_cmd'].format(
+        get_report_sql(query_index=query_index, args=args)
+    )
+    queue = Queue(maxsize=EXPORT_QUEUE_SIZE)
+    stopped = Event()
+    finished = object()
+
+    def copy(cursor) -> None:
+        writer = _QueueWriter(queue=queue, stopped=stopped)
+        try:
+            cursor.copy_expert(sql_cmd, writer)
+            writer.flush()
+            writer._put(finished)
+        except ExportAborted:
+            pass
+        except Exception as error:
+            try:
+                writer._put(error)
+            except ExportAborted:
+                pass
+
+    with connection.cursor() as cursor:
+        thread = Thread(target=copy, args=(cursor.cursor,), daemon=True)
+        thread.start()
+        try:
+            while True:
+                try:
+                    item = queue.get(timeout=1)
+                except Empty:
+                    continue
+                if item is finished:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            if not stopped.is_set() and thread.is_alive():
+                stopped.set()
+                thread.join()
+                connection.close()
+            thread.join()
+
+
+def spool_report(query_index: int, args: Iterable[Any],
+                 export_format: str) -> SpooledTemporaryFile:
+    """
+    Writes report with given index of QUERY_INFO in given format of
+    EXPORT_FORMATS into a temporary file (kept in memory up to
+    EXPORT_SPOOL_SIZE bytes) and returns it rewound to the start.
+
+    Used instead of stream_report under ASGI: Django 4.1 iterates streaming
+    responses on the event loop, where database queries are not allowed and
+    waiting for COPY would block other requests. COPY runs in the view's
+    thread instead, and the loop only reads the file.
+    """
+    sql_cmd = EXPORT_FORMATS[export_format]['sql_cmd'].format(
+        get_report_sql(query_index=query_index, args=args)
+    )
+    spool = SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    try:
+        with connection.cursor() as cursor:
+            cursor.cursor.copy_expert(sql_cmd, spool)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+
+    return spool
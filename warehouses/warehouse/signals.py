@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_tables
+
+
+@receiver(post_delete)
+@receiver(post_save)
+def invalidate_reports(sender, **kwargs):
+    """
+    Makes cached reports depending on the table of saved or deleted instance
+    outdated.
+    """
+    if sender._meta.app_label == 'warehouse':
+        invalidate_tables(sender._meta.db_table)
@@ -0,0 +1,84 @@
+import json
+import random
+from typing import Any, Iterable
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection
+
+from .sql import INSERT_SLOW_REPORT_CMD, PRUNE_SLOW_REPORTS_CMD
+from .utils import get_named_sql
+
+EXPLAIN_CMD = 'EXPLAIN (ANALYZE, BUFFERS) SELECT * FROM query_{}({})'
+
+
+def is_slow(duration: float) -> bool:
+    """Whether report executed for given seconds should be logged."""
+    return duration >= settings.SLOW_REPORT_THRESHOLD
+
+
+def explain_report(query_index: int, arg_types: Iterable[str],
+                   args: list) -> str:
+    """
+    Get EXPLAIN (ANALYZE, BUFFERS) plan of report's function
+    query_<query_index> for given arguments bound on the client side and
+    casted to function's argument types. Report functions are single SQL
+    queries inlined by the planner, so the plan shows the inner query (only
+    the branch of the match mode for functions with it) instead of a
+    Function Scan node. Query is executed again, so plans are captured only
+    for a sample of slow reports.
+    """
+    arg_types = tuple(arg_types)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            get_named_sql(
+                sql_cmd=EXPLAIN_CMD.format(
+                    query_index,
+                    ', '.join(f'${i}' for i in range(1, len(arg_types) + 1))
+                ),
+                arg_types=arg_types
+            ),
+            {str(i): arg for i, arg in enumerate(args, start=1)}
+        )
+        return '\n'.join(row[0] for row in cursor.fetchall())
+
+
+def log_slow_report(query_index: int, arg_types: Iterable[str],
+                    args: Iterable[Any], duration: float,
+                    row_count: int) -> None:
+    """
+    Records report executed for longer than SLOW_REPORT_THRESHOLD seconds
+    in slow_report_log with plan of its inner query for
+    SLOW_REPORT_EXPLAIN_RATE share of records, and deletes records older
+    than SLOW_REPORT_LOG_DAYS days. Failure of logging does not fail the
+    report.
+    """
+    if not is_slow(duration):
+        return
+
+    args = list(args)
+    plan = None
+    try:
+        if random.random() < settings.SLOW_REPORT_EXPLAIN_RATE:
+            plan = explain_report(
+                query_index=query_index,
+                arg_types=arg_types,
+                args=args
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                INSERT_SLOW_REPORT_CMD,
+                [
+                    query_index,
+                    json.dumps(args, cls=DjangoJSONEncoder),
+                    duration,
+                    row_count,
+                    plan
+                ]
+            )
+            cursor.execute(
+                PRUNE_SLOW_REPORTS_CMD,
+                [settings.SLOW_REPORT_LOG_DAYS]
+            )
+    except DatabaseError:
+        pass
@@ -0,0 +1,514 @@
+LOCK_ORDERS_CMD = """
+    SELECT
+        order_table.id
+    FROM
+        order_table
+    WHERE
+        order_table.id = ANY(%s) AND
+        NOT order_table.accepted
+    ORDER BY
+        order_table.id
+    FOR UPDATE;
+"""
+
+LOCK_ORDERS_STOCK_CMD = """
+    SELECT
+        product_warehouse.id
+    FROM
+        product_warehouse
+    INNER JOIN (
+        SELECT DISTINCT
+            order_table.warehouse_id,
+            product_order.product_id
+        FROM
+            product_order
+        INNER JOIN
+            order_table ON order_table.id = product_order.order_id
+        WHERE
+            order_table.id = ANY(%s)
+    ) AS demand ON
+        demand.warehouse_id = product_warehouse.warehouse_id AND
+        demand.product_id = product_warehouse.product_id
+    ORDER BY
+        product_warehouse.id
+    FOR UPDATE OF product_warehouse;
+"""
+
+LOCK_ORDERS_RESERVED_CMD = """
+    SELECT
+        stock_reserved.warehouse_id,
+        stock_reserved.product_id
+    FROM
+        stock_reserved
+    INNER JOIN (
+        SELECT DISTINCT
+            order_table.warehouse_id,
+            product_order.product_id
+        FROM
+            product_order
+        INNER JOIN
+            order_table ON order_table.id = product_order.order_id
+        WHERE
+            order_table.id = ANY(%s)
+    ) AS demand ON
+        demand.warehouse_id = stock_reserved.warehouse_id AND
+        demand.product_id = stock_reserved.product_id
+    ORDER BY
+        stock_reserved.warehouse_id,
+        stock_reserved.product_id
+    FOR UPDATE OF stock_reserved;
+"""
+
+ORDERS_DEMAND_CMD = """
+    SELECT
+        product_order.order_id,
+        order_table.warehouse_id,
+        product_order.product_id,
+        product.article_number,
+        product.name,
+        product_order.payload,
+        COALESCE(product_warehouse.payload, 0)
+    FROM
+        product_order
+    INNER JOIN
+        order_table ON order_table.id = product_order.order_id
+    INNER JOIN
+        product ON product.id = product_order.product_id
+    LEFT JOIN
+        product_warehouse ON
+            product_warehouse.warehouse_id = order_table.warehouse_id AND
+            product_warehouse.product_id = product_order.product_id
+    WHERE
+        order_table.id = ANY(%s)
+    ORDER BY
+        order_table.date_start,
+        order_table.id,
+        product.article_number;
+"""
+
+ORDERS_DEMAND_SUBQUERY = """
+    SELECT
+        order_table.warehouse_id,
+        product_order.product_id,
+        SUM(product_order.payload) AS payload
+    FROM
+        product_order
+    INNER JOIN
+        order_table ON order_table.id = product_order.order_id
+    WHERE
+        order_table.id = ANY(%s)
+    GROUP BY
+        order_table.warehouse_id,
+        product_order.product_id
+"""
+
+DELETE_EXHAUSTED_STOCK_CMD = f"""
+    DELETE FROM
+        product_warehouse
+    USING ({ORDERS_DEMAND_SUBQUERY}) AS demand
+    WHERE
+        product_warehouse.warehouse_id = demand.warehouse_id AND
+        product_warehouse.product_id = demand.product_id AND
+        product_warehouse.payload = demand.payload;
+"""
+
+DECREASE_STOCK_CMD = f"""
+    UPDATE
+        product_warehouse
+    SET
+        payload = product_warehouse.payload - demand.payload
+    FROM ({ORDERS_DEMAND_SUBQUERY}) AS demand
+    WHERE
+        product_warehouse.warehouse_id = demand.warehouse_id AND
+        product_warehouse.product_id = demand.product_id AND
+        product_warehouse.payload > demand.payload;
+"""
+
+MARK_ORDERS_ACCEPTED_CMD = """
+    UPDATE
+        order_table
+    SET
+        accepted = TRUE
+    WHERE
+        id = ANY(%s);
+"""
+
+LOCK_TRANSITS_CMD = """
+    SELECT
+        transit.id
+    FROM
+        transit
+    WHERE
+        transit.id = ANY(%s) AND
+        NOT transit.accepted
+    ORDER BY
+        transit.id
+    FOR UPDATE;
+"""
+
+INCREASE_STOCK_CMD = """
+    INSERT INTO
+        product_warehouse (warehouse_id, product_id, payload)
+    SELECT
+        transit.warehouse_id,
+        product_transit.product_id,
+        SUM(product_transit.payload)
+    FROM
+        product_transit
+    INNER JOIN
+        transit ON transit.id = product_transit.transit_id
+    WHERE
+        transit.id = ANY(%s)
+    GROUP BY
+        transit.warehouse_id,
+        product_transit.product_id
+    ON CONFLICT (warehouse_id, product_id) DO UPDATE SET
+        payload = product_warehouse.payload + EXCLUDED.payload;
+"""
+
+MARK_TRANSITS_ACCEPTED_CMD = """
+    UPDATE
+        transit
+    SET
+        accepted = TRUE
+    WHERE
+        id = ANY(%s);
+"""
+
+STOCK_PROJECTION_DIFF_CMD = """
+    SELECT
+        COALESCE((
+            SELECT
+                stock_projection.incoming - stock_projection.outgoing
+            FROM
+                stock_projection
+            WHERE
+                stock_projection.warehouse_id = %(warehouse_id)s AND
+                stock_projection.product_id = %(product_id)s AND
+                stock_projection.event_time < %(datetime)s
+            ORDER BY
+                stock_projection.event_time DESC
+            LIMIT 1
+        ), 0) - COALESCE((
+            SELECT
+                stock_projection.incoming - stock_projection.outgoing
+            FROM
+                stock_projection
+            WHERE
+                stock_projection.warehouse_id = %(warehouse_id)s AND
+                stock_projection.product_id = %(product_id)s AND
+                stock_projection.event_time < %(now)s
+            ORDER BY
+                stock_projection.event_time DESC
+            LIMIT 1
+        ), 0);
+"""
+
+REBUILD_STOCK_PROJECTION_CMD = """
+    SELECT rebuild_stock_projection();
+"""
+
+STOCK_PROJECTION_MISMATCH_CMD = """
+    WITH expected AS (
+        SELECT
+            stock_events.warehouse_id,
+            stock_events.product_id,
+            stock_events.event_time,
+            SUM(SUM(stock_events.incoming)) OVER key_window AS incoming,
+            SUM(SUM(stock_events.outgoing)) OVER key_window AS outgoing
+        FROM
+            stock_events
+        GROUP BY
+            stock_events.warehouse_id,
+            stock_events.product_id,
+            stock_events.event_time
+        WINDOW key_window AS (
+            PARTITION BY
+                stock_events.warehouse_id,
+                stock_events.product_id
+            ORDER BY
+                stock_events.event_time
+        )
+    ), actual AS (
+        SELECT
+            stock_projection.warehouse_id,
+            stock_projection.product_id,
+            stock_projection.event_time,
+            stock_projection.incoming::NUMERIC,
+            stock_projection.outgoing::NUMERIC
+        FROM
+            stock_projection
+    )
+    SELECT COUNT(*) FROM (
+        (TABLE expected EXCEPT ALL TABLE actual)
+        UNION ALL
+        (TABLE actual EXCEPT ALL TABLE expected)
+    ) AS mismatches;
+"""
+
+STOCK_PROJECTION_SAMPLE_CMD = """
+    SELECT
+        stock_projection.warehouse_id,
+        stock_projection.product_id,
+        stock_projection.event_time
+    FROM
+        stock_projection
+    ORDER BY
+        random()
+    LIMIT %s;
+"""
+
+BUSY_VEHICLES_CMD = """
+    SELECT
+        vehicle_booking.vehicle_id,
+        array_remove(
+            array_agg(vehicle_booking.order_id ORDER BY vehicle_booking.id),
+            NULL
+        ),
+        array_remove(
+            array_agg(vehicle_booking.transit_id ORDER BY vehicle_booking.id),
+            NULL
+        )
+    FROM
+        vehicle_booking
+    WHERE
+        vehicle_booking.vehicle_id = ANY(%s) AND
+        vehicle_booking.period && tstzrange(%s, %s, '[]')
+    GROUP BY
+        vehicle_booking.vehicle_id;
+"""
+
+AVAILABLE_PAYLOADS_CMD = """
+    SELECT
+        products.id,
+        COALESCE(product_warehouse.payload, 0)
+        + COALESCE(at_datetime.incoming, 0)
+        - COALESCE(at_now.incoming, 0)
+        - COALESCE(stock_reserved.reserved, 0)
+    FROM
+        unnest(%(product_ids)s::INTEGER[]) AS products (id)
+    LEFT JOIN
+        product_warehouse ON
+            product_warehouse.warehouse_id = %(warehouse_id)s AND
+            product_warehouse.product_id = products.id
+    LEFT JOIN
+        stock_reserved ON
+            stock_reserved.warehouse_id = %(warehouse_id)s AND
+            stock_reserved.product_id = products.id
+    LEFT JOIN LATERAL (
+        SELECT
+            stock_projection.incoming
+        FROM
+            stock_projection
+        WHERE
+            stock_projection.warehouse_id = %(warehouse_id)s AND
+            stock_projection.product_id = products.id AND
+            stock_projection.event_time < %(datetime)s
+        ORDER BY
+            stock_projection.event_time DESC
+        LIMIT 1
+    ) AS at_datetime ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT
+            stock_projection.incoming
+        FROM
+            stock_projection
+        WHERE
+            stock_projection.warehouse_id = %(warehouse_id)s AND
+            stock_projection.product_id = products.id AND
+            stock_projection.event_time < %(now)s
+        ORDER BY
+            stock_projection.event_time DESC
+        LIMIT 1
+    ) AS at_now ON TRUE;
+"""
+
+LOCK_RESERVED_CMD = """
+    INSERT INTO
+        stock_reserved (warehouse_id, product_id)
+    SELECT
+        %(warehouse_id)s,
+        products.id
+    FROM
+        unnest(%(product_ids)s::INTEGER[]) AS products (id)
+    ORDER BY
+        products.id
+    ON CONFLICT (warehouse_id, product_id) DO NOTHING;
+
+    SELECT
+        stock_reserved.product_id
+    FROM
+        stock_reserved
+    WHERE
+        stock_reserved.warehouse_id = %(warehouse_id)s AND
+        stock_reserved.product_id = ANY(%(product_ids)s)
+    ORDER BY
+        stock_reserved.product_id
+    FOR UPDATE;
+"""
+
+TABLE_VERSIONS_CMD = """
+    SELECT
+        table_version.table_name,
+        table_version.version
+    FROM
+        table_version
+    WHERE
+        table_version.table_name = ANY(%s);
+"""
+
+ADD_TABLE_VERSIONS_CMD = """
+    INSERT INTO
+        table_version (table_name, version)
+    SELECT
+        table_name,
+        txid_current()
+    FROM
+        unnest(%s::VARCHAR[]) AS table_name
+    ON CONFLICT DO NOTHING;
+"""
+
+BUMP_TABLE_VERSIONS_CMD = """
+    INSERT INTO
+        table_version (table_name, version)
+    SELECT
+        table_name,
+        txid_current()
+    FROM
+        unnest(%s::VARCHAR[]) AS table_name
+    ON CONFLICT (table_name) DO UPDATE SET
+        version = EXCLUDED.version;
+"""
+
+INSERT_SLOW_REPORT_CMD = """
+    INSERT INTO
+        slow_report_log (query_index, args, duration, row_count, plan)
+    VALUES
+        (%s, %s, %s, %s, %s);
+"""
+
+PRUNE_SLOW_REPORTS_CMD = """
+    DELETE FROM
+        slow_report_log
+    WHERE
+        slow_report_log.created_at < NOW() - %s * INTERVAL '1 day';
+"""
+
+ENQUEUE_JOB_CMD = """
+    INSERT INTO
+        job (kind, object_ids)
+    VALUES
+        (%s, %s)
+    RETURNING
+        job.id;
+"""
+
+CLAIM_JOB_CMD = """
+    UPDATE
+        job
+    SET
+        status = 'running',
+        attempts = job.attempts + 1,
+        started_at = COALESCE(job.started_at, NOW()),
+        heartbeat_at = NOW()
+    WHERE
+        job.id = (
+            SELECT
+                pending.id
+            FROM
+                job AS pending
+            WHERE
+                pending.status = 'queued' OR
+                pending.status = 'running' AND
+                pending.heartbeat_at < NOW() - %s * INTERVAL '1 second'
+            ORDER BY
+                pending.id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+    RETURNING
+        job.id,
+        job.kind,
+        job.object_ids,
+        job.processed,
+        job.result,
+        job.attempts;
+"""
+
+JOB_PROGRESS_CMD = """
+    UPDATE
+        job
+    SET
+        processed = %s,
+        result = %s,
+        heartbeat_at = NOW()
+    WHERE
+        job.id = %s AND
+        job.attempts = %s AND
+        job.status = 'running';
+"""
+
+JOB_HEARTBEAT_CMD = """
+    UPDATE
+        job
+    SET
+        heartbeat_at = NOW()
+    WHERE
+        job.id = %s AND
+        job.attempts = %s AND
+        job.status = 'running';
+"""
+
+FINISH_JOB_CMD = """
+    UPDATE
+        job
+    SET
+        status = %s,
+        error = %s,
+        finished_at = NOW()
+    WHERE
+        job.id = %s AND
+        job.attempts = %s AND
+        job.status = 'running';
+"""
+
+RELEASE_JOB_CMD = """
+    UPDATE
+        job
+    SET
+        status = 'queued'
+    WHERE
+        job.id = %s AND
+        job.attempts = %s AND
+        job.status = 'running';
+"""
+
+JOB_ACCEPT_TOTALS_CMD = """
+    SELECT
+        job.kind,
+        SUM(COALESCE((job.result ->> 'accepted')::INTEGER, 0)),
+        SUM((
+            SELECT
+                COUNT(*)
+            FROM
+                jsonb_object_keys(
+                    COALESCE(job.result -> 'failures', '{}'::JSONB)
+                )
+        ))
+    FROM
+        job
+    GROUP BY
+        job.kind;
+"""
+
+REQUEUE_JOBS_CMD = """
+    UPDATE
+        job
+    SET
+        status = 'queued',
+        error = NULL,
+        finished_at = NULL
+    WHERE
+        job.id = ANY(%s) AND
+        job.status = 'failed';
+"""
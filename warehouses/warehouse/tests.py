@@ -0,0 +1,293 @@
+from datetime import datetime, timezone
+from threading import Barrier, Lock, Thread
+from time import sleep
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import IntegrityError, NotSupportedError
+from django.forms import inlineformset_factory
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from psycopg2.extensions import (TRANSACTION_STATUS_IDLE,
+                                 TRANSACTION_STATUS_INTRANS)
+
+from .forms import VehicleInlineFormSet
+from .mixins import VehicleBookingMixin
+from .pool_backend.pool import ConnectionPool, PoolTimeout
+from .models import Order, VehicleOrder
+from .reports import _execute_prepared
+from .utils import is_vehicle_booking_overlap
+from .views import metrics
+
+
+class DriverError(Exception):
+    def __init__(self, pgcode, constraint_name):
+        super().__init__(pgcode)
+        self.pgcode = pgcode
+        self.diag = SimpleNamespace(constraint_name=constraint_name)
+
+
+def get_integrity_error(pgcode, constraint_name):
+    error = IntegrityError()
+    error.__cause__ = DriverError(pgcode, constraint_name)
+    return error
+
+
+class ChangeformView:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.flags = []
+
+    def changeform_view(self, request, object_id=None, form_url='',
+                        extra_context=None):
+        self.flags.append(getattr(request, 'vehicle_booking_overlap', False))
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'response'
+
+
+class VehicleBookingAdmin(VehicleBookingMixin, ChangeformView):
+    pass
+
+
+class VehicleBookingOverlapTest(SimpleTestCase):
+    def test_is_vehicle_booking_overlap(self):
+        self.assertTrue(is_vehicle_booking_overlap(
+            get_integrity_error('23P01', 'vehicle_booking_overlap')
+        ))
+        self.assertFalse(is_vehicle_booking_overlap(
+            get_integrity_error('23505', 'vehicle_booking_order_id_key')
+        ))
+        self.assertFalse(is_vehicle_booking_overlap(IntegrityError()))
+
+    def test_overlap_validates_form_again(self):
+        admin = VehicleBookingAdmin(errors=[
+            get_integrity_error('23P01', 'vehicle_booking_overlap')
+        ])
+        request = RequestFactory().post('/')
+
+        self.assertEqual(admin.changeform_view(request), 'response')
+        self.assertEqual(admin.flags, [False, True])
+
+    def test_other_integrity_error_is_raised(self):
+        admin = VehicleBookingAdmin(errors=[
+            get_integrity_error('23505', 'vehicle_booking_order_id_key')
+        ])
+
+        with self.assertRaises(IntegrityError):
+            admin.changeform_view(RequestFactory().post('/'))
+        self.assertEqual(admin.flags, [False])
+
+    @mock.patch('warehouse.forms.get_busy_vehicles', return_value={})
+    def test_formset_with_overlap_is_invalid(self, get_busy_vehicles):
+        FormSet = inlineformset_factory(
+            parent_model=Order,
+            model=VehicleOrder,
+            formset=VehicleInlineFormSet,
+            fields=('vehicle',)
+        )
+        order = Order(
+            date_start=datetime(2026, 1, 1, tzinfo=timezone.utc),
+            date_end=datetime(2026, 1, 2, tzinfo=timezone.utc)
+        )
+        data = {
+            'vehicle_order-TOTAL_FORMS': '0',
+            'vehicle_order-INITIAL_FORMS': '0',
+        }
+
+        self.assertTrue(FormSet(data=data, instance=order).is_valid())
+        formset = FormSet(data=data, instance=order, booking_overlap=True)
+        self.assertFalse(formset.is_valid())
+        self.assertEqual(len(formset.non_form_errors()), 1)
+
+
+@mock.patch('warehouse.views.render_metrics', return_value='')
+class MetricsAccessTest(SimpleTestCase):
+    def get_status(self, user=None, token=None):
+        headers = {} if token is None else {
+            'HTTP_AUTHORIZATION': f'Bearer {token}'
+        }
+        request = RequestFactory().get('/metrics', **headers)
+        request.user = user or AnonymousUser()
+        return metrics(request).status_code
+
+    @override_settings(METRICS_PUBLIC=False, METRICS_TOKEN='')
+    def test_denied_by_default(self, render_metrics):
+        self.assertEqual(self.get_status(), 403)
+        self.assertEqual(self.get_status(token=''), 403)
+
+    @override_settings(METRICS_PUBLIC=False, METRICS_TOKEN='secret')
+    def test_token(self, render_metrics):
+        self.assertEqual(self.get_status(token='wrong'), 403)
+        self.assertEqual(self.get_status(token='secret'), 200)
+
+    @override_settings(METRICS_PUBLIC=False, METRICS_TOKEN='')
+    def test_staff(self, render_metrics):
+        staff = SimpleNamespace(is_active=True, is_staff=True)
+        self.assertEqual(self.get_status(user=staff), 200)
+
+    @override_settings(METRICS_PUBLIC=True, METRICS_TOKEN='')
+    def test_public(self, render_metrics):
+        self.assertEqual(self.get_status(), 200)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.info = SimpleNamespace(transaction_status=TRANSACTION_STATUS_IDLE)
+        self.rollbacks = 0
+
+    def close(self):
+        self.closed = 1
+
+    def cursor(self):
+        return mock.MagicMock()
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = TRANSACTION_STATUS_IDLE
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def get_pool(self, max_size=2, timeout=1.0, check_interval=0.0,
+                 max_idle=300.0):
+        return ConnectionPool(
+            connect=FakeConnection,
+            max_size=max_size,
+            timeout=timeout,
+            check_interval=check_interval,
+            max_idle=max_idle
+        )
+
+    def test_concurrent_checkouts_do_not_exceed_max_size(self):
+        pool = self.get_pool(max_size=3, timeout=5.0)
+        lock = Lock()
+        used = set()
+        peak = []
+        start = Barrier(12)
+
+        def work():
+            start.wait()
+            for _ in range(20):
+                db_connection = pool.getconn()
+                with lock:
+                    self.assertNotIn(db_connection, used)
+                    used.add(db_connection)
+                    peak.append(len(used))
+                sleep(0.001)
+                with lock:
+                    used.remove(db_connection)
+                pool.putconn(db_connection)
+
+        threads = [Thread(target=work) for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = pool.get_stats()
+        self.assertLessEqual(max(peak), 3)
+        self.assertLessEqual(stats['created'], 3)
+        self.assertEqual(stats['checkouts'], 240)
+        self.assertEqual(stats['timeouts'], 0)
+        self.assertEqual(stats['size'], stats['idle'])
+
+    def test_waiting_checkout_gets_returned_connection(self):
+        pool = self.get_pool(max_size=1)
+        db_connection = pool.getconn()
+        result = []
+        thread = Thread(target=lambda: result.append(pool.getconn()))
+        thread.start()
+        sleep(0.05)
+        pool.putconn(db_connection)
+        thread.join()
+
+        self.assertEqual(result, [db_connection])
+        self.assertEqual(pool.get_stats()['waits'], 1)
+
+    def test_checkout_times_out_when_pool_is_full(self):
+        pool = self.get_pool(max_size=1, timeout=0.05)
+        pool.getconn()
+
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        self.assertEqual(pool.get_stats()['timeouts'], 1)
+
+    def test_broken_idle_connection_is_replaced(self):
+        pool = self.get_pool(max_size=1)
+        db_connection = pool.getconn()
+        pool.putconn(db_connection)
+        db_connection.closed = 1
+
+        self.assertIsNot(pool.getconn(), db_connection)
+        self.assertEqual(pool.get_stats()['size'], 1)
+
+    def test_connection_in_transaction_is_rolled_back(self):
+        pool = self.get_pool(max_size=1)
+        db_connection = pool.getconn()
+        db_connection.info.transaction_status = TRANSACTION_STATUS_INTRANS
+        pool.putconn(db_connection)
+
+        self.assertEqual(db_connection.rollbacks, 1)
+        self.assertIs(pool.getconn(), db_connection)
+
+
+def get_not_supported_error(pgcode):
+    error = NotSupportedError()
+    error.__cause__ = DriverError(pgcode, None)
+    return error
+
+
+class FakeCursor:
+    def __init__(self, errors):
+        self.description = [SimpleNamespace(name='id')]
+        self.errors = list(errors)
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql_cmd, args=None):
+        self.executed.append(sql_cmd)
+        if sql_cmd.startswith('EXECUTE') and self.errors:
+            raise self.errors.pop(0)
+
+    def fetchall(self):
+        return [(1,)]
+
+
+class ExecutePreparedTest(SimpleTestCase):
+    def execute(self, errors):
+        cursor = FakeCursor(errors)
+        fake_connection = SimpleNamespace(
+            connection=FakeConnection(),
+            cursor=lambda: cursor,
+            in_atomic_block=False
+        )
+        with mock.patch('warehouse.reports.connection', fake_connection):
+            result = _execute_prepared(
+                name='report_1',
+                arg_types=('DATE',),
+                sql_cmd='SELECT * FROM query_1($1)',
+                args=['2026-01-01']
+            )
+        return result, cursor.executed[1:]
+
+    def test_statement_is_prepared_again_after_result_type_change(self):
+        result, executed = self.execute([get_not_supported_error('0A000')])
+
+        self.assertEqual(result, (['id'], [(1,)]))
+        self.assertEqual(executed, [
+            'PREPARE report_1 (DATE) AS SELECT * FROM query_1($1);',
+            'EXECUTE report_1 (%s);',
+            'DEALLOCATE report_1;',
+            'PREPARE report_1 (DATE) AS SELECT * FROM query_1($1);',
+            'EXECUTE report_1 (%s);',
+        ])
+
+    def test_other_error_is_raised(self):
+        with self.assertRaises(NotSupportedError):
+            self.execute([get_not_supported_error('0A001')])
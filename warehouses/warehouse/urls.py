@@ -1,10 +1,22 @@
 from django.urls import path
 
-from .views import index, query_view
+from .views import (async_query_view, export_view, index, query_view,
+                    report_stats)
 
 app_name = 'warehouses'
 
 urlpatterns = [
     path('', index, name='index'),
     path('query/<int:query_index>/', query_view, name='query_view'),
+    path(
+        'query/<int:query_index>/export.<str:export_format>',
+        export_view,
+        name='query_export'
+    ),
+    path('query/stats/', report_stats, name='report_stats'),
+    path(
+        'async/query/<int:query_index>/',
+        async_query_view,
+        name='async_query_view'
+    ),
 ]
@@ -1,77 +1,266 @@
 import re
+from itertools import groupby
 from zoneinfo import ZoneInfo
 from datetime import datetime as dt
+from django.db import IntegrityError, connection, transaction
 from django.db.models import Sum
 from django.apps import apps
 from django.conf import settings
-from typing import Any
+from typing import Iterable
 
+from .cache import invalidate_tables
+from .sql import (AVAILABLE_PAYLOADS_CMD, BUSY_VEHICLES_CMD,
+                  DECREASE_STOCK_CMD, DELETE_EXHAUSTED_STOCK_CMD,
+                  INCREASE_STOCK_CMD, LOCK_ORDERS_CMD,
+                  LOCK_ORDERS_RESERVED_CMD, LOCK_ORDERS_STOCK_CMD,
+                  LOCK_RESERVED_CMD, LOCK_TRANSITS_CMD,
+                  MARK_ORDERS_ACCEPTED_CMD, MARK_TRANSITS_ACCEPTED_CMD,
+                  ORDERS_DEMAND_CMD, STOCK_PROJECTION_DIFF_CMD)
 
-def get_datetime_local_timezone(date: str, time: str) -> dt:
+
+def accept_orders(order_ids: Iterable[int]
+                  ) -> tuple[int, dict[int, list[str]]]:
+    """
+    Accepts given unaccepted orders in one transaction using a constant number
+    of set-based statements: takes products of accepted orders from related
+    warehouses and marks orders as accepted. Returns count of accepted orders
+    and dictionary with orders that can not be accepted because of lack of
+    products and descriptions of missing products.
+
+    Reserved payloads of the orders' products are locked (in the same order
+    as by get_available_payloads) before orders are marked as accepted,
+    which releases their reservations and updates counters of shops, so
+    acceptance and creation of orders take these locks in the same order.
+
+    Orders compete for stock in order of their start date: every order takes
+    products left by earlier accepted orders, and an order that can not be
+    accepted does not take anything. So if warehouse has 10 tons of product
+    and orders #1 and #2 (starting later) require 6 tons each, order #1 will
+    be accepted and it will return
+    (
+        1,
+        {
+            2: ['[10000] Сахар (требуется 6 т, доступно 4 т)'],
+        }
+    )
+    """
+    failures: dict[int, list[str]] = {}
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(LOCK_ORDERS_CMD, [list(order_ids)])
+        order_ids = [row[0] for row in cursor.fetchall()]
+        if not order_ids:
+            return 0, failures
+
+        cursor.execute(LOCK_ORDERS_STOCK_CMD, [order_ids])
+        cursor.execute(LOCK_ORDERS_RESERVED_CMD, [order_ids])
+        cursor.execute(ORDERS_DEMAND_CMD, [order_ids])
+        remaining: dict[tuple[int, int], int] = {}
+        for order_id, lines in groupby(cursor.fetchall(), key=lambda i: i[0]):
+            lines = list(lines)
+            shortages = []
+            for _, warehouse_id, product_id, article, name, payload, stock in (
+                lines
+            ):
+                left = remaining.setdefault((warehouse_id, product_id), stock)
+                if payload > left:
+                    shortages.append(
+                        f'[{article}] {name} (требуется {payload} т, '
+                        f'доступно {left} т)'
+                    )
+            if shortages:
+                failures[order_id] = shortages
+                continue
+            for _, warehouse_id, product_id, _, _, payload, _ in lines:
+                remaining[warehouse_id, product_id] -= payload
+
+        order_ids = [i for i in order_ids if i not in failures]
+        if order_ids:
+            cursor.execute(DELETE_EXHAUSTED_STOCK_CMD, [order_ids])
+            cursor.execute(DECREASE_STOCK_CMD, [order_ids])
+            cursor.execute(MARK_ORDERS_ACCEPTED_CMD, [order_ids])
+            invalidate_tables('order_table', 'product_warehouse')
+
+    return len(order_ids), failures
+
+
+def accept_transits(transit_ids: Iterable[int]) -> int:
     """
-    Get datetime in local timezone using representations of date and time as a
-    str. Time zone is defined at settings.py by TIME_ZONE.
+    Accepts given unaccepted transits in one transaction: adds payloads of
+    their products aggregated per warehouse and product to related warehouses
+    with a single upsert and marks transits as accepted. Returns count of
+    accepted transits.
+
+    For example, if transits #1 and #2 deliver 4 and 3 tons of the same
+    product to the warehouse that already has 5 tons of it, there will be
+    5 + 4 + 3 = 12 tons after a single INSERT ... ON CONFLICT statement.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(LOCK_TRANSITS_CMD, [list(transit_ids)])
+        transit_ids = [row[0] for row in cursor.fetchall()]
+        if transit_ids:
+            cursor.execute(INCREASE_STOCK_CMD, [transit_ids])
+            cursor.execute(MARK_TRANSITS_ACCEPTED_CMD, [transit_ids])
+            invalidate_tables('product_warehouse', 'transit')
+
+    return len(transit_ids)
 
-    If date is specified as '13.04.2023', time as '13:42:58' and time zone
-    offset is +05:00 UTC it will return '2023-04-13 13:42:58+05:00' that is
-    str representation of datetime.datetime.
+
+def _aggregate_payload_diff(warehouse, product, **bounds) -> int:
+    """
+    Get payload of product in warehouse delivered by unaccepted transits
+    minus payload exported by unaccepted orders, both filtered by given
+    bounds of their dates (e.g. date_end__lt=datetime).
     """
-    return dt.strptime(
-            date + ' ' + time,
-            '%d.%m.%Y %H:%M:%S'
-        ).replace(tzinfo=ZoneInfo(key=settings.TIME_ZONE))
+    ProductTransit = apps.get_model('warehouse', 'ProductTransit')
+    ProductOrder = apps.get_model('warehouse', 'ProductOrder')
+
+    negative_payload: int = ProductOrder.objects.filter(
+        order__accepted=False,
+        product=product,
+        order__warehouse=warehouse,
+        **{f'order__{key}': value for key, value in bounds.items()}
+    ).aggregate(sum=Sum('payload')).get('sum') or 0
 
+    positive_payload: int = ProductTransit.objects.filter(
+        transit__accepted=False,
+        product=product,
+        transit__warehouse=warehouse,
+        **{f'transit__{key}': value for key, value in bounds.items()}
+    ).aggregate(sum=Sum('payload')).get('sum') or 0
 
-def get_diff_order(order) -> dict[Any, int]:
+    return positive_payload - negative_payload
+
+
+def aggregate_product_payload_diff(warehouse, product, datetime: dt) -> int:
     """
-    Returns dictionary with products and payloads connected to given order.
+    Returns the same value as get_product_payload_diff, but calculates it from
+    scratch by aggregating products of unaccepted transits and orders. Used to
+    verify stock projection.
+
+    Transits and orders are counted by their end: ones finishing after now
+    and before given datetime, including ones that have already started.
+    Former rule (see legacy_product_payload_diff) counted only ones starting
+    after now, so deliveries in progress were ignored although they change
+    the stock before datetime.
+    """
+    return _aggregate_payload_diff(
+        warehouse=warehouse,
+        product=product,
+        date_end__gte=get_now_datetime(),
+        date_end__lt=datetime
+    )
 
-    For example, if order has 2 products with their ID's as str representation
-    like '3' with 3 tons and '5' with 1 ton it will return
-    {
-        '3': 3,
-        '5': 1,
-    }
+
+def legacy_product_payload_diff(warehouse, product, datetime: dt) -> int:
     """
-    return {obj.product: obj.payload for obj in order.product_order.all()}
+    Returns the difference calculated by the former rule of
+    get_product_payload_diff: transits and orders starting after now and
+    finishing before given datetime. Used to verify that stock projection
+    differs from it only by deliveries in progress (see
+    started_product_payload_diff).
+    """
+    return _aggregate_payload_diff(
+        warehouse=warehouse,
+        product=product,
+        date_start__gte=get_now_datetime(),
+        date_end__lt=datetime
+    )
 
 
-def get_diff_transit(transit) -> dict[Any, int]:
+def started_product_payload_diff(warehouse, product, datetime: dt) -> int:
     """
-    Returns dictionary with products and payloads connected to given transit.
+    Returns the difference made by transits and orders that have started
+    before now and finish after now and before given datetime -- the ones
+    counted by get_product_payload_diff but not by the former rule.
+    """
+    now = get_now_datetime()
+
+    return _aggregate_payload_diff(
+        warehouse=warehouse,
+        product=product,
+        date_start__lt=now,
+        date_end__gte=now,
+        date_end__lt=datetime
+    )
 
-    For example, if transit has 2 products with their ID's as str
-    representation like '1' with 4 tons and '2' with 2 tons it will return
+
+def get_available_payloads(warehouse, products: Iterable, datetime: dt,
+                           lock: bool = False) -> dict[int, int]:
+    """
+    Returns dictionary with IDs of given products and their payloads that will
+    be available in given warehouse at given datetime: current payload plus
+    transits finished after now and before given datetime minus payloads
+    reserved by unaccepted orders. All products are fetched by a single query.
+
+    If lock is True, reserved payloads of the products are locked until the
+    end of the transaction, so concurrent orders of the same products are
+    validated and saved one after another and can not reserve the same stock.
+
+    For example, if warehouse has 10 tons of product with ID 1, 3 tons of it
+    will be delivered before given datetime and 4 tons are reserved, and
+    there is no product with ID 2, it will return
     {
-        '1': 4,
-        '2': 2,
+        1: 9,
+        2: 0,
     }
     """
-    return {obj.product: obj.payload for obj in transit.product_transit.all()}
+    params = {
+        'warehouse_id': getattr(warehouse, 'pk', warehouse),
+        'product_ids': sorted(getattr(i, 'pk', i) for i in products),
+        'datetime': datetime,
+        'now': get_now_datetime()
+    }
+    with connection.cursor() as cursor:
+        if lock:
+            cursor.execute(LOCK_RESERVED_CMD, params)
+        cursor.execute(AVAILABLE_PAYLOADS_CMD, params)
+        return dict(cursor.fetchall())
 
 
-def get_inline_objs_id(pattern: str, data: dict[str, str]) -> list[int]:
+def get_busy_vehicles(vehicles: Iterable, date_start: dt,
+                      date_end: dt) -> dict[int, dict[str, list[int]]]:
     """
-    Get a list of values casted to int from the specified dictionary
-    whose keys correspond to the passed regular expression and values are not
-    empty strs.
+    Returns dictionary with IDs of given vehicles that are busy at given time
+    range and IDs of unaccepted orders and transits they are booked for.
 
-    For example, if regexp is '$[0-9]{1}d^' and data is
+    Bookings are kept in vehicle_booking table as closed time ranges, so all
+    vehicles are checked by a single query probing its GiST index. The same
+    index backs exclusion constraint that rejects concurrent double booking.
+
+    For example, if vehicle with ID 3 is booked for order #5 and transit #2
+    at given time range and vehicle with ID 4 is free, it will return
     {
-        '1d': '3',
-        '2d': '4',
-        '33': '7',
-        'd': '6',
-        '0d': ''
+        3: {'orders': [5], 'transits': [2]},
     }
-    it will return [3, 4].
     """
-    res = []
-    for key, val in data.items():
-        if re.match(pattern, key) and val != '':
-            res.append(int(val))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            BUSY_VEHICLES_CMD,
+            [
+                [getattr(i, 'pk', i) for i in vehicles],
+                date_start,
+                date_end
+            ]
+        )
+        return {
+            vehicle_id: {'orders': orders, 'transits': transits}
+            for vehicle_id, orders, transits in cursor.fetchall()
+        }
 
-    return res
+
+def is_vehicle_booking_overlap(error: IntegrityError) -> bool:
+    """
+    Checks that given error is a violation of vehicle_booking_overlap
+    exclusion constraint (SQLSTATE 23P01), i.e. a vehicle was booked for
+    intersecting time range by concurrent transaction.
+    """
+    cause = error.__cause__
+    return (
+        getattr(cause, 'pgcode', None) == '23P01'
+        and getattr(getattr(cause, 'diag', None), 'constraint_name', None)
+        == 'vehicle_booking_overlap'
+    )
 
 
 def get_inline_sum(pattern: str, data: dict[str, str]) -> int:
@@ -98,6 +287,26 @@ def get_inline_sum(pattern: str, data: dict[str, str]) -> int:
     return res
 
 
+def get_named_sql(sql_cmd: str, arg_types: Iterable[str]) -> str:
+    """
+    Get sql_cmd with numbered parameters ($1, $2, ...) replaced by named
+    client-side placeholders casted to given argument types.
+
+    For example, for 'SELECT * FROM query_4($1)' and ('DATE',) it will
+    return 'SELECT * FROM query_4(%(1)s::DATE)'.
+    """
+    arg_types = tuple(arg_types)
+
+    return re.sub(
+        r'\$(\d+)',
+        lambda match: '%({})s::{}'.format(
+            match.group(1),
+            arg_types[int(match.group(1)) - 1]
+        ),
+        sql_cmd
+    )
+
+
 def get_now_datetime() -> dt:
     """
     Get datetime.now() with local timezone defined at settings.TIME_ZONE.
@@ -108,103 +317,24 @@ def get_now_datetime() -> dt:
 def get_product_payload_diff(warehouse, product, datetime: dt) -> int:
     """
     Returns the difference of product's count in given warehouse after transits
-    and exportations made after now and before given datetime.
+    and exportations finished after now and before given datetime.
 
     For example, if some product in the given warehouse will be delivered
     in the amount of 3 and 5 tons and exported in the amount of 2 tons before
     the specified date it will return 3 + 5 - 2 = 6.
-    """
-    ProductTransit = apps.get_model('warehouse', 'ProductTransit')
-    ProductOrder = apps.get_model('warehouse', 'ProductOrder')
-
-    negative_payload: int = ProductOrder.objects.filter(
-        order__accepted=False,
-        product=product,
-        order__warehouse=warehouse,
-        order__date_start__gte=get_now_datetime(),
-        order__date_end__lt=datetime
-    ).aggregate(sum=Sum('payload')).get('sum') or 0
 
-    positive_payload: int = ProductTransit.objects.filter(
-        transit__accepted=False,
-        product=product,
-        transit__warehouse=warehouse,
-        transit__date_start__gte=get_now_datetime(),
-        transit__date_end__lt=datetime,
-    ).aggregate(sum=Sum('payload')).get('sum') or 0
-
-    return positive_payload - negative_payload
-
-
-def has_inline_duplicates(pattern: str, data: dict[str, str]) -> bool:
+    Value is read from stock_projection table that keeps cumulative payloads
+    of unaccepted transits and orders per warehouse and product at each time
+    of their end, so it costs two index lookups instead of two aggregations.
     """
-    Returns boolean value that is answer to the question 'is given dictionary
-    has duplicate values attached to keys that matches given pattern?'.
-    """
-    obj_ids = get_inline_objs_id(
-            data=data,
-            pattern=pattern
+    with connection.cursor() as cursor:
+        cursor.execute(
+            STOCK_PROJECTION_DIFF_CMD,
+            {
+                'warehouse_id': getattr(warehouse, 'pk', warehouse),
+                'product_id': getattr(product, 'pk', product),
+                'datetime': datetime,
+                'now': get_now_datetime()
+            }
         )
-
-    return len(set(obj_ids)) != len(obj_ids)
-
-
-def is_correct_timerange(start_1: dt, end_1: dt, start_2: dt,
-                         end_2: dt) -> bool:
-    """
-    Returns boolean value that is answer to the question 'are given datetimes
-    ranges have intersections?'. There is no matter which range is higher.
-    If different bounds are equal it means case is incorrect.
-
-    If one time range is presented as [] symbols that means start and end and
-    other one is presented as {}, all combinations are:
-        * [] {}  --> True
-        * [ {] } --> False
-        * { [] } --> False
-        * { [} ] --> False
-        * {} []  --> True
-        * [ {} ] --> False
-
-    Start of 1st range have to be higher that end of 2nd range or end of 1st
-    range have to be lower than start of 2nd range.
-    """
-    return end_1 < start_2 or start_1 > end_2
-
-
-def is_vehicle_available(vehicle, date_start: dt, date_end: dt) -> bool:
-    """
-    Returns boolean value that is answer to the question 'are given vehicle
-    available at given time range?'.
-    """
-    VehicleTransit = apps.get_model('warehouse', 'VehicleTransit')
-    VehicleOrder = apps.get_model('warehouse', 'VehicleOrder')
-
-    for obj in VehicleTransit.objects.filter(
-        vehicle=vehicle,
-        transit__date_start__lte=date_end,
-        transit__date_end__gte=date_start,
-        transit__accepted=False
-    ):
-        if not is_correct_timerange(
-            start_1=obj.transit.date_start,
-            end_1=obj.transit.date_end,
-            start_2=date_start,
-            end_2=date_end
-        ):
-            return False
-
-    for obj in VehicleOrder.objects.filter(
-        vehicle=vehicle,
-        order__date_start__lte=date_end,
-        order__date_end__gte=date_start,
-        order__accepted=False
-    ):
-        if not is_correct_timerange(
-            start_1=obj.order.date_start,
-            end_1=obj.order.date_end,
-            start_2=date_start,
-            end_2=date_end
-        ):
-            return False
-
-    return True
+        return cursor.fetchone()[0]
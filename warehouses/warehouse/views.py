@@ -1,117 +1,22 @@
+from asgiref.sync import sync_to_async
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.views import redirect_to_login
 from django.conf import settings
-from django.db import connection
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseForbidden, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 
-from .forms import (QueryDateForm, QueryFullnameForm, QuerySixForm,
-                    QueryWarehouseNameForm)
-
-
-QUERY_INFO = {
-    1: {
-        'columns': (
-            'id',
-            'first_name',
-            'email'
-        ),
-        'description': settings.QUERY_1_DESCRIPTION,
-        'form_class': None,
-        'sql_cmd': 'SELECT * FROM query_1() ORDER BY id ASC;',
-    },
-    2: {
-        'columns': (
-            'id',
-            'brand',
-            'max_capacity'
-        ),
-        'description': settings.QUERY_2_DESCRIPTION,
-        'form_class': None,
-        'sql_cmd': 'SELECT * FROM query_2() ORDER BY id ASC;',
-    },
-    3: {
-        'columns': (
-            'id',
-            'name',
-            'address',
-            'max_capacity'
-        ),
-        'description': settings.QUERY_3_DESCRIPTION,
-        'form_class': None,
-        'sql_cmd': 'SELECT * FROM query_3() ORDER BY id ASC;',
-    },
-    4: {
-        'columns': (
-            'id',
-            'name',
-            'address',
-            'date_start with TZ',
-            'date_end with TZ'
-        ),
-        'description': settings.QUERY_4_DESCRIPTION,
-        'form_class': QueryDateForm,
-        'sql_cmd': 'SELECT * FROM query_4(\'{}\') ORDER BY id ASC;',
-    },
-    5: {
-        'columns': (
-            'id',
-            'first_name',
-            'last_name',
-            'total_payload'
-        ),
-        'description': settings.QUERY_5_DESCRIPTION,
-        'form_class': QueryFullnameForm,
-        'sql_cmd': 'SELECT * FROM query_5(\'{}\', \'{}\') ORDER BY id ASC;',
-    },
-    6: {
-        'columns': (
-            'id',
-            'address',
-            'date with TZ'
-        ),
-        'description': settings.QUERY_6_DESCRIPTION,
-        'form_class': QuerySixForm,
-        'sql_cmd': 'SELECT * FROM query_6(\'{}\', \'{}\', \'{}\');',
-    },
-    7: {
-        'columns': (
-            'id',
-            'brand',
-            'max_capacity',
-            'date_start with TZ'
-        ),
-        'description': settings.QUERY_7_DESCRIPTION,
-        'form_class': QueryDateForm,
-        'sql_cmd': 'SELECT * FROM query_7(\'{}\');',
-    },
-    8: {
-        'columns': (
-            'id',
-            'address'
-        ),
-        'description': settings.QUERY_8_DESCRIPTION,
-        'form_class': QueryDateForm,
-        'sql_cmd': 'SELECT * FROM query_8(\'{}\') ORDER BY id;',
-    },
-    9: {
-        'columns': (
-            'count',
-        ),
-        'description': settings.QUERY_9_DESCRIPTION,
-        'form_class': QueryDateForm,
-        'sql_cmd': 'SELECT * FROM query_9(\'{}\');',
-    },
-    10: {
-        'columns': (
-            'id',
-            'name',
-            'article_number',
-            'tonnage'
-        ),
-        'description': settings.QUERY_10_DESCRIPTION,
-        'form_class': QueryWarehouseNameForm,
-        'sql_cmd': 'SELECT * FROM query_10(\'{}\', \'{}\');',
-    },
-}
+from .async_reports import (run_cached_report_async,
+                            run_cached_report_page_async)
+from .cache import get_cache_stats
+from .metrics import CONTENT_TYPE, render as render_metrics
+from .pool_backend.pool import get_pool_stats
+from .reports import (EXPORT_FORMATS, QUERY_INFO, get_statement_stats,
+                      run_cached_report, run_cached_report_page,
+                      spool_report, stream_report)
 
 
 @login_required
@@ -122,11 +27,13 @@ def index(request):
     )
 
 
-@login_required
-def query_view(request, query_index):
-    template_name = 'warehouse/index.html'
-    params = QUERY_INFO.get(query_index)
-    sql_cmd = params.get('sql_cmd')
+def _get_report_context(request, params: dict) -> tuple[dict, list, bool]:
+    """
+    Get template context of report with given params of QUERY_INFO, its
+    arguments taken from the bound form and whether the form is valid.
+    Arguments of the report are taken from POST data of the form or GET
+    params of pagination links.
+    """
     form_args = []
     context = {
         key: val for key, val in params.items() if key in (
@@ -135,22 +42,184 @@ def query_view(request, query_index):
     }
 
     if (form_class := params.get('form_class')) is not None:
-        form = form_class(request.POST or None)
+        form = form_class(request.POST or request.GET or None)
         context['form'] = form
         if not form.is_valid():
-            return render(
-                request=request,
-                template_name=template_name,
-                context=context
-            )
-        form_args = form.cleaned_data.values()
+            return context, form_args, False
+        form_args = [form.cleaned_data[arg] for arg in params['args']]
+        args_query = form.data.copy()
+        for key in ('csrfmiddlewaretoken', 'cursor'):
+            args_query.pop(key, None)
+        context['args_query'] = args_query.urlencode()
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql_cmd.format(*form_args))
-        context['data'] = cursor.fetchall()
+    return context, form_args, True
+
+
+@login_required
+def query_view(request, query_index):
+    """
+    Renders report with given index. Reports with page_keys are rendered by
+    pages, arguments of the report and cursor of the page are taken from
+    GET params of pagination links. Reports 6 and 9 are rendered whole: rows
+    of report 6 (one per transit vehicle) may repeat and have no key to seek
+    by, and report 9 returns a single count.
+    """
+    template_name = 'warehouse/index.html'
+    if (params := QUERY_INFO.get(query_index)) is None:
+        raise Http404
+    context, form_args, is_valid = _get_report_context(
+        request=request,
+        params=params
+    )
+    if not is_valid:
+        return render(
+            request=request,
+            template_name=template_name,
+            context=context
+        )
+
+    if params['page_keys']:
+        (
+            context['data'],
+            context['next_cursor'],
+            context['prev_cursor']
+        ) = run_cached_report_page(
+            query_index=query_index,
+            args=form_args,
+            cursor=request.GET.get('cursor')
+        )
+    else:
+        context['data'] = run_cached_report(
+            query_index=query_index,
+            args=form_args
+        )
 
     return render(
         request=request,
         template_name=template_name,
         context=context
     )
+
+
+async def async_query_view(request, query_index):
+    """
+    Async version of query_view for ASGI server. Report is executed by an
+    async database driver, so concurrent reports share the event loop
+    instead of holding a thread each, and is cancelled if the client
+    disconnects (see warehouses.asgi).
+    """
+    template_name = 'warehouse/index.html'
+    if not await sync_to_async(lambda: request.user.is_authenticated)():
+        return redirect_to_login(next=request.get_full_path())
+    if (params := QUERY_INFO.get(query_index)) is None:
+        raise Http404
+    context, form_args, is_valid = _get_report_context(
+        request=request,
+        params=params
+    )
+
+    if is_valid and params['page_keys']:
+        (
+            context['data'],
+            context['next_cursor'],
+            context['prev_cursor']
+        ) = await run_cached_report_page_async(
+            query_index=query_index,
+            args=form_args,
+            cursor=request.GET.get('cursor')
+        )
+    elif is_valid:
+        context['data'] = await run_cached_report_async(
+            query_index=query_index,
+            args=form_args
+        )
+
+    return await sync_to_async(render)(
+        request=request,
+        template_name=template_name,
+        context=context
+    )
+
+
+@login_required
+def export_view(request, query_index, export_format):
+    """
+    Streams report with given index in given format of EXPORT_FORMATS without
+    loading all rows into memory. Arguments of report are taken from GET
+    params of the same form as in query_view.
+
+    Under ASGI the report is written into a temporary file before the
+    response is returned (see spool_report), because Django iterates
+    streaming responses on the event loop.
+    """
+    if (params := QUERY_INFO.get(query_index)) is None:
+        raise Http404
+    if (export_params := EXPORT_FORMATS.get(export_format)) is None:
+        raise Http404
+    form_args = []
+
+    if (form_class := params.get('form_class')) is not None:
+        form = form_class(request.GET)
+        if not form.is_valid():
+            return JsonResponse(data={'errors': form.errors}, status=400)
+        form_args = [form.cleaned_data[arg] for arg in params['args']]
+
+    filename = f'query_{query_index}.{export_format}'
+    if isinstance(request, ASGIRequest):
+        return FileResponse(
+            spool_report(
+                query_index=query_index,
+                args=form_args,
+                export_format=export_format
+            ),
+            as_attachment=True,
+            content_type=export_params['content_type'],
+            filename=filename
+        )
+
+    response = StreamingHttpResponse(
+        streaming_content=stream_report(
+            query_index=query_index,
+            args=form_args,
+            export_format=export_format
+        ),
+        content_type=export_params['content_type']
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+
+    return response
+
+
+@staff_member_required
+def report_stats(request):
+    """
+    Statistics of report cache, database connection pool and prepared report
+    statements.
+    """
+    return JsonResponse(
+        data={
+            'cache': get_cache_stats(),
+            'pool': get_pool_stats(),
+            'statements': get_statement_stats()
+        }
+    )
+
+
+def metrics(request):
+    """
+    Metrics of the process in Prometheus text format. Available to staff
+    users and to scrapers sending METRICS_TOKEN (if it is set) as
+    'Authorization: Bearer <token>'. Open to everyone only if METRICS_PUBLIC
+    is set.
+    """
+    if not (
+        settings.METRICS_PUBLIC
+        or request.user.is_active and request.user.is_staff
+        or settings.METRICS_TOKEN
+        and request.headers.get('Authorization') == (
+            f'Bearer {settings.METRICS_TOKEN}'
+        )
+    ):
+        return HttpResponseForbidden()
+
+    return HttpResponse(content=render_metrics(), content_type=CONTENT_TYPE)
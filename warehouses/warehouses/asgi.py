@@ -1,7 +1,65 @@
+import asyncio
 import os
+import re
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'warehouses.settings')
 
-application = get_asgi_application()
+CANCEL_ON_DISCONNECT_PATH = re.compile(r'/async/')
+
+
+class CancelOnDisconnect:
+    """
+    ASGI wrapper cancelling handling of the request if the client
+    disconnects before the response is sent. Django reads the whole body of
+    the request before calling the view and then does not listen for
+    http.disconnect, so the wrapper listens instead and cancels the
+    handler's task, which cancels the running database query of async
+    views. Only requests with path matching CANCEL_ON_DISCONNECT_PATH are
+    wrapped, sync views (e.g. admin pages) run in threads that can not be
+    cancelled.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not CANCEL_ON_DISCONNECT_PATH.search(
+            scope['path']
+        ):
+            return await self.app(scope, receive, send)
+
+        body_received = asyncio.Event()
+        disconnected = asyncio.Event()
+
+        async def receive_body():
+            if body_received.is_set():
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+            message = await receive()
+            if message['type'] != 'http.request' or not message.get(
+                'more_body',
+                False
+            ):
+                body_received.set()
+            return message
+
+        async def watch_disconnect():
+            await body_received.wait()
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            disconnected.set()
+            app_task.cancel()
+
+        app_task = asyncio.ensure_future(self.app(scope, receive_body, send))
+        watcher_task = asyncio.ensure_future(watch_disconnect())
+        try:
+            await app_task
+        except asyncio.CancelledError:
+            if not disconnected.is_set():
+                raise
+        finally:
+            watcher_task.cancel()
+
+
+application = CancelOnDisconnect(get_asgi_application())
@@ -30,6 +30,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'warehouse.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,7 +88,56 @@ DATABASES = {
         'PORT': os.getenv(
             key='DB_PORT',
             default='5432'
-        )
+        ),
+        'CONN_MAX_AGE': int(os.getenv(
+            key='DB_CONN_MAX_AGE',
+            default='0'
+        )),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            key='DB_CONN_HEALTH_CHECKS',
+            default='True'
+        ) == 'True',
+        'POOL': {
+            'CHECK_INTERVAL': float(os.getenv(
+                key='DB_POOL_CHECK_INTERVAL',
+                default='0'
+            )),
+            'MAX_IDLE': float(os.getenv(
+                key='DB_POOL_MAX_IDLE',
+                default='300'
+            )),
+            'MAX_SIZE': int(os.getenv(
+                key='DB_POOL_MAX_SIZE',
+                default='10'
+            )),
+            'TIMEOUT': float(os.getenv(
+                key='DB_POOL_TIMEOUT',
+                default='10'
+            )),
+        }
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Versions of tables are kept in the database, so reports cached by any
+    # backend are invalidated in all processes. LocMemCache keeps a separate
+    # copy of results and hit/miss statistics in every process.
+    'reports': {
+        'BACKEND': os.getenv(
+            key='REPORTS_CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv(
+            key='REPORTS_CACHE_LOCATION',
+            default='reports'
+        ),
+        'TIMEOUT': int(os.getenv(
+            key='REPORTS_CACHE_TIMEOUT',
+            default='3600'
+        ))
     }
 }
 
@@ -108,6 +158,8 @@ AUTH_PASSWORD_VALIDATORS = [
 
 LANGUAGE_CODE = 'ru'
 
+# Business time zone of report functions too, database_init reads it from
+# here, so changing it redeploys the functions.
 TIME_ZONE = 'Asia/Yekaterinburg'
 
 USE_I18N = True
@@ -148,25 +200,47 @@ ORDER_DAYS_MAX_OFFSET = 90
 
 LIST_PER_PAGE = 30
 
+REPORT_PAGE_SIZE = int(os.getenv(key='REPORT_PAGE_SIZE', default='50'))
+
+METRICS_TOKEN = os.getenv(key='METRICS_TOKEN', default='')
+
+METRICS_PUBLIC = os.getenv(key='METRICS_PUBLIC', default='False') == 'True'
+
+SLOW_REPORT_THRESHOLD = float(
+    os.getenv(key='SLOW_REPORT_THRESHOLD', default='1.0')
+)
+
+SLOW_REPORT_EXPLAIN_RATE = float(
+    os.getenv(key='SLOW_REPORT_EXPLAIN_RATE', default='0.1')
+)
+
+SLOW_REPORT_LOG_DAYS = int(os.getenv(key='SLOW_REPORT_LOG_DAYS', default='30'))
+
+JOB_CHUNK_SIZE = int(os.getenv(key='JOB_CHUNK_SIZE', default='500'))
+
+JOB_POLL_INTERVAL = 1.0
+
+JOB_STALE_TIMEOUT = int(os.getenv(key='JOB_STALE_TIMEOUT', default='300'))
+
 QUERY_1_DESCRIPTION = 'Получить имена и электронные адреса всех владельцев складов, машин или магазинов.'
 
 QUERY_2_DESCRIPTION = 'Получить марки и грузоподъемность всех машин с грузоподъемностью менее 15 тонн.'
 
 QUERY_3_DESCRIPTION = 'Получить название, адрес и вместительность склада с наибольшей вместительностью в тоннах.'
 
-QUERY_4_DESCRIPTION = 'Получить названия, адреса, время начала и конца поставки товаров на склады на определенный день в UTC.'
+QUERY_4_DESCRIPTION = 'Получить названия, адреса, время начала и конца поставки товаров на склады на определенный день по екатеринбургскому времени.'
 
 QUERY_5_DESCRIPTION = 'Получить имя и фамилию владельца и суммарную вместимость в тоннах его складов для конкретного владельца.'
 
-QUERY_6_DESCRIPTION = 'Получить адреса складов, в которые осуществляют транзит машины определенного владельца в определенный день в UTC.'
+QUERY_6_DESCRIPTION = 'Получить адреса складов, в которые осуществляют транзит машины определенного владельца в определенный день по екатеринбургскому времени.'
 
-QUERY_7_DESCRIPTION = 'Получить список машин (марка и грузоподъемность) в порядке убывания грузоподъемности, везущих товары в магазин не позднее 17:00 UTC конкретного дня.'
+QUERY_7_DESCRIPTION = 'Получить список машин (марка и грузоподъемность) в порядке убывания грузоподъемности, везущих товары в магазин не позднее 17:00 по екатеринбургскому времени конкретного дня.'
 
-QUERY_8_DESCRIPTION = 'Получить адреса складов с минимальным числом заказов (магазинами) на определенный день в UTC.'
+QUERY_8_DESCRIPTION = 'Получить адреса складов с минимальным числом заказов (магазинами) на определенный день по екатеринбургскому времени.'
 
-QUERY_9_DESCRIPTION = 'Получить количество поставок на склады длительностью более 3 часов на определенный день в UTC.'
+QUERY_9_DESCRIPTION = 'Получить количество поставок на склады длительностью более 3 часов на определенный день по екатеринбургскому времени.'
 
-QUERY_10_DESCRIPTION = 'Получить наименование, артикул и количество товаров, преобладающих по количеству (в тоннах) на определенном складе.'
+QUERY_10_DESCRIPTION = 'Получить наименование, артикул и количество товаров, преобладающих по количеству (в тоннах) на каждом из найденных складов.'
 
 LOGIN_URL = 'users:login'
 
@@ -1,8 +1,11 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from warehouse.views import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
     path('warehouses/', include('warehouse.urls', namespace='warehouses')),
     path('users/', include('users.urls', namespace='users'))
 ]